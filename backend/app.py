@@ -1,27 +1,278 @@
 #fastapi backend for meeting summarizer
 #exposes speech-to-text and text summarization as rest api endpoints
 
-from fastapi import FastAPI, UploadFile, File, HTTPException, BackgroundTasks
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import StreamingResponse, JSONResponse
+from contextlib import asynccontextmanager
+from pydantic import BaseModel, ConfigDict
 from typing import Optional
-import tempfile
+import asyncio
+import json
 import os
 import sys
+import time
 import uuid
 from datetime import datetime
 
-#add parent directory to path to import models
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+#add parent directory to path to import models, and this directory for the backend modules
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(BACKEND_DIR))
+sys.path.append(BACKEND_DIR)
+
+from inference import ModelExecutor
+from batcher import SummaryBatcher
+from registry import ModelRegistry
+from jobs import JobStore, JobWorkerPool, DONE, FAILED
+from uploads import save_upload, check_audio_upload, UploadLimitMiddleware
+from models.resultCache import ResultCache, hash_file, transcription_key, summary_key
+from models.audioDecoder import StreamingDecoder
+from models.transcriptStore import TranscriptStore, default_store_path
+from models.generationPolicy import PRESETS, DEFAULT_PRESET
+
+#default models, requests can ask for any other model in the allow-lists below
+STT_MODEL_SIZE = os.environ.get("STT_MODEL", "base")
+SUMMARIZER_MODEL = os.environ.get("SUMMARIZER_MODEL", "facebook/bart-large-cnn")
+
+#int8 dynamic quantization of the linear layers, faster on cpu at a small quality cost
+#(see benchmarks/bench_quantization.py), has no effect on gpu
+STT_QUANTIZE = os.environ.get("STT_QUANTIZE", "0") in ("1", "true", "yes")
+SUMMARIZER_QUANTIZE = os.environ.get("SUMMARIZER_QUANTIZE", "0") in ("1", "true", "yes")
+
+#fraction of the sentences of long transcripts kept by the extractive pre-filter before
+#summarizing (see benchmarks/bench_extractive.py), 1 = summarize everything
+SUMMARIZER_EXTRACTIVE_RATIO = float(os.environ.get("SUMMARIZER_EXTRACTIVE_RATIO", "1")) or 1.0
+
+
+def _model_list(variable, default):
+    names = [name.strip() for name in os.environ.get(variable, default).split(",") if name.strip()]
+    return names if default in names else [default] + names
+
+
+#importing whisper, torch and transformers takes seconds, so it is timed (and can be
+#done at startup) separately from loading the weights
+def _import_speech_to_text():
+    from models.speechToText import SpeechToText
+    return SpeechToText
+
+
+def _import_text_summarizer():
+    from models.textSummarizer import TextSummarizer
+    return TextSummarizer
+
+
+def _load_speech_to_text(model_size):
+    return _import_speech_to_text()(model_size=model_size, quantize=STT_QUANTIZE)
+
+
+def _load_text_summarizer(model_name):
+    return _import_text_summarizer()(
+        model_name=model_name,
+        quantize=SUMMARIZER_QUANTIZE,
+        extractive_ratio=SUMMARIZER_EXTRACTIVE_RATIO if SUMMARIZER_EXTRACTIVE_RATIO < 1 else None
+    )
+
+
+#fp32 weight size of the default model choices, used to make room in MODEL_MEMORY_MB
+#before a model is loaded for the first time (afterwards its measured size is used)
+MODEL_SIZE_ESTIMATES = {
+    "speech_to_text": {
+        "tiny": 151 * 1024 ** 2,
+        "base": 290 * 1024 ** 2,
+        "small": 967 * 1024 ** 2,
+        "medium": 3055 * 1024 ** 2,
+        "large": 6174 * 1024 ** 2
+    },
+    "text_summarizer": {
+        "facebook/bart-large-cnn": 1625 * 1024 ** 2
+    }
+}
+
+#models are loaded lazily on first use and kept while they fit in MODEL_MEMORY_MB,
+#the least recently used one is dropped when a new one doesn't fit
+model_registry = ModelRegistry(
+    loaders={
+        "speech_to_text": _load_speech_to_text,
+        "text_summarizer": _load_text_summarizer
+    },
+    importers={
+        "speech_to_text": _import_speech_to_text,
+        "text_summarizer": _import_text_summarizer
+    },
+    warmups={
+        "speech_to_text": lambda model: model.warm_up(),
+        "text_summarizer": lambda model: model.warm_up()
+    },
+    allowed={
+        "speech_to_text": _model_list("STT_MODELS", STT_MODEL_SIZE),
+        "text_summarizer": _model_list("SUMMARIZER_MODELS", SUMMARIZER_MODEL)
+    },
+    memory_budget_bytes=int(os.environ.get("MODEL_MEMORY_MB", "4096")) * 1024 * 1024,
+    size_estimates=MODEL_SIZE_ESTIMATES
+)
+
+#transcriptions and summaries are cached by content hash, so repeated uploads
+#and repeated summaries of the same text are answered without running a model
+result_cache = ResultCache(
+    os.environ.get("CACHE_DIR", os.path.join(BACKEND_DIR, "cache")),
+    max_bytes=int(os.environ.get("CACHE_MAX_MB", "1024")) * 1024 * 1024
+)
+
+#inference runs on bounded per-model thread pools, never on the event loop
+#concurrency and queue limits can be set with environment variables
+QUEUE_TIMEOUT = float(os.environ.get("INFERENCE_QUEUE_TIMEOUT", "0")) or None
+
+stt_executor = ModelExecutor(
+    "speech_to_text",
+    max_concurrency=int(os.environ.get("STT_CONCURRENCY", "1")),
+    max_queue=int(os.environ.get("STT_MAX_QUEUE", "4")),
+    queue_timeout=QUEUE_TIMEOUT
+)
+summarizer_executor = ModelExecutor(
+    "text_summarizer",
+    max_concurrency=int(os.environ.get("SUMMARIZER_CONCURRENCY", "1")),
+    max_queue=int(os.environ.get("SUMMARIZER_MAX_QUEUE", "8")),
+    queue_timeout=QUEUE_TIMEOUT
+)
+
+#concurrent summarize requests are collected for up to SUMMARY_BATCH_WAIT_MS and
+#run as one batched generate call (one summarizer_executor job per batch)
+summary_batcher = SummaryBatcher(
+    summarizer_executor,
+    lambda model_name: get_text_summarizer(model_name),
+    max_wait_ms=float(os.environ.get("SUMMARY_BATCH_WAIT_MS", "10")),
+    max_batch_size=int(os.environ.get("SUMMARY_MAX_BATCH", "8")),
+    max_batch_tokens=int(os.environ.get("SUMMARY_MAX_BATCH_TOKENS", "8192"))
+)
+
+#uploads are streamed to disk and rejected once they pass this size
+MAX_UPLOAD_BYTES = int(os.environ.get("MAX_UPLOAD_MB", "500")) * 1024 * 1024
+
+#background meeting jobs, queued in sqlite and processed by a worker pool
+JOBS_DIR = os.environ.get("JOBS_DIR", os.path.join(BACKEND_DIR, "jobs"))
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "1"))
+job_store = None
+job_workers = None
+
+#every transcript the api produces is kept with its segment times in a full-text
+#indexed store, /api/search finds meetings and offsets in it. it is the same store the
+#cli and the ingest daemon write to (TRANSCRIPT_DB, else transcriptions/ in the project)
+TRANSCRIPT_DB = default_store_path(os.path.join(os.path.dirname(BACKEND_DIR), "transcriptions"))
+transcript_store = None
+
+
+#startup: PRELOAD_IMPORTS (default on) imports the ml libraries in the background
+#so the first request doesn't pay for it, PRELOAD_MODELS also loads and warms up models:
+#"default" for the default whisper and summarizer, or a list like "stt:small,summarizer:facebook/bart-large-cnn"
+PRELOAD_IMPORTS = os.environ.get("PRELOAD_IMPORTS", "1") not in ("0", "false", "no")
+PRELOAD_MODELS = os.environ.get("PRELOAD_MODELS", "")
+
+MODEL_KINDS = {"stt": "speech_to_text", "summarizer": "text_summarizer"}
+preload_tasks = set()
+
+startup_state = {
+    "status": "starting",   #starting -> loading -> ready | failed
+    "started_at": None,
+    "seconds": None,
+    "imports": {},
+    "models": {},
+    "errors": {}
+}
+
+
+def preload_specs(setting):
+    #(kind, name) pairs from a PRELOAD_MODELS value
+    if not setting:
+        return []
+    if setting == "default":
+        return [("speech_to_text", STT_MODEL_SIZE), ("text_summarizer", SUMMARIZER_MODEL)]
+    specs = []
+    for item in setting.split(","):
+        kind, _, name = item.strip().partition(":")
+        if kind not in MODEL_KINDS:
+            raise ValueError(f"Unknown model kind '{kind}' in PRELOAD_MODELS, use stt:<size> or summarizer:<name>")
+        specs.append((MODEL_KINDS[kind], name or None))
+    return specs
+
+
+async def preload(specs, imports=False):
+    #import libraries and load models in parallel threads, the registry makes sure a
+    #model that a request is already loading isn't loaded a second time
+    def timed_import(kind):
+        start = time.perf_counter()
+        model_registry.importers[kind]()
+        startup_state["imports"][kind] = round(time.perf_counter() - start, 2)
+    
+    def load(kind, name):
+        name = name or (STT_MODEL_SIZE if kind == "speech_to_text" else SUMMARIZER_MODEL)
+        model_registry.check(kind, name)
+        model_registry.get(kind, name)
+        for entry in model_registry.stats()["resident"]:
+            if (entry["kind"], entry["name"]) == (kind, name):
+                startup_state["models"][f"{kind}:{name}"] = {"seconds": entry["load_seconds"], **entry["timings"]}
+    
+    tasks = {}
+    if imports:
+        for kind in model_registry.importers:
+            tasks[f"import {kind}"] = asyncio.to_thread(timed_import, kind)
+    for kind, name in specs:
+        tasks[f"{kind}:{name or 'default'}"] = asyncio.to_thread(load, kind, name)
+    
+    results = await asyncio.gather(*tasks.values(), return_exceptions=True)
+    errors = {}
+    for label, result in zip(tasks, results):
+        if isinstance(result, Exception):
+            errors[label] = result.detail if isinstance(result, HTTPException) else str(result)
+    return errors
+
+
+async def run_startup():
+    startup_state["status"] = "loading"
+    startup_state["started_at"] = datetime.now().isoformat()
+    start = time.perf_counter()
+    try:
+        errors = await preload(preload_specs(PRELOAD_MODELS), imports=PRELOAD_IMPORTS)
+    except ValueError as e:
+        errors = {"PRELOAD_MODELS": str(e)}
+    
+    startup_state["seconds"] = round(time.perf_counter() - start, 2)
+    startup_state["errors"] = errors
+    startup_state["status"] = "failed" if errors else "ready"
+    
+    print(f"Startup {startup_state['status']} in {startup_state['seconds']}s")
+    for kind, seconds in startup_state["imports"].items():
+        print(f"  import {kind}: {seconds}s")
+    for model, timings in startup_state["models"].items():
+        print(f"  {model}: " + ", ".join(f"{phase} {seconds}s" for phase, seconds in timings.items()))
+    for label, error in errors.items():
+        print(f"  {label} failed: {error}")
+
+
+@asynccontextmanager
+async def lifespan(app):
+    global job_store, job_workers, transcript_store
+    os.makedirs(os.path.join(JOBS_DIR, "audio"), exist_ok=True)
+    job_store = JobStore(os.path.join(JOBS_DIR, "jobs.db"))
+    transcript_store = TranscriptStore(TRANSCRIPT_DB)
+    job_workers = JobWorkerPool(job_store, process_meeting_job, num_workers=JOB_WORKERS)
+    job_workers.start()
+    
+    #preloading runs in the background so liveness probes are answered right away
+    startup_task = asyncio.create_task(run_startup())
+    
+    yield
+    
+    startup_task.cancel()
+    job_workers.stop()
+    job_store.close()
+    transcript_store.close()
 
-#lazy load models to avoid loading on startup
-speech_to_text = None
-text_summarizer = None
 
 app = FastAPI(
     title="Meeting Summarizer API",
     description="API for transcribing audio and summarizing text",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 #cors middleware for frontend
@@ -34,23 +285,59 @@ app.add_middleware(
 )
 
 
+#reject oversized uploads while the body is received, from the content-length header
+#when there is one, allowing some room for the multipart form headers
+app.add_middleware(UploadLimitMiddleware, max_bytes=MAX_UPLOAD_BYTES + 64 * 1024,
+                   upload_limit=MAX_UPLOAD_BYTES)
+
+
+#most summary lengths one summarize request may ask for
+MAX_SUMMARY_VARIANTS = 5
+
+
 #request/response models
+class SummaryLength(BaseModel):
+    max_length: int
+    min_length: int = 0
+
+
+class SummaryVariant(BaseModel):
+    max_length: int
+    min_length: int
+    summary: str
+    summary_length: int
+
+
 class SummarizeRequest(BaseModel):
+    model_config = ConfigDict(protected_namespaces=())
+    
     text: str
     max_length: Optional[int] = 150
     min_length: Optional[int] = 30
+    model_name: Optional[str] = None
+    #generation policy: "fast", "balanced" or "quality", and/or a deadline in seconds
+    preset: Optional[str] = None
+    latency_target_s: Optional[float] = None
+    #several summaries of the same text in one call, e.g. short, medium and long
+    #(max_length/min_length are ignored then, summary is the first variant)
+    lengths: Optional[list[SummaryLength]] = None
 
 
 class SummarizeResponse(BaseModel):
     summary: str
     original_length: int
     summary_length: int
+    #the generation policy that was used and how long the request took
+    policy: Optional[dict] = None
+    seconds: Optional[float] = None
+    variants: Optional[list[SummaryVariant]] = None
 
 
 class TranscriptionResponse(BaseModel):
     text: str
     language: str
     duration_seconds: Optional[float] = None
+    meeting_id: Optional[str] = None
 
 
 class ProcessMeetingRequest(BaseModel):
@@ -66,23 +353,272 @@ class ProcessMeetingResponse(BaseModel):
     summary: str
     language: Optional[str] = None
     processed_at: str
+    policy: Optional[dict] = None
+
+
+class SearchHit(BaseModel):
+    kind: str
+    start_ms: Optional[int] = None
+    end_ms: Optional[int] = None
+    text: str
+    snippet: str
+
+
+class SearchResult(BaseModel):
+    meeting_id: str
+    title: Optional[str] = None
+    created_at: str
+    language: Optional[str] = None
+    hits: list[SearchHit]
+
+
+class SearchResponse(BaseModel):
+    query: str
+    results: list[SearchResult]
+
+
+class JobStatusResponse(BaseModel):
+    meeting_id: str
+    status: str
+    stage: Optional[str] = None
+    progress: float
+    filename: Optional[str] = None
+    error: Optional[str] = None
+    created_at: str
+    updated_at: str
+
+
+#helper functions to get (and lazy-load) models, None = the default model
+#blocking on first use, call them on the model executors
+def get_speech_to_text(model_size=None):
+    return model_registry.get("speech_to_text", model_size or STT_MODEL_SIZE)
+
+
+def get_text_summarizer(model_name=None):
+    return model_registry.get("text_summarizer", model_name or SUMMARIZER_MODEL)
+
+
+#check requested model names before any work is queued, 400 for unknown models
+def resolve_stt_model(model_size):
+    model_size = model_size or STT_MODEL_SIZE
+    model_registry.check("speech_to_text", model_size)
+    return model_size
+
+
+def resolve_summarizer_model(model_name):
+    model_name = model_name or SUMMARIZER_MODEL
+    model_registry.check("text_summarizer", model_name)
+    return model_name
+
+
+#blocking model calls, these run on the model executors
+def run_transcription(audio_path, model_size=None):
+    return get_speech_to_text(model_size).transcribe(audio_path)
+
+
+def run_summary(text, max_length, min_length, model_name=None):
+    return get_text_summarizer(model_name).summarize(
+        text,
+        max_length=max_length,
+        min_length=min_length
+    )
+
+
+def summarize_transcription(transcription_text, max_length=150, min_length=30, model_name=None):
+    if len(transcription_text.split()) < 20:
+        #too short to summarize, return transcription as summary
+        return transcription_text
+    return run_summary(transcription_text, max_length, min_length, model_name)
+
+
+#cache keys, the audio is hashed as uploaded so a hit needs no decoding
+def transcription_cache_key(audio_hash, model_size=None):
+    return transcription_key(audio_hash, model_size or STT_MODEL_SIZE, quantize=STT_QUANTIZE)
+
 
+def summary_cache_key(text, max_length, min_length, model_name=None, **params):
+    return summary_key(text, model_name or SUMMARIZER_MODEL, max_length=max_length,
+                       min_length=min_length, quantize=SUMMARIZER_QUANTIZE,
+                       extractive_ratio=SUMMARIZER_EXTRACTIVE_RATIO, **params)
 
-#helper functions to lazy-load models
-def get_speech_to_text():
-    global speech_to_text
-    if speech_to_text is None:
-        from models.speechToText import SpeechToText
-        speech_to_text = SpeechToText(model_size="base")
-    return speech_to_text
 
+#generation policies: a preset or a latency target (or both) picks the beam width and
+#chunk budgets, requests with neither use the default settings through the batcher
+def check_generation_policy(preset, latency_target_s, max_length=None, min_length=None):
+    #400 for unknown presets and impossible settings, before any work is queued
+    if preset is not None and preset not in PRESETS:
+        raise HTTPException(status_code=400,
+                            detail=f"Unknown preset '{preset}'. Available: {', '.join(PRESETS)}")
+    if latency_target_s is not None and latency_target_s <= 0:
+        raise HTTPException(status_code=400, detail="latency_target_s must be positive.")
+    if max_length is not None and min_length is not None and not 0 <= min_length <= max_length:
+        raise HTTPException(status_code=400,
+                            detail="Summary lengths must satisfy 0 <= min_length <= max_length.")
 
-def get_text_summarizer():
-    global text_summarizer
-    if text_summarizer is None:
-        from models.textSummarizer import TextSummarizer
-        text_summarizer = TextSummarizer()
-    return text_summarizer
+
+#the policy reported for requests that use the default settings
+DEFAULT_POLICY = {"preset": DEFAULT_PRESET, "num_beams": PRESETS[DEFAULT_PRESET]["num_beams"],
+                  "map_budget": None, "batched": True}
+
+
+def run_policy_summary(text, max_length, min_length, model_name=None, preset=None,
+                       latency_target_s=None):
+    #blocking, returns {"summary", "policy"}
+    if len(text.split()) < 20:
+        #too short to summarize, return the text as summary
+        return {"summary": text, "policy": None}
+    return get_text_summarizer(model_name).summarize_with_policy(
+        text, max_length, min_length, preset=preset, latency_target_s=latency_target_s)
+
+
+def policy_summary_call(text, max_length, min_length, model_name, preset, latency_target_s):
+    #(cache key, args) for run_policy_summary, results of latency-targeted requests depend
+    #on the measured speed at the time and are not cached (key None)
+    args = (text, max_length, min_length, model_name, preset, latency_target_s)
+    if latency_target_s:
+        return None, args
+    return summary_cache_key(text, max_length, min_length, model_name, preset=preset), args
+
+
+#run a model call through its executor unless the result is already cached
+#the cache reads and writes json files, so it is used off the event loop too
+async def run_cached(executor, key, fn, *args):
+    result = await asyncio.to_thread(result_cache.get, key)
+    if result is None:
+        result = await executor.run(fn, *args)
+        await asyncio.to_thread(result_cache.put, key, result)
+    return result
+
+
+#summaries of one text for several lengths, the encoder runs once for all of them
+#variants that are cached already (from this or the plain summarize path) aren't run again
+async def summary_variants(text, lengths, model_name=None):
+    keys = [summary_cache_key(text, max_length, min_length, model_name) for max_length, min_length in lengths]
+    summaries = await asyncio.to_thread(lambda: [result_cache.get(key) for key in keys])
+    missing = [i for i, summary in enumerate(summaries) if summary is None]
+    if missing:
+        generated = await summarizer_executor.run(run_summary_variants, text,
+                                                  [lengths[i] for i in missing], model_name)
+        for i, summary in zip(missing, generated):
+            summaries[i] = summary
+        await asyncio.to_thread(lambda: [result_cache.put(keys[i], summaries[i]) for i in missing])
+    return summaries
+
+
+def run_summary_variants(text, lengths, model_name=None):
+    return get_text_summarizer(model_name).summarize_variants(text, lengths)
+
+
+#summary with a generation policy unless it is already cached
+async def policy_summary(text, max_length, min_length, model_name, preset, latency_target_s):
+    key, args = policy_summary_call(text, max_length, min_length, model_name, preset, latency_target_s)
+    if key is None:
+        return await summarizer_executor.run(run_policy_summary, *args)
+    return await run_cached(summarizer_executor, key, run_policy_summary, *args)
+
+
+#summary through the request batcher unless it is already cached
+async def batched_summary(text, max_length, min_length, model_name=None):
+    key = summary_cache_key(text, max_length, min_length, model_name)
+    result = await asyncio.to_thread(result_cache.get, key)
+    if result is None:
+        result = await summary_batcher.submit(text, max_length, min_length, model_name=model_name)
+        await asyncio.to_thread(result_cache.put, key, result)
+    return result
+
+
+#add a transcript to the search index, blocking (sqlite), returns its meeting id
+#a meeting that is already stored (a job processed again after a restart) is kept as is,
+#and audio transcribed before with the same model returns the earlier meeting's id
+def store_transcript(result, meeting_id=None, title=None, audio_hash=None, model_size=None):
+    if meeting_id and transcript_store.get(meeting_id, with_segments=False):
+        return meeting_id
+    if audio_hash:
+        existing = transcript_store.find_by_audio(audio_hash, model_size or STT_MODEL_SIZE)
+        if existing:
+            return existing
+    return transcript_store.add(
+        result["text"].strip(),
+        language=result.get("language"),
+        segments=result.get("segments"),
+        title=title,
+        audio_hash=audio_hash,
+        model=model_size or STT_MODEL_SIZE,
+        meeting_id=meeting_id
+    )
+
+
+#blocking version of run_cached for job worker threads
+def call_cached(executor, key, fn, *args):
+    result = result_cache.get(key)
+    if result is None:
+        result = executor.call(fn, *args)
+        result_cache.put(key, result)
+    return result
+
+
+#runs on a job worker thread: the same pipeline as /api/process-meeting
+def process_meeting_job(job, report):
+    #jobs queued before model selection existed have no params and use the defaults
+    model_size = job["params"].get("model_size")
+    model_name = job["params"].get("model_name")
+    max_length = job["params"].get("max_summary_length", 150)
+    min_length = job["params"].get("min_summary_length", 30)
+    preset = job["params"].get("preset")
+    latency_target_s = job["params"].get("latency_target_s")
+    try:
+        report("transcribing", 0.1)
+        audio_hash = hash_file(job["audio_path"])
+        transcription_result = call_cached(
+            stt_executor,
+            transcription_cache_key(audio_hash, model_size),
+            run_transcription,
+            job["audio_path"],
+            model_size
+        )
+        meeting_id = store_transcript(transcription_result, job["meeting_id"], job["filename"],
+                                      audio_hash, model_size)
+        
+        report("summarizing", 0.7)
+        policy = None
+        if preset or latency_target_s:
+            key, args = policy_summary_call(transcription_result["text"], max_length, min_length,
+                                            model_name, preset, latency_target_s)
+            if key is None:
+                result = summarizer_executor.call(run_policy_summary, *args)
+            else:
+                result = call_cached(summarizer_executor, key, run_policy_summary, *args)
+            summary, policy = result["summary"], result["policy"]
+        else:
+            summary = call_cached(
+                summarizer_executor,
+                summary_cache_key(transcription_result["text"], max_length, min_length, model_name),
+                summarize_transcription,
+                transcription_result["text"],
+                max_length,
+                min_length,
+                model_name
+            )
+        
+        return ProcessMeetingResponse(
+            meeting_id=meeting_id,
+            transcription=transcription_result["text"],
+            summary=summary,
+            language=transcription_result["language"],
+            processed_at=datetime.now().isoformat(),
+            policy=policy
+        ).model_dump()
+    
+    finally:
+        if os.path.exists(job["audio_path"]):
+            os.unlink(job["audio_path"])
+
+
+def get_job_or_404(meeting_id):
+    job = job_store.get(meeting_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {meeting_id} not found")
+    return job
 
 
 #api endpoints
@@ -93,47 +629,73 @@ async def root():
 
 @app.get("/api/health")
 async def health_check():
+    #the job counts are a sqlite query, run off the event loop like the other job reads
+    jobs = await asyncio.to_thread(job_store.counts) if job_store else {}
     return {
         "status": "healthy",
-        "models": {
-            "speech_to_text": speech_to_text is not None,
-            "text_summarizer": text_summarizer is not None
-        }
+        "models": model_registry.stats(),
+        "inference": {
+            "speech_to_text": stt_executor.stats(),
+            "text_summarizer": summarizer_executor.stats(),
+            "summary_batching": summary_batcher.stats()
+        },
+        "jobs": jobs,
+        "cache": result_cache.stats()
     }
 
 
+#liveness probe: the server is up and its event loop responds
+@app.get("/api/live")
+async def liveness():
+    return {"status": "alive"}
+
+
+#readiness probe: 200 once startup preloading finished, 503 while loading or after a failure
+#the body has the startup timing per phase (imports, weights, warm-up)
+@app.get("/api/ready")
+async def readiness():
+    status_code = 200 if startup_state["status"] == "ready" else 503
+    return JSONResponse(status_code=status_code, content=startup_state)
+
+
+#hit/miss statistics of the transcription and summary cache
+@app.get("/api/cache/stats")
+async def cache_stats():
+    return result_cache.stats()
+
+
 #transcribe an audio file to text using whisper
 #accepts audio files (mp3, wav, webm, m4a, etc.)
 @app.post("/api/transcribe", response_model=TranscriptionResponse)
-async def transcribe_audio(file: UploadFile = File(...)):
-    if not file.filename:
-        raise HTTPException(status_code=400, detail="No file provided")
-    
-    #save uploaded file temporarily
-    suffix = os.path.splitext(file.filename)[1] or ".webm"
+async def transcribe_audio(file: UploadFile = File(...), model_size: Optional[str] = Form(None)):
+    check_audio_upload(file, MAX_UPLOAD_BYTES)
+    model_size = resolve_stt_model(model_size)
+    #copied to disk in chunks with the size limit enforced while copying, so uploads
+    #without a declared size are rejected too, and ffmpeg gets a file it can seek in
+    audio_path = await save_upload(file, MAX_UPLOAD_BYTES)
     
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-            content = await file.read()
-            tmp.write(content)
-            tmp_path = tmp.name
-        
-        #transcribe
-        stt = get_speech_to_text()
-        result = stt.transcribe(tmp_path)
+        #hashing runs off the event loop
+        audio_hash = await asyncio.to_thread(hash_file, audio_path)
+        key = transcription_cache_key(audio_hash, model_size)
+        result = await run_cached(stt_executor, key, run_transcription, audio_path, model_size)
+        meeting_id = await asyncio.to_thread(
+            store_transcript, result, None, file.filename, audio_hash, model_size)
         
         return TranscriptionResponse(
             text=result["text"],
-            language=result["language"]
+            language=result["language"],
+            meeting_id=meeting_id
         )
     
+    except HTTPException:
+        raise
+    
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Transcription failed: {str(e)}")
     
     finally:
-        #clean up temp file
-        if os.path.exists(tmp_path):
-            os.unlink(tmp_path)
+        os.unlink(audio_path)
 
 
 #summarize the given text using bart model
@@ -145,20 +707,57 @@ async def summarize_text(request: SummarizeRequest):
             detail="Text is too short to summarize. Minimum 50 characters required."
         )
     
+    check_generation_policy(request.preset, request.latency_target_s,
+                            request.max_length, request.min_length)
+    if request.lengths is not None:
+        if not 1 <= len(request.lengths) <= MAX_SUMMARY_VARIANTS:
+            raise HTTPException(status_code=400,
+                                detail=f"Ask for 1 to {MAX_SUMMARY_VARIANTS} summary lengths.")
+        if request.preset or request.latency_target_s:
+            raise HTTPException(status_code=400,
+                                detail="lengths can't be combined with preset or latency_target_s.")
+        for length in request.lengths:
+            check_generation_policy(None, None, length.max_length, length.min_length)
+    
     try:
-        summarizer = get_text_summarizer()
-        summary = summarizer.summarize(
-            request.text,
-            max_length=request.max_length,
-            min_length=request.min_length
-        )
+        start = time.perf_counter()
+        model_name = resolve_summarizer_model(request.model_name)
+        if request.lengths:
+            lengths = [(length.max_length, length.min_length) for length in request.lengths]
+            summaries = await summary_variants(request.text, lengths, model_name)
+            variants = [
+                SummaryVariant(max_length=max_length, min_length=min_length, summary=summary,
+                               summary_length=len(summary.split()))
+                for (max_length, min_length), summary in zip(lengths, summaries)
+            ]
+            return SummarizeResponse(
+                summary=summaries[0],
+                original_length=len(request.text.split()),
+                summary_length=len(summaries[0].split()),
+                policy={**DEFAULT_POLICY, "batched": False},
+                seconds=round(time.perf_counter() - start, 2),
+                variants=variants
+            )
+        
+        if request.preset or request.latency_target_s:
+            result = await policy_summary(request.text, request.max_length, request.min_length,
+                                          model_name, request.preset, request.latency_target_s)
+            summary, policy = result["summary"], result["policy"]
+        else:
+            summary = await batched_summary(request.text, request.max_length, request.min_length, model_name)
+            policy = DEFAULT_POLICY
         
         return SummarizeResponse(
             summary=summary,
             original_length=len(request.text.split()),
-            summary_length=len(summary.split())
+            summary_length=len(summary.split()),
+            policy=policy,
+            seconds=round(time.perf_counter() - start, 2)
         )
     
+    except HTTPException:
+        raise
+    
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Summarization failed: {str(e)}")
 
@@ -166,64 +765,307 @@ async def summarize_text(request: SummarizeRequest):
 #full pipeline: transcribe audio and summarize in one call
 #this is the main endpoint for processing meeting recordings
 @app.post("/api/process-meeting", response_model=ProcessMeetingResponse)
-async def process_meeting(file: UploadFile = File(...)):
-    if not file.filename:
-        raise HTTPException(status_code=400, detail="No audio file provided")
-    
-    suffix = os.path.splitext(file.filename)[1] or ".webm"
-    tmp_path = None
+async def process_meeting(file: UploadFile = File(...), model_size: Optional[str] = Form(None),
+                          model_name: Optional[str] = Form(None),
+                          max_summary_length: int = Form(150), min_summary_length: int = Form(30),
+                          preset: Optional[str] = Form(None),
+                          latency_target_s: Optional[float] = Form(None)):
+    check_audio_upload(file, MAX_UPLOAD_BYTES)
+    model_size = resolve_stt_model(model_size)
+    model_name = resolve_summarizer_model(model_name)
+    check_generation_policy(preset, latency_target_s, max_summary_length, min_summary_length)
+    audio_path = await save_upload(file, MAX_UPLOAD_BYTES)
     
     try:
-        #save uploaded file
-        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-            content = await file.read()
-            tmp.write(content)
-            tmp_path = tmp.name
-        
         #step 1: transcribe
-        stt = get_speech_to_text()
-        transcription_result = stt.transcribe(tmp_path)
+        audio_hash = await asyncio.to_thread(hash_file, audio_path)
+        key = transcription_cache_key(audio_hash, model_size)
+        transcription_result = await run_cached(stt_executor, key, run_transcription, audio_path, model_size)
         transcription_text = transcription_result["text"]
         detected_language = transcription_result["language"]
+        meeting_id = await asyncio.to_thread(
+            store_transcript, transcription_result, None, file.filename, audio_hash, model_size)
         
         #step 2: summarize
-        summarizer = get_text_summarizer()
-        
+        policy = None
         if len(transcription_text.split()) < 20:
             #too short to summarize, return transcription as summary
             summary = transcription_text
+        elif preset or latency_target_s:
+            result = await policy_summary(transcription_text, max_summary_length, min_summary_length,
+                                          model_name, preset, latency_target_s)
+            summary, policy = result["summary"], result["policy"]
         else:
-            summary = summarizer.summarize(
-                transcription_text,
-                max_length=150,
-                min_length=30
-            )
+            summary = await batched_summary(transcription_text, max_summary_length,
+                                            min_summary_length, model_name)
         
         return ProcessMeetingResponse(
-            meeting_id=str(uuid.uuid4()),
+            meeting_id=meeting_id,
             transcription=transcription_text,
             summary=summary,
             language=detected_language,
-            processed_at=datetime.now().isoformat()
+            processed_at=datetime.now().isoformat(),
+            policy=policy
         )
     
+    except HTTPException:
+        raise
+    
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Processing failed: {str(e)}")
     
     finally:
-        if tmp_path and os.path.exists(tmp_path):
-            os.unlink(tmp_path)
+        os.unlink(audio_path)
 
 
-#preload ml models in the background for faster first request
-#call this on app startup
-@app.post("/api/preload-models")
-async def preload_models(background_tasks: BackgroundTasks):
-    def load():
-        get_speech_to_text()
-        get_text_summarizer()
+#queue a meeting recording for background processing
+#returns the meeting_id right away, poll /api/jobs/{meeting_id} for progress
+@app.post("/api/jobs/process-meeting", response_model=JobStatusResponse, status_code=202)
+async def submit_meeting_job(file: UploadFile = File(...), model_size: Optional[str] = Form(None),
+                             model_name: Optional[str] = Form(None),
+                             max_summary_length: int = Form(150), min_summary_length: int = Form(30),
+                             preset: Optional[str] = Form(None),
+                             latency_target_s: Optional[float] = Form(None)):
+    check_generation_policy(preset, latency_target_s, max_summary_length, min_summary_length)
+    params = {
+        "model_size": resolve_stt_model(model_size),
+        "model_name": resolve_summarizer_model(model_name),
+        "max_summary_length": max_summary_length,
+        "min_summary_length": min_summary_length,
+        "preset": preset,
+        "latency_target_s": latency_target_s
+    }
+    meeting_id = str(uuid.uuid4())
+    suffix = os.path.splitext(file.filename or "")[1] or ".webm"
+    audio_path = await save_upload(
+        file,
+        MAX_UPLOAD_BYTES,
+        path=os.path.join(JOBS_DIR, "audio", meeting_id + suffix)
+    )
     
-    background_tasks.add_task(load)
+    job = await asyncio.to_thread(job_store.create, meeting_id, file.filename, audio_path, params)
+    job_workers.notify()
+    return JobStatusResponse(**job)
+
+
+@app.get("/api/jobs/{meeting_id}", response_model=JobStatusResponse)
+async def get_job_status(meeting_id: str):
+    return JobStatusResponse(**await asyncio.to_thread(get_job_or_404, meeting_id))
+
+
+#result of a finished job, 409 while it is still queued or running
+@app.get("/api/jobs/{meeting_id}/result", response_model=ProcessMeetingResponse)
+async def get_job_result(meeting_id: str):
+    job = await asyncio.to_thread(get_job_or_404, meeting_id)
+    
+    if job["status"] == FAILED:
+        raise HTTPException(status_code=500, detail=f"Processing failed: {job['error']}")
+    if job["status"] != DONE:
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']} ({job['stage']})")
+    
+    return ProcessMeetingResponse(**job["result"])
+
+
+#server-sent events with the job status, sent whenever it changes until the job ends
+@app.get("/api/jobs/{meeting_id}/events")
+async def stream_job_events(meeting_id: str):
+    await asyncio.to_thread(get_job_or_404, meeting_id)
+    
+    async def events():
+        last = None
+        while True:
+            #the job store is sqlite, read it off the event loop
+            job = await asyncio.to_thread(job_store.get, meeting_id)
+            status = JobStatusResponse(**job).model_dump()
+            if status != last:
+                yield f"data: {json.dumps(status)}\n\n"
+                last = status
+            if job["status"] in (DONE, FAILED):
+                break
+            await asyncio.sleep(0.5)
+    
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+#full-text search over every transcript the api produced
+#q: words that must all appear in a segment (the last one can be the start of a word)
+#since / until: only meetings transcribed in this range (iso dates or timestamps)
+#start_ms / end_ms: only segments overlapping this part of the meetings
+#returns the matching meetings, best first, with the offsets of their matching segments
+@app.get("/api/search", response_model=SearchResponse)
+async def search_transcripts(q: str, since: Optional[str] = None, until: Optional[str] = None,
+                             start_ms: Optional[int] = None, end_ms: Optional[int] = None,
+                             limit: int = 20):
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="Search query is empty.")
+    results = await asyncio.to_thread(
+        transcript_store.search,
+        q,
+        since=since,
+        until=until,
+        start=start_ms / 1000 if start_ms is not None else None,
+        end=end_ms / 1000 if end_ms is not None else None,
+        limit=max(1, min(limit, 100))
+    )
+    return SearchResponse(query=q, results=results)
+
+
+#a stored transcript with its segments, to jump to a search hit
+@app.get("/api/transcripts/{meeting_id}")
+async def get_transcript(meeting_id: str):
+    meeting = await asyncio.to_thread(transcript_store.get, meeting_id)
+    if meeting is None:
+        raise HTTPException(status_code=404, detail=f"Transcript {meeting_id} not found")
+    return meeting
+
+
+#live transcription: the client sends audio chunks as binary messages while it
+#records (MediaRecorder webm/opus by default, or raw 16 kHz s16le with ?format=pcm16)
+#and {"type": "stop"} as a text message when it is done. the server answers with
+#{"type": "partial"|"final", "start", "end", "text"} messages as the transcript
+#grows and {"type": "done", "text", "language", "meeting_id"} at the end. with ?summary_interval=60
+#it also sends {"type": "summary", "text"} with a summary of the meeting so far
+#every 60 seconds, and once more at the end
+@app.websocket("/ws/transcribe")
+async def stream_transcription(websocket: WebSocket, language: Optional[str] = None,
+                               format: str = "webm", summary_interval: float = 0,
+                               model_size: Optional[str] = None):
+    await websocket.accept()
+    from models.streamingTranscriber import StreamingTranscriber
+    
+    try:
+        model_size = resolve_stt_model(model_size)
+        decoder = StreamingDecoder(format)
+        stt = await stt_executor.run(get_speech_to_text, model_size)
+    except Exception as e:
+        detail = e.detail if isinstance(e, HTTPException) else str(e)
+        await websocket.send_json({"type": "error", "detail": detail})
+        await websocket.close(code=1011)
+        return
+    
+    transcriber = StreamingTranscriber(stt, language=language)
+    received = asyncio.Event()
+    rolling = None
+    summary_task = None
+    finals = []
+    next_summary = asyncio.get_running_loop().time() + summary_interval
+    
+    async def receive_audio():
+        #runs next to the transcription loop so audio keeps arriving during inference
+        #returns True when the client asked to stop, False when it disconnected
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return False
+            if message.get("bytes"):
+                #writing to ffmpeg can block when its pipe is full
+                await asyncio.to_thread(decoder.feed, message["bytes"])
+                received.set()
+            elif message.get("text"):
+                try:
+                    if json.loads(message["text"]).get("type") == "stop":
+                        return True
+                except ValueError:
+                    pass
+    
+    async def send_segments(result):
+        for kind in ("final", "partial"):
+            if result.get(kind):
+                await websocket.send_json({"type": kind, **result[kind]})
+        if result.get("final"):
+            finals.append(result["final"])
+            if rolling is not None:
+                rolling.add(result["final"]["text"])
+    
+    async def send_summary():
+        #the rolling summary only summarizes new chunks, so this stays cheap in long meetings
+        try:
+            summary = await summarizer_executor.run(rolling.current)
+            if summary:
+                await websocket.send_json({"type": "summary", "text": summary})
+        except HTTPException:
+            pass
+    
+    receiver = asyncio.create_task(receive_audio())
+    try:
+        if summary_interval > 0:
+            summarizer = await summarizer_executor.run(get_text_summarizer)
+            rolling = summarizer.rolling_summary()
+        
+        while not receiver.done():
+            #decoded audio trickles in from the decoder thread, so check regularly
+            try:
+                await asyncio.wait_for(received.wait(), timeout=0.25)
+            except asyncio.TimeoutError:
+                pass
+            received.clear()
+            transcriber.append(decoder.read())
+            if not transcriber.ready():
+                continue
+            try:
+                await send_segments(await stt_executor.run(transcriber.process))
+            except HTTPException as e:
+                #model busy, the audio stays buffered and goes into the next pass
+                await websocket.send_json({"type": "busy", "detail": e.detail})
+                await asyncio.sleep(1)
+            
+            #summaries run next to transcription, at most one at a time
+            now = asyncio.get_running_loop().time()
+            if rolling is not None and now >= next_summary and (summary_task is None or summary_task.done()):
+                summary_task = asyncio.create_task(send_summary())
+                next_summary = now + summary_interval
+        
+        if not receiver.result():
+            return
+        
+        await asyncio.to_thread(decoder.close)
+        transcriber.append(decoder.read())
+        for segment in await stt_executor.run(transcriber.finish):
+            await websocket.send_json({"type": "final", **segment})
+            finals.append(segment)
+            if rolling is not None:
+                rolling.add(segment["text"])
+        if rolling is not None:
+            if summary_task is not None:
+                await summary_task
+            await send_summary()
+        meeting_id = None
+        if finals:
+            meeting_id = await asyncio.to_thread(store_transcript, {
+                "text": transcriber.text,
+                "language": transcriber.language,
+                "segments": finals
+            }, None, "live", None, model_size)
+        await websocket.send_json({
+            "type": "done",
+            "text": transcriber.text,
+            "language": transcriber.language or "unknown",
+            "meeting_id": meeting_id
+        })
+        await websocket.close()
+    
+    except WebSocketDisconnect:
+        pass
+    
+    except Exception as e:
+        await websocket.send_json({"type": "error", "detail": f"Transcription failed: {str(e)}"})
+        await websocket.close(code=1011)
+    
+    finally:
+        receiver.cancel()
+        if summary_task is not None:
+            summary_task.cancel()
+        await asyncio.to_thread(decoder.close)
+
+
+#preload the default models in the background for faster first request
+#safe to call any time, models that are loaded or loading aren't loaded again
+@app.post("/api/preload-models")
+async def preload_models():
+    task = asyncio.create_task(preload(preload_specs("default")))
+    #keep a reference until it's done, the event loop only holds tasks weakly
+    preload_tasks.add(task)
+    task.add_done_callback(preload_tasks.discard)
     return {"message": "Models loading in background"}
 
 
@@ -0,0 +1,123 @@
+#micro-batching for summarization requests
+#concurrent /api/summarize calls are collected for a few milliseconds and the
+#ones with the same generation settings are summarized together in one padded
+#generate call, then every caller gets its own result back. waiting longer and
+#allowing bigger batches raises throughput under load, at the cost of latency
+
+import asyncio
+import threading
+
+
+#bart's input limit, longer texts are summarized on their own with the chunked path
+MAX_INPUT_TOKENS = 1024
+
+
+def estimate_tokens(text):
+    #rough bpe token count without running the tokenizer on the event loop
+    return len(text) // 4 + 1
+
+
+class SummaryBatcher:
+    def __init__(self, executor, get_summarizer, max_wait_ms=10, max_batch_size=8,
+                 max_batch_tokens=8192):
+        #executor: ModelExecutor the batches run on (one batch = one job)
+        #get_summarizer: fn(model_name) returning the loaded TextSummarizer, called on the executor thread
+        #max_wait_ms: how long the first request of a batch waits for others to join
+        #max_batch_size: requests per batch, a full batch is sent right away
+        #max_batch_tokens: estimated input tokens per batch, a batch over it is sent right away
+        self.executor = executor
+        self.get_summarizer = get_summarizer
+        self.max_wait = max_wait_ms / 1000
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_batch_tokens = max_batch_tokens
+
+        self._groups = {}           #generation params -> open batch
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.batches = 0
+        self.largest_batch = 0
+
+    async def submit(self, text, max_length=150, min_length=30, num_beams=4, model_name=None):
+        #summarize text as part of the next batch with the same settings, returns the summary
+        #model_name: summarizer checkpoint, None = the default one
+        #raises the executor's HTTPException (429/503) when the model is overloaded
+        params = (max_length, min_length, num_beams, model_name)
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        batch = self._groups.get(params)
+        if batch is None:
+            batch = {"items": [], "tokens": 0, "timer": None}
+            self._groups[params] = batch
+            batch["timer"] = loop.call_later(self.max_wait, self._flush, params)
+        batch["items"].append((text, future))
+        batch["tokens"] += estimate_tokens(text)
+
+        if len(batch["items"]) >= self.max_batch_size or batch["tokens"] >= self.max_batch_tokens:
+            batch["timer"].cancel()
+            self._flush(params)
+
+        return await future
+
+    def _flush(self, params):
+        #close the open batch for these params and run it in the background
+        batch = self._groups.pop(params, None)
+        if batch is not None:
+            asyncio.ensure_future(self._run(params, batch["items"]))
+
+    async def _run(self, params, items):
+        texts = [text for text, _ in items]
+        futures = [future for _, future in items]
+        try:
+            summaries = await self.executor.run(self._summarize_batch, texts, *params)
+        except Exception as e:
+            for future in futures:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        with self._lock:
+            self.requests += len(items)
+            self.batches += 1
+            self.largest_batch = max(self.largest_batch, len(items))
+        for future, summary in zip(futures, summaries):
+            if not future.done():
+                future.set_result(summary)
+
+    def _summarize_batch(self, texts, max_length, min_length, num_beams, model_name):
+        #runs on the executor thread: one generate call for all texts that fit the model,
+        #texts that need chunking go through summarize() one by one
+        summarizer = self.get_summarizer(model_name)
+        token_counts = [len(ids) for ids in summarizer.tokenizer(texts)["input_ids"]]
+        short = [i for i, count in enumerate(token_counts) if count <= MAX_INPUT_TOKENS]
+
+        summaries = [None] * len(texts)
+        if short:
+            generated = summarizer._generate_batch(
+                [texts[i] for i in short],
+                max_length=max_length,
+                min_length=min_length,
+                num_beams=num_beams,
+                batch_size=len(short),
+                early_stopping=True
+            )
+            for i, summary in zip(short, generated):
+                summaries[i] = summary
+
+        for i, count in enumerate(token_counts):
+            if count > MAX_INPUT_TOKENS:
+                summaries[i] = summarizer.summarize(texts[i], max_length, min_length,
+                                                    num_beams=num_beams)
+        return summaries
+
+    def stats(self):
+        with self._lock:
+            return {
+                "max_wait_ms": round(self.max_wait * 1000, 1),
+                "max_batch_size": self.max_batch_size,
+                "max_batch_tokens": self.max_batch_tokens,
+                "requests": self.requests,
+                "batches": self.batches,
+                "avg_batch_size": round(self.requests / self.batches, 2) if self.batches else None,
+                "largest_batch": self.largest_batch
+            }
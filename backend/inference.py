@@ -0,0 +1,122 @@
+#bounded executors that run model inference off the event loop
+#each model gets its own small thread pool so a long whisper job can't block
+#the server (health checks, uploads) or starve the other model
+
+import asyncio
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException
+
+
+class ModelExecutor:
+    def __init__(self, name, max_concurrency=1, max_queue=4, queue_timeout=None):
+        #name: label used in thread names, errors and stats
+        #max_concurrency: jobs of this model that may run at the same time
+        #max_queue: jobs allowed to wait for a free slot, more are rejected with 429
+        #queue_timeout: seconds a job may wait for a slot before it gives up with 503 (None = wait forever)
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_concurrency,
+            thread_name_prefix=f"{name}-inference"
+        )
+
+        self._lock = threading.Lock()
+        self.pending = 0            #admitted jobs, waiting or running
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.avg_seconds = None     #moving average of job duration
+
+    @property
+    def queue_depth(self):
+        return self.pending - self.running
+
+    def retry_after(self):
+        #rough number of seconds until a new job could get a slot
+        avg = self.avg_seconds or 1.0
+        waves = (self.queue_depth + 1) / self.max_concurrency
+        return max(1, math.ceil(waves * avg))
+
+    async def run(self, fn, *args, **kwargs):
+        #run fn(*args, **kwargs) on this model's pool and await the result
+        #raises HTTPException 429 when the queue is full, 503 when the wait times out
+        with self._lock:
+            if self.pending >= self.max_concurrency + self.max_queue:
+                self.rejected += 1
+                raise HTTPException(
+                    status_code=429,
+                    detail=f"{self.name} is busy ({self.queue_depth} job(s) queued). Try again later.",
+                    headers={"Retry-After": str(self.retry_after())}
+                )
+            self.pending += 1
+
+        future = self.executor.submit(self._call, fn, args, kwargs)
+        future.add_done_callback(self._release)
+        wrapped = asyncio.wrap_future(future)
+
+        if self.queue_timeout:
+            done, _ = await asyncio.wait({wrapped}, timeout=self.queue_timeout)
+            #cancel only succeeds while the job is still waiting for a slot
+            if not done and future.cancel():
+                with self._lock:
+                    self.timed_out += 1
+                raise HTTPException(
+                    status_code=503,
+                    detail=f"{self.name} queue wait exceeded {self.queue_timeout}s. Try again later.",
+                    headers={"Retry-After": str(self.retry_after())}
+                )
+
+        return await wrapped
+
+    def call(self, fn, *args, **kwargs):
+        #blocking version of run for background threads (e.g. job workers)
+        #waits for a slot without a queue limit, the caller bounds its own work
+        with self._lock:
+            self.pending += 1
+        future = self.executor.submit(self._call, fn, args, kwargs)
+        future.add_done_callback(self._release)
+        return future.result()
+
+    def _call(self, fn, args, kwargs):
+        #runs on a pool thread, tracks how long jobs take
+        with self._lock:
+            self.running += 1
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.running -= 1
+                self.completed += 1
+                if self.avg_seconds is None:
+                    self.avg_seconds = elapsed
+                else:
+                    self.avg_seconds = 0.8 * self.avg_seconds + 0.2 * elapsed
+
+    def _release(self, future):
+        with self._lock:
+            self.pending -= 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "max_concurrency": self.max_concurrency,
+                "max_queue": self.max_queue,
+                "running": self.running,
+                "queued": self.pending - self.running,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "timed_out": self.timed_out,
+                "avg_seconds": round(self.avg_seconds, 3) if self.avg_seconds is not None else None
+            }
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
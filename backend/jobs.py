@@ -0,0 +1,180 @@
+#persistent background jobs for processing meetings
+#jobs live in a small sqlite database so queued work survives a restart,
+#a pool of worker threads claims them one at a time and records progress
+
+import json
+import sqlite3
+import threading
+import traceback
+from datetime import datetime
+
+
+#job states
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class JobStore:
+    def __init__(self, db_path):
+        #db_path: sqlite database file, created if it doesn't exist
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                meeting_id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                stage TEXT,
+                progress REAL NOT NULL DEFAULT 0,
+                filename TEXT,
+                audio_path TEXT,
+                params TEXT,
+                result TEXT,
+                error TEXT,
+                created_at TEXT NOT NULL,
+                updated_at TEXT NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, created_at)")
+
+    def create(self, meeting_id, filename, audio_path, params=None):
+        #add a new job to the end of the queue
+        now = datetime.now().isoformat()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (meeting_id, status, stage, filename, audio_path, params, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (meeting_id, QUEUED, QUEUED, filename, audio_path, json.dumps(params or {}), now, now)
+            )
+        return self.get(meeting_id)
+
+    def claim(self):
+        #take the oldest queued job and mark it running, returns None if the queue is empty
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT meeting_id FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1",
+                    (QUEUED,)
+                ).fetchone()
+                if row is None:
+                    self._conn.execute("COMMIT")
+                    return None
+                self._conn.execute(
+                    "UPDATE jobs SET status = ?, stage = ?, updated_at = ? WHERE meeting_id = ?",
+                    (RUNNING, "starting", datetime.now().isoformat(), row["meeting_id"])
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return self.get(row["meeting_id"])
+
+    def update(self, meeting_id, **fields):
+        #update some columns of a job, result is stored as json
+        if "result" in fields:
+            fields["result"] = json.dumps(fields["result"])
+        fields["updated_at"] = datetime.now().isoformat()
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self._conn.execute(
+                f"UPDATE jobs SET {columns} WHERE meeting_id = ?",
+                (*fields.values(), meeting_id)
+            )
+
+    def get(self, meeting_id):
+        #get one job as a dict, or None if it doesn't exist
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM jobs WHERE meeting_id = ?", (meeting_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["params"] = json.loads(job["params"] or "{}")
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def requeue_interrupted(self):
+        #jobs that were running when the server stopped go back to the queue
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ?, stage = ?, progress = 0, updated_at = ? WHERE status = ?",
+                (QUEUED, QUEUED, datetime.now().isoformat(), RUNNING)
+            )
+        return cursor.rowcount
+
+    def counts(self):
+        #number of jobs in each state
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT status, COUNT(*) AS n FROM jobs GROUP BY status"
+            ).fetchall()
+        return {row["status"]: row["n"] for row in rows}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class JobWorkerPool:
+    def __init__(self, store, handler, num_workers=1, poll_interval=2.0):
+        #store: JobStore to take jobs from
+        #handler: function(job, report) that processes a job and returns its result dict,
+        #         report(stage, progress) records progress between 0 and 1
+        #num_workers: number of jobs processed at the same time
+        #poll_interval: seconds between queue checks when idle
+        self.store = store
+        self.handler = handler
+        self.num_workers = num_workers
+        self.poll_interval = poll_interval
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._threads = []
+
+    def start(self):
+        requeued = self.store.requeue_interrupted()
+        if requeued:
+            print(f"Re-queued {requeued} interrupted job(s)")
+
+        for i in range(self.num_workers):
+            thread = threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def notify(self):
+        #wake idle workers after a new job was queued
+        self._wakeup.set()
+
+    def stop(self, timeout=5.0):
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def _work(self):
+        while not self._stopping.is_set():
+            job = self.store.claim()
+            if job is None:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+            self._run(job)
+
+    def _run(self, job):
+        meeting_id = job["meeting_id"]
+
+        def report(stage, progress):
+            self.store.update(meeting_id, stage=stage, progress=progress)
+
+        try:
+            result = self.handler(job, report)
+            self.store.update(meeting_id, status=DONE, stage=DONE, progress=1.0, result=result)
+        except Exception as e:
+            traceback.print_exc()
+            self.store.update(meeting_id, status=FAILED, stage=FAILED, error=str(e))
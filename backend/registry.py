@@ -0,0 +1,167 @@
+#registry of loaded models
+#serves several whisper sizes and summarizer checkpoints side by side. models are
+#loaded on first use, kept warm in least-recently-used order and evicted when the
+#resident models would take more RAM than the budget, before the new model is loaded
+#so the two never have to fit in memory together. concurrent first requests
+#for the same model wait for one load instead of loading it twice. every load is
+#timed per phase: imports, weights and a warm-up inference
+
+import threading
+import time
+from collections import OrderedDict
+
+from fastapi import HTTPException
+
+
+def model_bytes(model):
+    #memory taken by a model's weights, from the state dict of its torch module so
+    #int8 packed weights of quantized layers count too, tied weights are counted once
+    module = getattr(model, "model", model)
+    total = 0
+    seen = set()
+    for value in module.state_dict().values():
+        for tensor in (value if isinstance(value, tuple) else (value,)):
+            if not hasattr(tensor, "data_ptr") or tensor.data_ptr() in seen:
+                continue
+            seen.add(tensor.data_ptr())
+            total += tensor.numel() * tensor.element_size()
+    return total
+
+
+class ModelRegistry:
+    def __init__(self, loaders, allowed, memory_budget_bytes, importers=None, warmups=None,
+                 size_estimates=None):
+        #loaders: {kind: fn(name) -> model}, e.g. {"speech_to_text": lambda size: SpeechToText(size)}
+        #allowed: {kind: names that may be requested}, anything else is rejected with 400
+        #memory_budget_bytes: total weight size of resident models before old ones are evicted
+        #                     (the model just loaded always stays, even if it alone is bigger)
+        #importers: optional {kind: fn()} importing the libraries a kind needs, timed on its own
+        #warmups: optional {kind: fn(model)} running a tiny inference right after loading
+        #size_estimates: optional {kind: {name: bytes}}, expected weight size of models that
+        #                were not loaded yet, so room can be made for them before loading
+        self.loaders = loaders
+        self.importers = importers or {}
+        self.warmups = warmups or {}
+        self.allowed = {kind: list(names) for kind, names in allowed.items()}
+        self.memory_budget = memory_budget_bytes
+        self.size_estimates = size_estimates or {}
+
+        self._lock = threading.Lock()
+        self._resident = OrderedDict()      #(kind, name) -> entry, least recently used first
+        self._loading = {}                  #(kind, name) -> lock held by the loading thread
+        self._known_bytes = {}              #(kind, name) -> measured size, kept after eviction
+        self.evictions = 0
+
+    def check(self, kind, name):
+        #raise 400 unless name may be requested for this kind of model
+        if name not in self.allowed.get(kind, []):
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown {kind} model '{name}'. Available: {', '.join(self.allowed.get(kind, []))}"
+            )
+
+    def get(self, kind, name):
+        #the loaded model, loading it first if needed (blocking, call from a worker thread)
+        key = (kind, name)
+        while True:
+            with self._lock:
+                entry = self._resident.get(key)
+                if entry is not None:
+                    self._resident.move_to_end(key)
+                    entry["hits"] += 1
+                    entry["last_used"] = time.time()
+                    return entry["model"]
+
+                #single flight: the first thread loads, the others wait for it and look again
+                load_lock = self._loading.get(key)
+                if load_lock is None:
+                    load_lock = threading.Lock()
+                    load_lock.acquire()
+                    self._loading[key] = load_lock
+                    break
+
+            with load_lock:
+                pass
+
+        try:
+            #make room first, from the size measured when the model was last loaded
+            estimate = self._known_bytes.get(key) or self.size_estimates.get(kind, {}).get(name)
+            if estimate:
+                with self._lock:
+                    self._evict(estimate, keep=0)
+
+            timings = {}
+            start = time.perf_counter()
+            if kind in self.importers:
+                self.importers[kind]()
+                timings["imports"] = round(time.perf_counter() - start, 2)
+
+            phase_start = time.perf_counter()
+            model = self.loaders[kind](name)
+            timings["weights"] = round(time.perf_counter() - phase_start, 2)
+
+            if kind in self.warmups:
+                phase_start = time.perf_counter()
+                self.warmups[kind](model)
+                timings["warmup"] = round(time.perf_counter() - phase_start, 2)
+
+            entry = {
+                "model": model,
+                "bytes": model_bytes(model),
+                "load_seconds": round(time.perf_counter() - start, 2),
+                "timings": timings,
+                "loaded_at": time.time(),
+                "last_used": time.time(),
+                "hits": 0
+            }
+            with self._lock:
+                self._known_bytes[key] = entry["bytes"]
+                self._resident[key] = entry
+                self._evict()
+            return model
+        finally:
+            with self._lock:
+                del self._loading[key]
+            load_lock.release()
+
+    def is_loaded(self, kind, name):
+        with self._lock:
+            return (kind, name) in self._resident
+
+    def _evict(self, incoming_bytes=0, keep=1):
+        #drop least recently used models until they fit in the budget together with
+        #incoming_bytes, never the keep most recently used ones, lock must be held
+        #an evicted model is freed once the requests still using it are done
+        while (len(self._resident) > keep
+               and self.resident_bytes + incoming_bytes > self.memory_budget):
+            (kind, name), entry = self._resident.popitem(last=False)
+            self.evictions += 1
+            print(f"Evicting {kind} model '{name}' ({entry['bytes'] / 1024 ** 2:.0f} MB)")
+
+    @property
+    def resident_bytes(self):
+        return sum(entry["bytes"] for entry in self._resident.values())
+
+    def stats(self):
+        with self._lock:
+            return {
+                "memory_budget_mb": round(self.memory_budget / 1024 ** 2),
+                "resident_mb": round(self.resident_bytes / 1024 ** 2),
+                "evictions": self.evictions,
+                "loading": [f"{kind}:{name}" for kind, name in self._loading],
+                "resident": [
+                    {
+                        "kind": kind,
+                        "name": name,
+                        "mb": round(entry["bytes"] / 1024 ** 2),
+                        "load_seconds": entry["load_seconds"],
+                        "timings": entry["timings"],
+                        "loaded_at": entry["loaded_at"],
+                        "last_used": entry["last_used"],
+                        "hits": entry["hits"]
+                    }
+                    #most recently used first
+                    for (kind, name), entry in reversed(self._resident.items())
+                ],
+                "available": self.allowed
+            }
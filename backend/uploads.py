@@ -0,0 +1,145 @@
+#streaming audio uploads to disk
+#uploads are copied in fixed-size chunks so memory use doesn't grow with the
+#file size. the size limit is enforced while the request body is received (by
+#UploadLimitMiddleware) and again while copying
+
+import asyncio
+import os
+import tempfile
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+
+
+CHUNK_SIZE = 1024 * 1024    #1 MB
+
+#audio extensions whisper/ffmpeg can read, used when the content type is generic
+AUDIO_EXTENSIONS = {
+    ".webm", ".wav", ".mp3", ".m4a", ".mp4", ".ogg", ".oga", ".opus",
+    ".flac", ".aac", ".wma", ".mkv", ".mov", ".mpeg", ".mpga", ".3gp"
+}
+
+
+def check_audio_upload(file, max_bytes):
+    #reject uploads that are clearly not audio or already known to be too big
+    #before anything is copied
+    if not file.filename:
+        raise HTTPException(status_code=400, detail="No audio file provided")
+
+    content_type = (file.content_type or "").split(";")[0].strip().lower()
+    extension = os.path.splitext(file.filename)[1].lower()
+    generic_type = content_type in ("", "application/octet-stream")
+
+    if not (content_type.startswith("audio/") or content_type.startswith("video/") or generic_type):
+        raise HTTPException(
+            status_code=415,
+            detail=f"Unsupported content type '{content_type}'. Please upload an audio file."
+        )
+    if generic_type and extension and extension not in AUDIO_EXTENSIONS:
+        raise HTTPException(
+            status_code=415,
+            detail=f"Unsupported file type '{extension}'. Please upload an audio file."
+        )
+
+    if file.size is not None and file.size > max_bytes:
+        raise_too_large(max_bytes)
+
+
+def raise_too_large(max_bytes):
+    raise HTTPException(
+        status_code=413,
+        detail=f"File is too large. Maximum upload size is {max_bytes // (1024 * 1024)} MB."
+    )
+
+
+async def save_upload(file, max_bytes, path=None):
+    #stream an UploadFile to disk in CHUNK_SIZE pieces
+    #path: destination file, a temporary file is created when None
+    #returns: path of the saved file (removed again if the upload is rejected)
+    check_audio_upload(file, max_bytes)
+
+    if path is None:
+        suffix = os.path.splitext(file.filename)[1] or ".webm"
+        fd, path = tempfile.mkstemp(suffix=suffix)
+        os.close(fd)
+
+    #the copy is blocking file io, so run it off the event loop
+    try:
+        await asyncio.to_thread(_copy_limited, file.file, path, max_bytes)
+    except BaseException:
+        if os.path.exists(path):
+            os.unlink(path)
+        raise
+
+    return path
+
+
+def _copy_limited(source, path, max_bytes):
+    source.seek(0)
+    written = 0
+    with open(path, "wb") as f:
+        while True:
+            chunk = source.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            written += len(chunk)
+            if written > max_bytes:
+                raise_too_large(max_bytes)
+            f.write(chunk)
+
+
+class UploadLimitMiddleware:
+    #asgi middleware counting the body bytes of POST requests as they arrive
+    #a declared content-length over the limit is rejected before anything is read, and
+    #a body without one (chunked) is cut off as soon as it passes the limit, instead of
+    #starlette spooling all of it to disk before the endpoint gets to check the size
+    #max_bytes: largest body accepted, the upload limit plus room for the form headers
+    #upload_limit: the limit named in the 413 message
+    def __init__(self, app, max_bytes, upload_limit):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.upload_limit = upload_limit
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST":
+            await self.app(scope, receive, send)
+            return
+
+        content_length = dict(scope["headers"]).get(b"content-length", b"")
+        if content_length.isdigit() and int(content_length) > self.max_bytes:
+            await self._reject(scope, receive, send)
+            return
+
+        received = 0
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    #an HTTPException passes fastapi's body parsing unchanged and
+                    #becomes the 413 response
+                    raise_too_large(self.upload_limit)
+            return message
+
+        async def tracking_send(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracking_send)
+        except HTTPException as e:
+            if e.status_code != 413 or response_started:
+                raise
+            await self._reject(scope, receive, send)
+
+    async def _reject(self, scope, receive, send):
+        response = JSONResponse(
+            status_code=413,
+            content={"detail": f"File is too large. Maximum upload size is {self.upload_limit // (1024 * 1024)} MB."}
+        )
+        await response(scope, receive, send)
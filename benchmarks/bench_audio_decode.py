@@ -0,0 +1,81 @@
+#benchmark: audio decoding for whisper, whisper.load_audio vs models.audioDecoder
+#each decoder runs in a fresh process so startup cost and peak memory are measured
+#on their own. peak memory is the growth of max rss while decoding (linux/mac only)
+#
+#usage: python benchmarks/bench_audio_decode.py recording.webm [more files...]
+
+import argparse
+import multiprocessing
+import os
+import resource
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+
+def max_rss_mb():
+    #ru_maxrss is in KB on linux and in bytes on mac
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024 / 1024 if sys.platform == "darwin" else rss / 1024
+
+
+def run_decoder(name, path, mmap_dir, results):
+    start = time.perf_counter()
+    if name == "whisper.load_audio":
+        from whisper.audio import load_audio
+        decode = load_audio
+    else:
+        from models.audioDecoder import decode_audio
+        decode = lambda p: decode_audio(p, mmap_dir=mmap_dir if name.endswith("(mmap)") else None)
+    import_seconds = time.perf_counter() - start
+
+    base_rss = max_rss_mb()
+    start = time.perf_counter()
+    samples = decode(path)
+    decode_seconds = time.perf_counter() - start
+
+    results.put({
+        "import_seconds": import_seconds,
+        "decode_seconds": decode_seconds,
+        "peak_mb": max_rss_mb() - base_rss,
+        "hours": len(samples) / 16000 / 3600
+    })
+
+
+def measure(name, path, mmap_dir):
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Queue()
+    process = ctx.Process(target=run_decoder, args=(name, path, mmap_dir, results))
+    process.start()
+    result = results.get()
+    process.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("files", nargs="+", help="audio files to decode")
+    parser.add_argument("--mmap-dir", default=None, help="also test the memory-mapped buffer in this directory")
+    args = parser.parse_args()
+
+    from models.audioDecoder import av
+    decoders = ["whisper.load_audio", "audioDecoder (pyav)" if av is not None else "audioDecoder (ffmpeg)"]
+    if args.mmap_dir:
+        decoders.append("audioDecoder (mmap)")
+
+    for path in args.files:
+        print(f"\n{path}")
+        print("="*80)
+        print(f"{'decoder':26}{'import (s)':>12}{'decode (s)':>12}{'peak (MB)':>12}{'MB / hour':>12}")
+        for name in decoders:
+            result = measure(name, path, args.mmap_dir)
+            per_hour = result["peak_mb"] / result["hours"] if result["hours"] else 0
+            print(f"{name:26}{result['import_seconds']:>12.2f}{result['decode_seconds']:>12.2f}"
+                  f"{result['peak_mb']:>12.1f}{per_hour:>12.1f}")
+        print("="*80)
+
+
+if __name__ == "__main__":
+    main()
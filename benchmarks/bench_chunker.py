@@ -0,0 +1,101 @@
+#benchmark: TextChunker vs the old sentence loop in TextSummarizer._summarize_long_text
+#only needs the tokenizer, the summarization model itself is not loaded
+#
+#usage: python benchmarks/bench_chunker.py [transcription.txt] [--words N]
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from transformers import AutoTokenizer
+from models.textChunker import TextChunker
+
+
+def legacy_chunk(tokenizer, text):
+    #the previous chunking loop, re-encodes the growing chunk for every sentence
+    sentences = text.split('. ')
+    chunks = []
+    current_chunk = ""
+
+    for sentence in sentences:
+        test_chunk = current_chunk + sentence + ". "
+        if len(tokenizer.encode(test_chunk)) > 900:
+            if current_chunk:
+                chunks.append(current_chunk)
+            current_chunk = sentence + ". "
+        else:
+            current_chunk = test_chunk
+
+    if current_chunk:
+        chunks.append(current_chunk)
+
+    return chunks
+
+
+def synthetic_transcript(n_words, seed=0):
+    #meeting-like filler text with a sentence break every 8-25 words
+    vocab = ("we need to review the budget for next quarter and agree on the timeline "
+             "for the release so that marketing can plan the launch event with the "
+             "sales team who will present the new pricing to our biggest customers").split()
+    rng = random.Random(seed)
+    words = []
+    next_break = rng.randint(8, 25)
+    for i in range(n_words):
+        word = rng.choice(vocab)
+        if i + 1 == next_break:
+            word += "."
+            next_break += rng.randint(8, 25)
+        words.append(word)
+    return " ".join(words)
+
+
+def time_it(fn, repeat):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("file", nargs="?", help="transcription text file (default: synthetic text)")
+    parser.add_argument("--words", type=int, default=18000, help="synthetic transcript length (about 2 hours of speech)")
+    parser.add_argument("--model", default="facebook/bart-large-cnn")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.file:
+        with open(args.file, 'r', encoding='utf-8') as f:
+            text = f.read()
+    else:
+        text = synthetic_transcript(args.words)
+
+    tokenizer = AutoTokenizer.from_pretrained(args.model)
+    chunker = TextChunker(tokenizer, max_tokens=900)
+
+    print(f"Input: {len(text.split())} words, {chunker.count_tokens(text)} tokens")
+    print("="*60)
+
+    legacy_time, legacy_chunks = time_it(lambda: legacy_chunk(tokenizer, text), args.repeat)
+    new_time, new_chunks = time_it(lambda: chunker.chunk(text), args.repeat)
+
+    legacy_max = max(chunker.count_tokens(c) for c in legacy_chunks)
+    new_max = max(chunker.count_tokens(c) for c in new_chunks)
+
+    print(f"{'':12}{'time (s)':>12}{'chunks':>10}{'max tokens':>14}")
+    print(f"{'legacy':12}{legacy_time:>12.3f}{len(legacy_chunks):>10}{legacy_max:>14}")
+    print(f"{'chunker':12}{new_time:>12.3f}{len(new_chunks):>10}{new_max:>14}")
+    print("="*60)
+    print(f"Speedup: {legacy_time / new_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+#benchmark: extractive pre-filter + BART vs the current abstractive-only pipeline
+#summarizes long transcripts with every extractive ratio and reports the end-to-end
+#time, the speedup and the ROUGE of each summary against the full pipeline's summary
+#(and against a reference summary with --reference). without transcripts the sample
+#texts are joined into one long meeting with small talk mixed in, the way real
+#recordings have it, going through the agenda several times
+#
+#usage: python benchmarks/bench_extractive.py [transcription.txt ...] [--ratios 0.3,0.5,0.7]
+
+import argparse
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from metrics import rouge
+from models.extractiveFilter import STOPWORDS, extract_sentences
+from models.textChunker import split_sentences
+from models.transcriptStore import read_transcription_file
+
+
+FILLER = [
+    "Can everyone hear me okay?",
+    "Yeah.",
+    "Sorry, go ahead.",
+    "Okay, okay.",
+    "Let me just share my screen, one second.",
+    "Uh, I think you're on mute.",
+    "Right, right.",
+    "Can you see it now?",
+    "Sorry, my internet is a bit slow today.",
+    "Yes, I can hear you.",
+    "Hold on, someone's at the door.",
+    "Okay, cool, thanks."
+]
+
+
+#later rounds revisit the agenda, their sentences open with one of these so they are
+#not exact repeats (the filter never keeps those)
+REVISITS = [
+    "Coming back to this,",
+    "As a follow-up,",
+    "To recap,",
+    "Just to confirm,",
+    "Picking this up again,"
+]
+
+
+def sample_meeting(samples_dir, filler_ratio=0.4, seed=0, rounds=4):
+    #all sample texts as one meeting, with small talk between the sentences
+    #rounds: times the agenda is gone through, in a new order every time, so the meeting
+    #        is several model inputs long (a round is about 1000 words)
+    rng = random.Random(seed)
+    sections = []
+    for filename in sorted(os.listdir(samples_dir)):
+        if filename.endswith(".txt") and not filename.endswith(".summary.txt"):
+            with open(os.path.join(samples_dir, filename), 'r', encoding='utf-8') as f:
+                text = f.read()
+            sections.append([text[start:end] for start, end in split_sentences(text)])
+
+    sentences = []
+    for round_index in range(rounds):
+        if round_index:
+            rng.shuffle(sections)
+        for section in sections:
+            for i, sentence in enumerate(section):
+                if round_index:
+                    first, _, rest = sentence.partition(" ")
+                    #names stay capitalized
+                    if first.lower() in STOPWORDS:
+                        first = first.lower()
+                    revisit = REVISITS[(i + round_index) % len(REVISITS)]
+                    sentence = f"{revisit} {first} {rest}".rstrip()
+                sentences.append(sentence)
+                if rng.random() < filler_ratio:
+                    sentences.append(rng.choice(FILLER))
+    return " ".join(sentences)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("files", nargs="*", help="transcription files (default: the joined samples)")
+    parser.add_argument("--samples", default=os.path.join(ROOT, "benchmarks", "samples"),
+                        help="directory with sample transcripts")
+    parser.add_argument("--ratios", default="0.3,0.5,0.7", help="comma-separated kept fractions")
+    parser.add_argument("--model", default="facebook/bart-large-cnn", help="summarization model")
+    parser.add_argument("--reference", default=None, help="reference summary to score against")
+    parser.add_argument("--max-length", type=int, default=150)
+    parser.add_argument("--min-length", type=int, default=30)
+    args = parser.parse_args()
+
+    if args.files:
+        texts = [(os.path.basename(path), read_transcription_file(path)) for path in args.files]
+    else:
+        texts = [("samples + small talk", sample_meeting(args.samples))]
+    ratios = [float(ratio) for ratio in args.ratios.split(",")]
+    reference = None
+    if args.reference:
+        with open(args.reference, 'r', encoding='utf-8') as f:
+            reference = f.read()
+
+    from models.textSummarizer import TextSummarizer
+    summarizer = TextSummarizer(model_name=args.model)
+    #one untimed call so lazy initialisation doesn't count
+    summarizer.warm_up()
+
+    print("\n" + "="*96)
+    print(f"{'transcript':24}{'ratio':>7}{'words':>8}{'filter (s)':>12}{'total (s)':>11}{'speedup':>9}"
+          f"{'R-1':>8}{'R-2':>8}{'R-L':>8}" + (f"{'ref R-L':>9}" if reference else ""))
+    for name, text in texts:
+        baseline = None
+        for ratio in [None] + ratios:
+            summarizer.extractive_ratio = ratio
+
+            start = time.perf_counter()
+            kept = extract_sentences(text, ratio) if ratio else text
+            filter_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            summary = summarizer.summarize(text, args.max_length, args.min_length)
+            seconds = time.perf_counter() - start
+
+            if baseline is None:
+                baseline = (summary, seconds)
+                scores = {"rouge1": 1.0, "rouge2": 1.0, "rougeL": 1.0}
+            else:
+                scores = rouge(baseline[0], summary)
+            row = (f"{name[:23]:24}{ratio or 1.0:>7.2f}{len(kept.split()):>8}{filter_seconds:>12.3f}"
+                   f"{seconds:>11.2f}{baseline[1] / seconds:>8.2f}x"
+                   f"{scores['rouge1']:>8.3f}{scores['rouge2']:>8.3f}{scores['rougeL']:>8.3f}")
+            if reference:
+                row += f"{rouge(reference, summary)['rougeL']:>9.3f}"
+            print(row)
+    print("="*96)
+    print("ratio 1.00 is the current pipeline, ROUGE columns: summary against its summary (1.0 = identical)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+#benchmark: fp32 vs dynamic int8 quantized models on cpu
+#summarizer: summarizes every sample text (and all of them joined, to exercise the
+#chunked path) with both models and reports speedup, weight memory and the ROUGE
+#of the int8 summaries against the fp32 ones. with a reference <name>.summary.txt
+#next to a sample, the ROUGE change against the reference is reported too
+#whisper (--audio): the same for every audio file, with the word error rate of the
+#int8 transcript against a reference <name>.txt or else the fp32 transcript
+#
+#usage: python benchmarks/bench_quantization.py [--samples benchmarks/samples] [--audio dir]
+
+import argparse
+import gc
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, "backend"))
+
+import torch
+
+from metrics import rouge, word_error_rate
+from registry import model_bytes
+
+
+AUDIO_EXTENSIONS = (".wav", ".mp3", ".m4a", ".webm", ".ogg", ".flac")
+
+
+def run_models(load, run, inputs):
+    #load the fp32 and the int8 model one after the other and run every input through both
+    results = {}
+    for quantize in (False, True):
+        start = time.perf_counter()
+        model = load(quantize)
+        load_seconds = time.perf_counter() - start
+
+        #one untimed call so lazy initialisation doesn't count
+        run(model, inputs[0][1])
+
+        outputs = []
+        for name, data in inputs:
+            start = time.perf_counter()
+            output = run(model, data)
+            outputs.append((name, output, time.perf_counter() - start))
+
+        results[quantize] = {"load": load_seconds, "mb": model_bytes(model) / 1024 ** 2, "outputs": outputs}
+        del model
+        gc.collect()
+    return results[False], results[True]
+
+
+def print_memory(fp32, int8):
+    print(f"Load: {fp32['load']:.1f}s fp32, {int8['load']:.1f}s int8")
+    print(f"Weights: {fp32['mb']:.0f} MB fp32, {int8['mb']:.0f} MB int8 "
+          f"({1 - int8['mb'] / fp32['mb']:.0%} smaller)")
+
+
+def bench_summarizer(samples_dir, model_name):
+    from models.textSummarizer import TextSummarizer
+
+    texts = []
+    for filename in sorted(os.listdir(samples_dir)):
+        if filename.endswith(".txt") and not filename.endswith(".summary.txt"):
+            with open(os.path.join(samples_dir, filename), 'r', encoding='utf-8') as f:
+                texts.append((filename, f.read()))
+    if not texts:
+        print(f"No sample texts found in '{samples_dir}'")
+        return
+    #long enough to go through chunking and reduce
+    texts.append(("(all joined)", "\n\n".join(text for _, text in texts)))
+
+    fp32, int8 = run_models(
+        lambda quantize: TextSummarizer(model_name=model_name, quantize=quantize),
+        lambda summarizer, text: summarizer.summarize(text),
+        texts
+    )
+
+    print("\n" + "="*94)
+    print(f"{'sample':24}{'fp32 (s)':>10}{'int8 (s)':>10}{'speedup':>9}{'R-1':>8}{'R-2':>8}{'R-L':>8}{'ref R-L delta':>17}")
+    for (name, base, base_time), (_, quant, quant_time) in zip(fp32["outputs"], int8["outputs"]):
+        scores = rouge(base, quant)
+        reference_path = os.path.join(samples_dir, name[:-4] + ".summary.txt")
+        delta = ""
+        if name.endswith(".txt") and os.path.exists(reference_path):
+            with open(reference_path, 'r', encoding='utf-8') as f:
+                reference = f.read()
+            delta = f"{rouge(reference, quant)['rougeL'] - rouge(reference, base)['rougeL']:+.3f}"
+        print(f"{name[:23]:24}{base_time:>10.2f}{quant_time:>10.2f}{base_time / quant_time:>8.2f}x"
+              f"{scores['rouge1']:>8.3f}{scores['rouge2']:>8.3f}{scores['rougeL']:>8.3f}{delta:>17}")
+    print("="*94)
+    print("ROUGE columns: int8 summary against the fp32 summary (1.0 = identical)")
+    print_memory(fp32, int8)
+
+
+def bench_whisper(audio_dir, model_size):
+    from models.speechToText import SpeechToText
+    from models.audioDecoder import decode_audio
+
+    files = sorted(f for f in os.listdir(audio_dir) if f.lower().endswith(AUDIO_EXTENSIONS))
+    if not files:
+        print(f"No audio files found in '{audio_dir}'")
+        return
+
+    audio = [(f, decode_audio(os.path.join(audio_dir, f))) for f in files]
+
+    fp32, int8 = run_models(
+        lambda quantize: SpeechToText(model_size=model_size, quantize=quantize),
+        lambda stt, samples: stt.transcribe(samples)["text"],
+        audio
+    )
+
+    print("\n" + "="*78)
+    print(f"{'file':28}{'fp32 (s)':>10}{'int8 (s)':>10}{'speedup':>9}{'WER fp32':>10}{'WER int8':>11}")
+    for (name, base, base_time), (_, quant, quant_time) in zip(fp32["outputs"], int8["outputs"]):
+        reference_path = os.path.join(audio_dir, os.path.splitext(name)[0] + ".txt")
+        if os.path.exists(reference_path):
+            with open(reference_path, 'r', encoding='utf-8') as f:
+                reference = f.read()
+            base_wer = f"{word_error_rate(reference, base):.3f}"
+        else:
+            reference, base_wer = base, "ref"
+        print(f"{name[:27]:28}{base_time:>10.1f}{quant_time:>10.1f}{base_time / quant_time:>8.2f}x"
+              f"{base_wer:>10}{word_error_rate(reference, quant):>11.3f}")
+    print("="*78)
+    print_memory(fp32, int8)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--samples", default=os.path.join(ROOT, "benchmarks", "samples"),
+                        help="directory with sample transcripts (and optional <name>.summary.txt references)")
+    parser.add_argument("--model", default="facebook/bart-large-cnn", help="summarization model")
+    parser.add_argument("--audio", default=None, help="directory with audio files to benchmark whisper on")
+    parser.add_argument("--whisper", default="base", help="whisper model size")
+    parser.add_argument("--threads", type=int, default=None, help="torch cpu threads")
+    args = parser.parse_args()
+
+    if torch.cuda.is_available():
+        print("CUDA is available and quantization is ignored on gpu, "
+              "run with CUDA_VISIBLE_DEVICES= to compare on cpu")
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    bench_summarizer(args.samples, args.model)
+    if args.audio:
+        bench_whisper(args.audio, args.whisper)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+#benchmark: whisper with and without the voice activity detection pre-pass
+#reports speedup and word error rate for every file in a sample set. the WER is
+#measured against a reference transcript <name>.txt next to the audio when there
+#is one, otherwise against the transcription without VAD
+#
+#usage: python benchmarks/bench_vad.py samples_dir [--model base]
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.speechToText import SpeechToText
+from models.audioDecoder import SAMPLE_RATE
+from metrics import word_error_rate
+
+
+AUDIO_EXTENSIONS = (".wav", ".mp3", ".m4a", ".webm", ".ogg", ".flac")
+
+
+def timed_transcribe(stt, audio, vad):
+    start = time.perf_counter()
+    result = stt.transcribe(audio, vad=vad)
+    return time.perf_counter() - start, result["text"]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("samples", help="directory with audio files (and optional reference .txt files)")
+    parser.add_argument("--model", default="base", help="whisper model size")
+    args = parser.parse_args()
+
+    files = sorted(f for f in os.listdir(args.samples) if f.lower().endswith(AUDIO_EXTENSIONS))
+    if not files:
+        print(f"No audio files found in '{args.samples}'")
+        return
+
+    stt = SpeechToText(model_size=args.model)
+
+    rows = []
+    for filename in files:
+        path = os.path.join(args.samples, filename)
+        audio = stt.load_audio(path)
+
+        base_time, base_text = timed_transcribe(stt, audio, vad=False)
+        vad_time, vad_text = timed_transcribe(stt, audio, vad=True)
+
+        reference_path = os.path.splitext(path)[0] + ".txt"
+        if os.path.exists(reference_path):
+            with open(reference_path, 'r', encoding='utf-8') as f:
+                reference = f.read()
+            base_wer = word_error_rate(reference, base_text)
+        else:
+            reference = base_text
+            base_wer = None
+
+        rows.append((filename, len(audio) / SAMPLE_RATE, base_time, vad_time,
+                     base_wer, word_error_rate(reference, vad_text)))
+
+    print("\n" + "="*88)
+    print(f"{'file':28}{'audio (s)':>10}{'no vad (s)':>12}{'vad (s)':>10}{'speedup':>9}{'WER':>9}{'WER vad':>10}")
+    for filename, seconds, base_time, vad_time, base_wer, vad_wer in rows:
+        base_wer_str = f"{base_wer:.3f}" if base_wer is not None else "ref"
+        print(f"{filename[:27]:28}{seconds:>10.0f}{base_time:>12.1f}{vad_time:>10.1f}"
+              f"{base_time / vad_time:>8.2f}x{base_wer_str:>9}{vad_wer:>10.3f}")
+    print("="*88)
+
+    total_base = sum(row[2] for row in rows)
+    total_vad = sum(row[3] for row in rows)
+    print(f"Total: {total_base:.1f}s without VAD, {total_vad:.1f}s with VAD ({total_base / total_vad:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
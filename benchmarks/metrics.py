@@ -0,0 +1,80 @@
+#quality metrics shared by the benchmarks
+
+import re
+
+
+def normalize_words(text):
+    #lowercase words without punctuation, so formatting differences don't count as errors
+    return re.findall(r"[a-z0-9']+", text.lower())
+
+
+def word_error_rate(reference, hypothesis):
+    #(substitutions + deletions + insertions) / number of reference words
+    ref = normalize_words(reference)
+    hyp = normalize_words(hypothesis)
+    if not ref:
+        return 0.0 if not hyp else 1.0
+
+    #edit distance over words, one row at a time
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        current = [i] + [0] * len(hyp)
+        for j, hyp_word in enumerate(hyp, 1):
+            current[j] = min(
+                previous[j] + 1,                                #deletion
+                current[j - 1] + 1,                             #insertion
+                previous[j - 1] + (ref_word != hyp_word)        #substitution
+            )
+        previous = current
+
+    return previous[-1] / len(ref)
+
+
+def _ngrams(words, n):
+    counts = {}
+    for i in range(len(words) - n + 1):
+        gram = tuple(words[i:i + n])
+        counts[gram] = counts.get(gram, 0) + 1
+    return counts
+
+
+def _f1(overlap, n_reference, n_hypothesis):
+    if not overlap:
+        return 0.0
+    precision = overlap / n_hypothesis
+    recall = overlap / n_reference
+    return 2 * precision * recall / (precision + recall)
+
+
+def rouge_n(reference, hypothesis, n=1):
+    #ROUGE-N F1: overlap of word n-grams (each n-gram counted at most as often as in the reference)
+    ref = _ngrams(normalize_words(reference), n)
+    hyp = _ngrams(normalize_words(hypothesis), n)
+    overlap = sum(min(count, ref.get(gram, 0)) for gram, count in hyp.items())
+    return _f1(overlap, sum(ref.values()), sum(hyp.values()))
+
+
+def rouge_l(reference, hypothesis):
+    #ROUGE-L F1: longest common subsequence of words
+    ref = normalize_words(reference)
+    hyp = normalize_words(hypothesis)
+
+    previous = [0] * (len(hyp) + 1)
+    for ref_word in ref:
+        current = [0]
+        for j, hyp_word in enumerate(hyp, 1):
+            if ref_word == hyp_word:
+                current.append(previous[j - 1] + 1)
+            else:
+                current.append(max(previous[j], current[j - 1]))
+        previous = current
+
+    return _f1(previous[-1], len(ref), len(hyp))
+
+
+def rouge(reference, hypothesis):
+    return {
+        "rouge1": rouge_n(reference, hypothesis, 1),
+        "rouge2": rouge_n(reference, hypothesis, 2),
+        "rougeL": rouge_l(reference, hypothesis)
+    }
@@ -1,3 +1,13 @@
 #models package
-from .speechToText import SpeechToText
-from .textSummarizer import TextSummarizer
+#the model classes are imported on first use, so light helpers in this package
+#(e.g. models.resultCache) can be imported without loading torch, whisper or transformers
+
+
+def __getattr__(name):
+    if name == "SpeechToText":
+        from .speechToText import SpeechToText
+        return SpeechToText
+    if name == "TextSummarizer":
+        from .textSummarizer import TextSummarizer
+        return TextSummarizer
+    raise AttributeError(f"module 'models' has no attribute '{name}'")
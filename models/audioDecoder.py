@@ -0,0 +1,309 @@
+#audio decoding for whisper: any audio file -> 16 kHz mono float32 samples
+#decodes in process with pyav when it is installed, otherwise streams pcm out of
+#one ffmpeg process. either way the samples are written straight into a
+#preallocated (optionally memory-mapped) float32 buffer, instead of collecting
+#the whole int16 byte string and converting it afterwards like whisper.load_audio
+
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import numpy as np
+
+try:
+    import av
+except ImportError:
+    av = None
+
+
+SAMPLE_RATE = 16000
+READ_SAMPLES = 64 * 1024    #samples read from ffmpeg per chunk
+COPY_CHUNK_SIZE = 1024 * 1024    #bytes per read when a file object is copied to disk
+
+
+def decode_audio(source, sample_rate=SAMPLE_RATE, mmap_dir=None):
+    #decode an audio file into mono float32 samples in [-1, 1]
+    #source: path to an audio file, or an open binary file object (e.g. an upload)
+    #sample_rate: output sample rate, whisper expects 16000
+    #mmap_dir: if set, the samples are kept in a memory-mapped file in this directory
+    #          instead of in RAM (useful for very long recordings)
+    #returns: 1-d float32 numpy array (a np.memmap when mmap_dir is set)
+    duration = probe_duration(source)
+    if av is not None:
+        chunks = _decode_with_av(source, sample_rate)
+    else:
+        chunks = _decode_with_ffmpeg(source, sample_rate)
+
+    expected = int(duration * sample_rate) + sample_rate if duration else 30 * 60 * sample_rate
+    buffer = _SampleBuffer(expected, mmap_dir)
+    for chunk in chunks:
+        buffer.append(chunk)
+    return buffer.finish()
+
+
+def probe_duration(source):
+    #duration of an audio file in seconds, None if it can't be read from the header
+    #used to size the sample buffer up front, so it doesn't have to grow while decoding
+    if av is not None:
+        try:
+            if not isinstance(source, str):
+                source.seek(0)
+            with av.open(source) as container:
+                if container.duration:
+                    return container.duration / av.time_base
+        except Exception:
+            pass
+        return None
+
+    #ffprobe would have to consume a file object's stream, so only probe paths
+    if not isinstance(source, str):
+        return None
+
+    try:
+        output = subprocess.run(
+            ["ffprobe", "-v", "error", "-show_entries", "format=duration",
+             "-of", "default=noprint_wrappers=1:nokey=1", source],
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+        return float(output)
+    except (OSError, subprocess.CalledProcessError, ValueError):
+        return None
+
+
+def _decode_with_av(source, sample_rate):
+    #decode and resample in process with pyav, yields int16 chunks
+    if not isinstance(source, str):
+        source.seek(0)
+
+    container = av.open(source)
+    try:
+        stream = container.streams.audio[0]
+        resampler = av.AudioResampler(format="s16", layout="mono", rate=sample_rate)
+
+        for frame in container.decode(stream):
+            for out in _as_list(resampler.resample(frame)):
+                yield out.to_ndarray().reshape(-1)
+
+        #flush samples buffered in the resampler
+        for out in _as_list(resampler.resample(None)):
+            yield out.to_ndarray().reshape(-1)
+    finally:
+        container.close()
+
+
+def _as_list(frames):
+    #older pyav versions return a single frame (or None) instead of a list
+    if frames is None:
+        return []
+    return frames if isinstance(frames, list) else [frames]
+
+
+def _decode_with_ffmpeg(source, sample_rate):
+    #stream s16le pcm out of ffmpeg, yields int16 chunks
+    #file objects are handed to ffmpeg as its stdin, so they are not copied first, unless
+    #they already live on disk or their container has to be read with seeking
+    temp_path = None
+    if isinstance(source, str):
+        input_arg, stdin = source, subprocess.DEVNULL
+    else:
+        path = _file_path(source)
+        if path is None and _needs_seeking(source):
+            path = temp_path = _copy_to_temp(source)
+        if path is not None:
+            input_arg, stdin = path, subprocess.DEVNULL
+        else:
+            source.seek(0)
+            input_arg, stdin = "pipe:0", source
+
+    cmd = [
+        "ffmpeg", "-nostdin", "-loglevel", "error", "-threads", "0",
+        "-i", input_arg,
+        "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(sample_rate),
+        "-"
+    ]
+    if stdin is not subprocess.DEVNULL:
+        cmd.remove("-nostdin")
+
+    try:
+        process = subprocess.Popen(cmd, stdin=stdin, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    except BaseException:
+        if temp_path:
+            os.unlink(temp_path)
+        raise
+
+    leftover = b""
+    try:
+        while True:
+            data = process.stdout.read(READ_SAMPLES * 2)
+            if not data:
+                break
+            data = leftover + data
+            usable = len(data) - len(data) % 2
+            leftover = data[usable:]
+            yield np.frombuffer(data[:usable], dtype=np.int16)
+
+        stderr = process.stderr.read()
+        if process.wait() != 0:
+            raise RuntimeError(f"Failed to load audio: {stderr.decode(errors='ignore')}")
+    finally:
+        if process.poll() is None:
+            process.kill()
+        process.stdout.close()
+        process.stderr.close()
+        if temp_path:
+            os.unlink(temp_path)
+
+
+def _file_path(source):
+    #path of a file object that is backed by a named file on disk (e.g. an upload that
+    #was spooled to a named temporary file), None otherwise
+    name = getattr(source, "name", None)
+    if isinstance(name, str) and os.path.isfile(name):
+        return name
+    return None
+
+
+def _needs_seeking(source):
+    #mp4/m4a/mov files often keep their index (the moov atom) at the end of the file,
+    #ffmpeg can't decode those from a pipe. they all start with an ftyp box
+    source.seek(0)
+    header = source.read(12)
+    source.seek(0)
+    return header[4:8] == b"ftyp"
+
+
+def _copy_to_temp(source):
+    #copy a file object to a temporary file ffmpeg can seek in, returns its path
+    fd, path = tempfile.mkstemp(suffix=".mp4")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            source.seek(0)
+            shutil.copyfileobj(source, f, COPY_CHUNK_SIZE)
+    except BaseException:
+        os.unlink(path)
+        raise
+    return path
+
+
+class StreamingDecoder:
+    #incremental decoder for audio that arrives in pieces (e.g. MediaRecorder chunks
+    #sent over a websocket). encoded bytes are piped into one long-running ffmpeg
+    #process and the decoded samples collected by a reader thread, so each read()
+    #returns whatever has been decoded so far without waiting for the end of the stream
+    #format: "pcm16" for raw 16 kHz mono s16le bytes (no ffmpeg needed), anything else
+    #        is passed to ffmpeg to detect (webm/opus, ogg, mp4...)
+    def __init__(self, format="webm", sample_rate=SAMPLE_RATE):
+        self.sample_rate = sample_rate
+        self.format = format
+        self._lock = threading.Lock()
+        self._chunks = []
+        self._leftover = b""
+        self._error = None
+        self._process = None
+        self._reader = None
+        self._closed = False
+
+        if format != "pcm16":
+            self._process = subprocess.Popen(
+                ["ffmpeg", "-loglevel", "error", "-i", "pipe:0",
+                 "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(sample_rate), "-"],
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+            )
+            self._reader = threading.Thread(target=self._read_output, daemon=True)
+            self._reader.start()
+
+    def feed(self, data):
+        #add encoded bytes as they arrive
+        if self._closed:
+            raise RuntimeError("Audio stream is already closed")
+        if self._process is None:
+            self._add_pcm(data)
+            return
+        try:
+            self._process.stdin.write(data)
+            self._process.stdin.flush()
+        except (BrokenPipeError, ValueError):
+            raise RuntimeError(f"Failed to decode audio stream: {self._error or 'ffmpeg exited'}")
+
+    def read(self):
+        #samples decoded since the last read, float32 in [-1, 1] (may be empty)
+        with self._lock:
+            chunks, self._chunks = self._chunks, []
+        if not chunks:
+            return np.zeros(0, dtype=np.float32)
+        return np.concatenate(chunks).astype(np.float32) / 32768.0
+
+    def close(self):
+        #end of stream: let ffmpeg flush what it still buffers, read() returns the rest
+        if self._closed:
+            return
+        self._closed = True
+        if self._process is None:
+            return
+        try:
+            self._process.stdin.close()
+        except BrokenPipeError:
+            pass
+        self._reader.join()
+        self._process.wait()
+
+    def _add_pcm(self, data):
+        data = self._leftover + data
+        usable = len(data) - len(data) % 2
+        self._leftover = data[usable:]
+        if usable:
+            with self._lock:
+                self._chunks.append(np.frombuffer(data[:usable], dtype=np.int16))
+
+    def _read_output(self):
+        #reader thread: ffmpeg's stdout into the chunk list
+        while True:
+            data = self._process.stdout.read1(READ_SAMPLES * 2)
+            if not data:
+                break
+            self._add_pcm(data)
+        self._error = self._process.stderr.read().decode(errors="ignore").strip() or None
+
+
+class _SampleBuffer:
+    #growable float32 buffer that int16 chunks are converted into in place
+    def __init__(self, capacity, mmap_dir=None):
+        self.size = 0
+        self.mmap_dir = mmap_dir
+        self._file = None
+        self.data = self._allocate(max(capacity, 1))
+
+    def _allocate(self, capacity):
+        if self.mmap_dir is None:
+            return np.empty(capacity, dtype=np.float32)
+
+        if self._file is None:
+            self._file = tempfile.TemporaryFile(dir=self.mmap_dir)
+        self._file.truncate(capacity * 4)
+        return np.memmap(self._file, dtype=np.float32, mode="r+", shape=(capacity,))
+
+    def append(self, chunk):
+        end = self.size + len(chunk)
+        if end > len(self.data):
+            self._grow(max(end, int(len(self.data) * 1.5)))
+        np.multiply(chunk, np.float32(1 / 32768.0), out=self.data[self.size:end])
+        self.size = end
+
+    def _grow(self, capacity):
+        if self.mmap_dir is None:
+            grown = np.empty(capacity, dtype=np.float32)
+            grown[:self.size] = self.data[:self.size]
+            self.data = grown
+        else:
+            #a bigger mapping of the same file keeps the samples already written
+            self.data.flush()
+            self.data = self._allocate(capacity)
+
+    def finish(self):
+        if self.mmap_dir is None:
+            #give back unused space when the estimate was too generous
+            if len(self.data) - self.size > SAMPLE_RATE:
+                return self.data[:self.size].copy()
+            return self.data[:self.size]
+        return self.data[:self.size]
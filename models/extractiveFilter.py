@@ -0,0 +1,124 @@
+#extractive pre-filter for long transcripts
+#sentences are ranked with TextRank over TF-IDF vectors and only the top fraction is
+#kept, in their original order, before the text goes to the abstractive model. meetings
+#are full of filler and small talk ("yeah", "can you hear me"), dropping it up front
+#means fewer chunks go through beam search. the ranking is a few numpy matrix products,
+#milliseconds next to a single generate call
+
+import math
+import re
+import numpy as np
+
+try:
+    from .textChunker import split_sentences
+except ImportError:
+    from textChunker import split_sentences
+
+
+#common english words that say nothing about what a sentence is about
+STOPWORDS = frozenset("""
+a about above after again all also am an and any are as at be because been before being
+below between both but by can could did do does doing down during each few for from further
+had has have having he her here hers him his how i if in into is it its itself just let me
+more most my no nor not now of off on once only or other our ours out over own same she
+should so some such than that the their them then there these they this those through to
+too under until up very was we were what when where which while who whom why will with would
+you your yours yeah yes okay ok um uh oh like right so well know think got get going really
+""".split())
+
+#sentences with fewer content words than this are filler and never kept (unless nothing else is)
+MIN_CONTENT_WORDS = 3
+
+
+def _content_words(sentence):
+    return [word for word in re.findall(r"[a-z0-9']+", sentence.lower())
+            if len(word) > 1 and word not in STOPWORDS]
+
+
+def tfidf_matrix(sentences, max_vocab=5000):
+    #L2-normalized tf-idf vectors of the sentences as a dense (n_sentences, vocab) array
+    #max_vocab: only the words that appear in the most sentences get a column
+    words = [_content_words(sentence) for sentence in sentences]
+
+    document_frequency = {}
+    for sentence_words in words:
+        for word in set(sentence_words):
+            document_frequency[word] = document_frequency.get(word, 0) + 1
+    vocab = sorted(document_frequency, key=document_frequency.get, reverse=True)[:max_vocab]
+    columns = {word: i for i, word in enumerate(vocab)}
+
+    rows = [i for i, sentence_words in enumerate(words) for word in sentence_words if word in columns]
+    cols = [columns[word] for sentence_words in words for word in sentence_words if word in columns]
+    matrix = np.zeros((len(sentences), len(vocab)), dtype=np.float32)
+    np.add.at(matrix, (np.array(rows, dtype=np.int64), np.array(cols, dtype=np.int64)), 1.0)
+
+    #sublinear term frequency, smoothed inverse document frequency
+    np.log1p(matrix, out=matrix)
+    df = np.array([document_frequency[word] for word in vocab], dtype=np.float32)
+    matrix *= np.log((1 + len(sentences)) / (1 + df)) + 1
+
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+def textrank_scores(sentences, damping=0.85, iterations=50, tolerance=1e-6, max_vocab=5000):
+    #importance of every sentence: pagerank over the cosine similarity graph of the sentences
+    n = len(sentences)
+    if n == 0:
+        return np.zeros(0, dtype=np.float32)
+
+    vectors = tfidf_matrix(sentences, max_vocab)
+    similarity = vectors @ vectors.T
+    np.fill_diagonal(similarity, 0.0)
+
+    #row-normalized transition matrix, sentences similar to nothing link to everything
+    totals = similarity.sum(axis=1, keepdims=True)
+    transition = np.where(totals > 0, similarity / np.maximum(totals, 1e-12), 1.0 / n)
+
+    scores = np.full(n, 1.0 / n, dtype=np.float32)
+    for _ in range(iterations):
+        updated = (1 - damping) / n + damping * (transition.T @ scores)
+        if np.abs(updated - scores).sum() < tolerance:
+            scores = updated
+            break
+        scores = updated
+    return scores
+
+
+def extract_sentences(text, ratio=0.5, block_sentences=1000, max_vocab=5000):
+    #keep the top ratio of the sentences of text by textrank score, in their original order
+    #block_sentences: long texts are ranked in consecutive blocks of this many sentences,
+    #                 which bounds the similarity matrix and keeps every part of the meeting
+    #                 represented in what is left
+    #returns: the kept sentences joined with spaces (text as is if there is nothing to drop)
+    if ratio >= 1:
+        return text
+    spans = split_sentences(text)
+    if len(spans) < 3:
+        return text
+    sentences = [text[start:end] for start, end in spans]
+
+    kept = []
+    for block_start in range(0, len(sentences), block_sentences):
+        block = sentences[block_start:block_start + block_sentences]
+        words = [_content_words(sentence) for sentence in block]
+
+        #repeated sentences ("sorry, you're on mute") would vote for each other, so only
+        #the first of each is ranked and the repeats are never kept
+        unique = {}
+        for i, sentence_words in enumerate(words):
+            unique.setdefault(" ".join(sentence_words), i)
+        ranked = sorted(unique.values())
+        scores = np.full(len(block), -2.0, dtype=np.float32)
+        scores[ranked] = textrank_scores([block[i] for i in ranked], max_vocab=max_vocab)
+
+        #filler can't win on score alone when the rest of the block is short too
+        filler = np.array([len(sentence_words) < MIN_CONTENT_WORDS for sentence_words in words])
+        if not filler.all():
+            scores = np.where(filler, np.minimum(scores, -1.0), scores)
+
+        n_keep = max(1, math.ceil(ratio * len(block)))
+        top = np.argsort(-scores, kind="stable")[:n_keep]
+        kept.extend(block_start + i for i in sorted(top.tolist()))
+
+    return " ".join(sentences[i] for i in kept)
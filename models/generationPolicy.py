@@ -0,0 +1,113 @@
+#generation policies for the summarizer
+#a policy sets the beam width and the length budget of every chunk summary (the map
+#stage), which together decide most of the cost of a long summary: beam search runs
+#num_beams hypotheses for every generated token. the presets trade quality for speed,
+#and choose_policy() picks the best one that is expected to finish within a deadline,
+#from the decoding speed measured on the previous generate calls
+
+import math
+import threading
+
+
+#presets from fastest to best, map_budget = (max_length, min_length) of every chunk
+#summary, None keeps the summarizer's own budgets (the current behaviour)
+PRESETS = {
+    "fast": {"num_beams": 1, "map_budget": (60, 10)},
+    "balanced": {"num_beams": 2, "map_budget": (100, 20)},
+    "quality": {"num_beams": 4, "map_budget": None}
+}
+DEFAULT_PRESET = "quality"
+
+#in latency-target mode the fast preset may shrink its chunk summaries down to this
+MIN_MAP_MAX_LENGTH = 30
+
+#decoding speed assumed before anything was measured, in beam tokens per second
+DEFAULT_TOKENS_PER_SECOND = 300.0
+
+#the model input and the budget of one chunk, in tokens (see TextChunker)
+MAX_INPUT_TOKENS = 1024
+CHUNK_TOKENS = 900
+
+
+def make_policy(preset=DEFAULT_PRESET, map_budget=None):
+    #the settings of a preset, map_budget overrides its chunk summary budget
+    if preset not in PRESETS:
+        raise ValueError(f"Unknown preset '{preset}'. Available: {', '.join(PRESETS)}")
+    policy = {"preset": preset, **PRESETS[preset]}
+    if map_budget is not None:
+        policy["map_budget"] = map_budget
+    return policy
+
+
+def level_budgets(policy):
+    #level_budgets argument for TextSummarizer.summarize_hierarchical, None = its defaults
+    return [tuple(policy["map_budget"])] if policy["map_budget"] else None
+
+
+class ThroughputMeter:
+    #moving average of the decoding speed, in generated tokens times beams per second,
+    #which is what beam search spends its time on. padded batch outputs count in full
+    #since the padding is decoded too
+    def __init__(self, smoothing=0.3, default=DEFAULT_TOKENS_PER_SECOND):
+        self.smoothing = smoothing
+        self.tokens_per_second = default
+        self.samples = 0
+        self._lock = threading.Lock()
+
+    def record(self, beam_tokens, seconds):
+        if beam_tokens <= 0 or seconds <= 0:
+            return
+        rate = beam_tokens / seconds
+        with self._lock:
+            if self.samples == 0:
+                self.tokens_per_second = rate
+            else:
+                self.tokens_per_second += self.smoothing * (rate - self.tokens_per_second)
+            self.samples += 1
+
+
+def estimate_seconds(policy, input_tokens, max_length, tokens_per_second):
+    #upper bound on the time to summarize input_tokens with this policy: every summary
+    #is assumed to use its whole max_length, at the measured speed
+    num_beams = policy["num_beams"]
+    if input_tokens <= MAX_INPUT_TOKENS:
+        return max_length * num_beams / tokens_per_second
+
+    n_texts = math.ceil(input_tokens / CHUNK_TOKENS)
+    if policy["map_budget"]:
+        level_max = policy["map_budget"][0]
+    else:
+        level_max = max_length // n_texts + 50
+    beam_tokens = n_texts * level_max * num_beams
+
+    #reduce levels until the summaries fit in one input, then the final summary
+    summary_tokens = n_texts * level_max
+    for _ in range(10):
+        if summary_tokens <= CHUNK_TOKENS:
+            break
+        n_texts = math.ceil(summary_tokens / CHUNK_TOKENS)
+        level_max = min(max_length // n_texts + 50, CHUNK_TOKENS // 2)
+        beam_tokens += n_texts * level_max * num_beams
+        summary_tokens = n_texts * level_max
+    beam_tokens += max_length * num_beams
+
+    return beam_tokens / tokens_per_second
+
+
+def choose_policy(input_tokens, max_length, latency_target_s, tokens_per_second,
+                  preset=DEFAULT_PRESET):
+    #the best policy, no better than preset, expected to finish within latency_target_s
+    #candidates go from preset down to fast, then fast with shorter chunk summaries
+    #returns: (policy, estimated seconds), the fastest candidate if none meets the target
+    names = list(PRESETS)
+    candidates = [make_policy(name) for name in reversed(names[:names.index(preset) + 1])]
+    fast_max, fast_min = PRESETS["fast"]["map_budget"]
+    while fast_max > MIN_MAP_MAX_LENGTH:
+        fast_max = max(MIN_MAP_MAX_LENGTH, fast_max * 2 // 3)
+        candidates.append(make_policy("fast", (fast_max, min(fast_min, fast_max // 3))))
+
+    for policy in candidates:
+        estimate = estimate_seconds(policy, input_tokens, max_length, tokens_per_second)
+        if estimate <= latency_target_s:
+            return policy, estimate
+    return policy, estimate
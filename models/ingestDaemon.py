@@ -0,0 +1,419 @@
+#watch-folder ingestion daemon
+#watches a directory for new audio files, waits until they are completely written,
+#then transcribes them (transcriptions/) and summarizes the transcriptions (summaries/)
+#on a small worker pool. progress is kept in a state file so a restart neither
+#repeats finished files nor forgets unfinished ones, and counters are served in
+#prometheus text format on /metrics
+#
+#usage: python models/ingestDaemon.py incoming/ [--workers 2] [--metrics-port 9108]
+
+import argparse
+import json
+import os
+import queue
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+try:
+    import inotify_simple
+except ImportError:
+    inotify_simple = None
+
+try:
+    from .transcriptStore import TranscriptStore, default_store_path
+except ImportError:
+    from transcriptStore import TranscriptStore, default_store_path
+
+
+AUDIO_EXTENSIONS = (".wav", ".mp3", ".m4a", ".mp4", ".webm", ".ogg", ".opus", ".flac", ".aac")
+
+#file states in the state file
+PENDING = "pending"
+DONE = "done"
+FAILED = "failed"
+
+
+class IngestState:
+    #restart-safe record of every file the daemon has seen, saved as json.
+    #files are identified by path, size and mtime, so a file replaced by a new
+    #recording with the same name is processed again
+    def __init__(self, state_path):
+        self.state_path = state_path
+        self._lock = threading.Lock()
+        self._files = {}
+        if os.path.exists(state_path):
+            with open(state_path, 'r', encoding='utf-8') as f:
+                self._files = json.load(f)
+
+    @staticmethod
+    def fingerprint(stat):
+        return [stat.st_size, int(stat.st_mtime)]
+
+    def needs_processing(self, path, stat):
+        #True unless the same version of the file already finished (or failed too often)
+        with self._lock:
+            entry = self._files.get(path)
+        if entry is None or entry["fingerprint"] != self.fingerprint(stat):
+            return True
+        return entry["status"] == PENDING
+
+    def attempts(self, path):
+        with self._lock:
+            return self._files.get(path, {}).get("attempts", 0)
+
+    def begin(self, path, stat):
+        #record the start of an attempt, a crash now leaves the file pending
+        self.mark(path, stat, PENDING, new_attempt=True)
+
+    def mark(self, path, stat, status, new_attempt=False, **fields):
+        with self._lock:
+            entry = self._files.get(path)
+            if entry is None or entry["fingerprint"] != self.fingerprint(stat):
+                entry = {"fingerprint": self.fingerprint(stat), "attempts": 0}
+                self._files[path] = entry
+            if new_attempt:
+                entry["attempts"] += 1
+            entry["status"] = status
+            entry["updated_at"] = time.time()
+            entry.update(fields)
+            self._save()
+
+    def _save(self):
+        #write to a temp file first so a crash never leaves a half-written state file
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._files, f, indent=1)
+        os.replace(tmp_path, self.state_path)
+
+    def counts(self):
+        with self._lock:
+            counts = {PENDING: 0, DONE: 0, FAILED: 0}
+            for entry in self._files.values():
+                counts[entry["status"]] += 1
+            return counts
+
+
+class Metrics:
+    #thread-safe counters and gauges rendered in prometheus text format
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = {}
+        self._help = {}
+
+    def describe(self, name, kind, help_text):
+        self._help[name] = (kind, help_text)
+        self._values.setdefault(name, 0)
+
+    def inc(self, name, amount=1):
+        with self._lock:
+            self._values[name] += amount
+
+    def set(self, name, value):
+        with self._lock:
+            self._values[name] = value
+
+    def render(self):
+        lines = []
+        with self._lock:
+            for name, value in self._values.items():
+                kind, help_text = self._help[name]
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def serve_metrics(metrics, port, host="0.0.0.0"):
+    #serve /metrics from a background thread, returns the server (call shutdown() to stop)
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+            body = metrics.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class IngestDaemon:
+    def __init__(self, input_dir, transcription_dir="transcriptions", summary_dir="summaries",
+                 state_path=None, speech_to_text=None, summarizer=None, num_workers=2,
+                 max_queue=8, settle_seconds=5.0, poll_interval=2.0, max_attempts=3,
+                 summarize=True, store_path=None):
+        #input_dir: directory watched for new audio files
+        #speech_to_text / summarizer: model instances, loaded on start() if not given
+        #num_workers: files processed at the same time (transcription and summarization
+        #             of different files overlap, each model runs one file at a time)
+        #max_queue: files waiting for a worker; when full, new files stay on disk and are
+        #           picked up again by a later scan (back-pressure instead of unbounded memory)
+        #settle_seconds: a file is only ingested once its size and mtime stopped changing this long
+        #poll_interval: seconds between directory scans (inotify wakes the scan up earlier)
+        #max_attempts: tries per file before it is marked failed (a restart counts as an attempt)
+        #summarize: also summarize every transcription
+        #store_path: transcript store the transcriptions are added to, defaults to
+        #            TRANSCRIPT_DB or <transcription_dir>/transcripts.db
+        self.input_dir = input_dir
+        self.transcription_dir = transcription_dir
+        self.summary_dir = summary_dir
+        self.state = IngestState(state_path or os.path.join(input_dir, ".ingest_state.json"))
+        self.speech_to_text = speech_to_text
+        self.summarizer = summarizer
+        self.num_workers = max(1, num_workers)
+        self.settle_seconds = settle_seconds
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.summarize = summarize
+        self.store_path = store_path or default_store_path(transcription_dir)
+        self.store = None
+
+        self._queue = queue.Queue(maxsize=max(1, max_queue))
+        self._queued = set()
+        self._candidates = {}          #path -> (size, mtime, time first seen unchanged)
+        self._stt_lock = threading.Lock()
+        self._summary_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = []
+        self._inotify = None
+
+        self.metrics = Metrics()
+        for name, kind, help_text in [
+            ("ingest_files_discovered_total", "counter", "Audio files found ready for ingestion"),
+            ("ingest_files_processed_total", "counter", "Audio files transcribed (and summarized)"),
+            ("ingest_files_failed_total", "counter", "Failed ingestion attempts"),
+            ("ingest_backpressure_total", "counter", "Ready files left on disk because the queue was full"),
+            ("ingest_transcribe_seconds_total", "counter", "Time spent transcribing"),
+            ("ingest_summarize_seconds_total", "counter", "Time spent summarizing"),
+            ("ingest_queue_depth", "gauge", "Files waiting for a worker"),
+            ("ingest_in_progress", "gauge", "Files being processed")
+        ]:
+            self.metrics.describe(name, kind, help_text)
+
+    def start(self):
+        #load the models if needed and start the worker threads and the watcher
+        if self.speech_to_text is None:
+            try:
+                from .speechToText import SpeechToText
+            except ImportError:
+                from speechToText import SpeechToText
+            self.speech_to_text = SpeechToText()
+        if self.summarize and self.summarizer is None:
+            try:
+                from .textSummarizer import TextSummarizer
+            except ImportError:
+                from textSummarizer import TextSummarizer
+            self.summarizer = TextSummarizer()
+
+        if self.store is None:
+            self.store = TranscriptStore(self.store_path)
+
+        os.makedirs(self.input_dir, exist_ok=True)
+        if inotify_simple is not None:
+            flags = inotify_simple.flags
+            self._inotify = inotify_simple.INotify()
+            self._inotify.add_watch(self.input_dir, flags.CLOSE_WRITE | flags.MOVED_TO | flags.CREATE)
+            print(f"Watching {self.input_dir} (inotify)")
+        else:
+            print(f"Watching {self.input_dir} (polling every {self.poll_interval}s)")
+
+        self._stop.clear()
+        for i in range(self.num_workers):
+            thread = threading.Thread(target=self._work, name=f"ingest-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        watcher = threading.Thread(target=self._watch, name="ingest-watcher", daemon=True)
+        watcher.start()
+        self._threads.append(watcher)
+
+    def stop(self):
+        #stop after the files being processed are done, queued files stay pending in the state
+        self._stop.set()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+        if self.store is not None:
+            self.store.close()
+            self.store = None
+
+    def run_forever(self):
+        self.start()
+        try:
+            while not self._stop.is_set():
+                time.sleep(1)
+        except KeyboardInterrupt:
+            print("\nStopping, waiting for running files to finish...")
+        self.stop()
+
+    def _watch(self):
+        while not self._stop.is_set():
+            self.scan()
+            self._wait_for_changes()
+
+    def _wait_for_changes(self):
+        #sleep until the next scan, or until inotify reports a change in the directory
+        if self._inotify is None:
+            self._stop.wait(self.poll_interval)
+            return
+        self._inotify.read(timeout=int(self.poll_interval * 1000))
+
+    def scan(self):
+        #find audio files that are ready (fully written and not yet processed) and queue them
+        now = time.monotonic()
+        seen = set()
+        try:
+            names = os.listdir(self.input_dir)
+        except OSError as e:
+            print(f"Error scanning {self.input_dir}: {e}")
+            return
+
+        for name in sorted(names):
+            if not name.lower().endswith(AUDIO_EXTENSIONS):
+                continue
+            path = os.path.abspath(os.path.join(self.input_dir, name))
+            seen.add(path)
+            if path in self._queued:
+                continue
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            if not self.state.needs_processing(path, stat):
+                continue
+
+            #debounce: size and mtime must stay the same for settle_seconds
+            signature = (stat.st_size, stat.st_mtime)
+            previous = self._candidates.get(path)
+            if previous is None or previous[:2] != signature:
+                self._candidates[path] = signature + (now,)
+                continue
+            if now - previous[2] < self.settle_seconds or stat.st_size == 0:
+                continue
+
+            try:
+                self._queue.put_nowait(path)
+            except queue.Full:
+                self.metrics.inc("ingest_backpressure_total")
+                break
+            self._queued.add(path)
+            del self._candidates[path]
+            self.metrics.inc("ingest_files_discovered_total")
+
+        #forget files that were deleted before they settled
+        for path in list(self._candidates):
+            if path not in seen:
+                del self._candidates[path]
+        self.metrics.set("ingest_queue_depth", self._queue.qsize())
+
+    def _work(self):
+        while not self._stop.is_set():
+            try:
+                path = self._queue.get(timeout=1)
+            except queue.Empty:
+                continue
+            self.metrics.set("ingest_queue_depth", self._queue.qsize())
+            self.metrics.inc("ingest_in_progress")
+            try:
+                self.process(path)
+            finally:
+                self.metrics.inc("ingest_in_progress", -1)
+                self._queued.discard(path)
+
+    def process(self, path):
+        #transcribe and summarize one audio file, recording the outcome in the state file
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return
+        attempts = self.state.attempts(path)
+        if attempts >= self.max_attempts:
+            self.state.mark(path, stat, FAILED, error="too many attempts")
+            return
+        self.state.begin(path, stat)
+
+        name = os.path.basename(path)
+        print(f"Ingesting {name}")
+        try:
+            start = time.perf_counter()
+            with self._stt_lock:
+                outputs = self.speech_to_text.save_transcription_to_file(
+                    path, output_dir=self.transcription_dir, store=self.store)
+            self.metrics.inc("ingest_transcribe_seconds_total", round(time.perf_counter() - start, 3))
+
+            summary_path = None
+            if self.summarize:
+                #summarize the english version of translated recordings
+                source = outputs.get("translation", outputs["original"])
+                start = time.perf_counter()
+                with self._summary_lock:
+                    self.summarizer.summarize_transcription_file(source, output_dir=self.summary_dir)
+                self.metrics.inc("ingest_summarize_seconds_total", round(time.perf_counter() - start, 3))
+                summary_path = os.path.join(
+                    self.summary_dir, os.path.basename(source).replace('.txt', '_SUMMARY.txt'))
+        except Exception as e:
+            print(f"✗ Error ingesting {name}: {e}")
+            self.metrics.inc("ingest_files_failed_total")
+            status = FAILED if attempts + 1 >= self.max_attempts else PENDING
+            self.state.mark(path, stat, status, error=str(e))
+            return
+
+        self.state.mark(path, stat, DONE, outputs=outputs, summary=summary_path, error=None)
+        self.metrics.inc("ingest_files_processed_total")
+        print(f"✓ Ingested {name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Transcribe and summarize audio files dropped into a folder")
+    parser.add_argument("input_dir", help="directory to watch for audio files")
+    parser.add_argument("--transcriptions", default="transcriptions", help="output directory for transcriptions")
+    parser.add_argument("--summaries", default="summaries", help="output directory for summaries")
+    parser.add_argument("--db", default=None,
+                        help="transcript store (default: $TRANSCRIPT_DB or <transcriptions>/transcripts.db)")
+    parser.add_argument("--state", default=None, help="state file (default: <input_dir>/.ingest_state.json)")
+    parser.add_argument("--model", default="base", help="whisper model size")
+    parser.add_argument("--workers", type=int, default=2, help="files processed at the same time")
+    parser.add_argument("--max-queue", type=int, default=8, help="files waiting for a worker")
+    parser.add_argument("--settle", type=float, default=5.0, help="seconds a file must be unchanged before ingesting")
+    parser.add_argument("--poll", type=float, default=2.0, help="seconds between directory scans")
+    parser.add_argument("--no-summary", action="store_true", help="only transcribe")
+    parser.add_argument("--metrics-port", type=int, default=None, help="serve prometheus metrics on this port")
+    args = parser.parse_args()
+
+    try:
+        from .speechToText import SpeechToText
+    except ImportError:
+        from speechToText import SpeechToText
+
+    daemon = IngestDaemon(
+        args.input_dir,
+        transcription_dir=args.transcriptions,
+        summary_dir=args.summaries,
+        state_path=args.state,
+        speech_to_text=SpeechToText(model_size=args.model),
+        num_workers=args.workers,
+        max_queue=args.max_queue,
+        settle_seconds=args.settle,
+        poll_interval=args.poll,
+        summarize=not args.no_summary,
+        store_path=args.db
+    )
+    if args.metrics_port:
+        serve_metrics(daemon.metrics, args.metrics_port)
+        print(f"Metrics on http://localhost:{args.metrics_port}/metrics")
+    daemon.run_forever()
+
+
+if __name__ == "__main__":
+    main()
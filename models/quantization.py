@@ -0,0 +1,19 @@
+#dynamic int8 quantization for cpu inference
+#the weights of every linear layer are stored as int8 and activations are quantized
+#on the fly, which makes the big matrix multiplications of bart and whisper faster
+#on cpu and the weights about 4x smaller, at a small cost in output quality
+
+import torch
+from torch import nn
+
+
+def quantize_linear_layers(model, linear_subclasses=()):
+    #return model with its nn.Linear layers dynamically quantized to int8 (cpu only)
+    #linear_subclasses: nn.Linear subclasses that only change forward() (like whisper's
+    #                   Linear, which casts weights to the input dtype) and can be treated as
+    #                   plain nn.Linear, torch only quantizes exact nn.Linear modules
+    for module in model.modules():
+        if type(module) in linear_subclasses:
+            module.__class__ = nn.Linear
+
+    return torch.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
@@ -0,0 +1,170 @@
+#content-addressed on-disk cache for transcriptions and summaries
+#entries are keyed by a hash of the input content plus everything that changes
+#the output (model, language, generation settings), stored as json files and
+#evicted least-recently-used first once the cache is over its size budget
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+
+READ_SIZE = 1024 * 1024
+
+
+def hash_bytes(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_text(text):
+    return hash_bytes(text.encode("utf-8"))
+
+
+def hash_file(source):
+    #sha256 of a file's content, source is a path or an open binary file object
+    digest = hashlib.sha256()
+    if isinstance(source, str):
+        with open(source, "rb") as f:
+            for block in iter(lambda: f.read(READ_SIZE), b""):
+                digest.update(block)
+    else:
+        source.seek(0)
+        for block in iter(lambda: source.read(READ_SIZE), b""):
+            digest.update(block)
+        source.seek(0)
+    return digest.hexdigest()
+
+
+def hash_samples(samples):
+    #sha256 of decoded audio samples (numpy array) without copying them
+    digest = hashlib.sha256()
+    digest.update(memoryview(samples.reshape(-1)).cast("B"))
+    return digest.hexdigest()
+
+
+def make_key(kind, content_hash, **params):
+    #cache key for one result: what it is, what it was made from and how
+    payload = json.dumps({"kind": kind, "content": content_hash, "params": params}, sort_keys=True)
+    return hash_text(payload)
+
+
+def transcription_key(audio_hash, model_size, language=None, task="transcribe", **params):
+    return make_key("transcription", audio_hash, model_size=model_size,
+                    language=language, task=task, **params)
+
+
+def summary_key(text, model_name, **params):
+    return make_key("summary", hash_text(text), model_name=model_name, **params)
+
+
+def _json_default(value):
+    #numpy scalars and arrays in whisper results
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    raise TypeError(f"Cannot cache value of type {type(value).__name__}")
+
+
+class ResultCache:
+    def __init__(self, cache_dir="cache", max_bytes=1024 * 1024 * 1024, max_entries=None):
+        #cache_dir: directory for the cache files, created if it doesn't exist
+        #max_bytes: total size of cached entries before the least recently used are evicted
+        #max_entries: optional limit on the number of entries
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self._entries = self._load_index()
+        self.total_bytes = sum(self._entries.values())
+
+    def _load_index(self):
+        #rebuild the lru order from the files' modification times (touched on every hit)
+        found = []
+        for shard in os.listdir(self.cache_dir):
+            shard_dir = os.path.join(self.cache_dir, shard)
+            if not os.path.isdir(shard_dir):
+                continue
+            for filename in os.listdir(shard_dir):
+                if filename.endswith(".json"):
+                    stat = os.stat(os.path.join(shard_dir, filename))
+                    found.append((stat.st_mtime, filename[:-5], stat.st_size))
+
+        found.sort()
+        return OrderedDict((key, size) for _, key, size in found)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + ".json")
+
+    def get(self, key):
+        #cached value for key, or None on a miss
+        path = self._path(key)
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                value = json.load(f)
+            os.utime(path)
+            return value
+        except (OSError, ValueError):
+            #file went missing or is damaged, treat it as a miss
+            with self._lock:
+                self.hits -= 1
+                self.misses += 1
+                self.total_bytes -= self._entries.pop(key, 0)
+            return None
+
+    def put(self, key, value):
+        #store a json-serializable value and evict old entries if over budget
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = json.dumps(value, default=_json_default).encode("utf-8")
+
+        #write to a temp file first so readers never see a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self.total_bytes -= self._entries.pop(key, 0)
+            self._entries[key] = len(data)
+            self.total_bytes += len(data)
+            self._evict()
+
+    def _evict(self):
+        #drop least recently used entries until within budget, lock must be held
+        while self._entries and (
+            self.total_bytes > self.max_bytes
+            or (self.max_entries is not None and len(self._entries) > self.max_entries)
+        ):
+            key, size = self._entries.popitem(last=False)
+            self.total_bytes -= size
+            self.evictions += 1
+            try:
+                os.unlink(self._path(key))
+            except OSError:
+                pass
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+                "evictions": self.evictions
+            }
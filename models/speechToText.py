@@ -1,44 +1,358 @@
 import whisper
 import torch
 import warnings
+import numpy as np
+import multiprocessing
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from whisper.tokenizer import get_tokenizer
 from datetime import datetime
 import os
+
+#relative import when used as a package, plain import when run as a script
+try:
+    from .audioDecoder import decode_audio, SAMPLE_RATE
+    from .voiceActivity import detect_speech, SpeechTimeline
+    from .resultCache import hash_file, hash_samples, transcription_key
+    from .quantization import quantize_linear_layers
+    from .transcriptStore import TranscriptStore, default_store_path
+except ImportError:
+    from audioDecoder import decode_audio, SAMPLE_RATE
+    from voiceActivity import detect_speech, SpeechTimeline
+    from resultCache import hash_file, hash_samples, transcription_key
+    from quantization import quantize_linear_layers
+    from transcriptStore import TranscriptStore, default_store_path
+
 warnings.filterwarnings("ignore")
 
 
 class SpeechToText:
-    def __init__(self, model_size="base"):
+    def __init__(self, model_size="base", vad=False, cache=None, quantize=False):
         #load whisper model for converting speech to text
+        #vad: skip silence with voice activity detection before running whisper
+        #cache: optional ResultCache, transcriptions of the same audio and settings are reused
+        #quantize: int8 weights for the linear layers, faster and smaller on cpu (ignored on gpu)
         print(f"Loading Whisper {model_size} model...")
+        self.model_size = model_size
+        self.vad = vad
+        self.cache = cache
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
+        self.quantize = quantize and self.device == "cpu"
         
         #show gpu info if using cuda
         if self.device == "cuda":
             print(f"Using GPU: {torch.cuda.get_device_name(0)} ({torch.cuda.get_device_properties(0).total_memory / 1024**3:.1f} GB)")
         
-        self.model = whisper.load_model(model_size, device=self.device)
-        print(f"Model loaded on {self.device}")
+        self.model = _load_whisper(model_size, self.device, self.quantize)
+        print(f"Model loaded on {self.device}" + (" (int8)" if self.quantize else ""))
+    
+    def warm_up(self):
+        #run one short decode so the first real request doesn't pay for lazy initialisation
+        silence = np.zeros(SAMPLE_RATE, dtype=np.float32)
+        self.model.transcribe(silence, language="en", fp16=(self.device == "cuda"))
     
-    def transcribe(self, audio_path, language=None, task="transcribe"):
+    def load_audio(self, audio_path, mmap_dir=None):
+        #decode an audio file once into 16 kHz mono float32 samples
+        #the samples can be passed to transcribe() as often as needed without decoding again
+        #audio_path: path to audio file or an open binary file object
+        #mmap_dir: keep the samples in a memory-mapped file in this directory instead of RAM
+        return decode_audio(audio_path, mmap_dir=mmap_dir)
+    
+    def transcribe(self, audio_path, language=None, task="transcribe", vad=None):
         #convert audio file to text
-        #audio_path: path to audio file
+        #audio_path: path to audio file, open binary file, or samples from load_audio()
         #language: language code like 'en' or 'es', leave as None to auto-detect
         #task: "transcribe" for original language, "translate" for English translation
-        print(f"Transcribing {audio_path}...")
+        #vad: override the voice activity detection setting for this call
+        vad = self.vad if vad is None else vad
+        
+        #look up the audio content before spending time on decoding it
+        cache_key = None
+        if self.cache is not None:
+            if isinstance(audio_path, np.ndarray):
+                audio_hash = hash_samples(audio_path)
+            else:
+                audio_hash = hash_file(audio_path)
+            cache_key = transcription_key(audio_hash, self.model_size, language, task, vad=vad,
+                                          quantize=self.quantize)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                print("Using cached transcription")
+                return cached
+        
+        if isinstance(audio_path, np.ndarray):
+            audio = audio_path
+            print(f"Transcribing {len(audio) / SAMPLE_RATE:.0f}s of audio...")
+        else:
+            print(f"Transcribing {getattr(audio_path, 'name', audio_path)}...")
+            audio = self.load_audio(audio_path)
+        
+        timeline = self._speech_timeline(audio, vad)
+        if timeline is not None:
+            if not timeline.speech_seconds:
+                return {"text": "", "language": language or "unknown", "segments": []}
+            audio = timeline.audio
         
         #transcribe with whisper
         result = self.model.transcribe(
-            audio_path,
+            audio,
             language=language,
             task=task,
             fp16=(self.device == "cuda")
         )
         
-        return {
+        result = {
             "text": result["text"],
             "language": result["language"],
             "segments": result["segments"]
         }
+        
+        if timeline is not None:
+            self._restore_times(result, timeline)
+        
+        if cache_key is not None:
+            self.cache.put(cache_key, result)
+        
+        return result
+    
+    def _speech_timeline(self, audio, vad=None):
+        #cut silence out of the audio, returns None when vad is off
+        if not (self.vad if vad is None else vad):
+            return None
+        
+        timeline = SpeechTimeline(audio, detect_speech(audio, SAMPLE_RATE), SAMPLE_RATE)
+        print(f"Voice activity: {timeline.speech_seconds:.0f}s of speech in "
+              f"{timeline.original_seconds:.0f}s of audio")
+        return timeline
+    
+    def _restore_times(self, result, timeline):
+        #map segment (and word) times of the shortened audio back to the recording
+        for segment in result["segments"]:
+            segment["start"] = timeline.to_original(segment["start"])
+            segment["end"] = timeline.to_original(segment["end"])
+            for word in segment.get("words", []):
+                word["start"] = timeline.to_original(word["start"])
+                word["end"] = timeline.to_original(word["end"])
+    
+    def detect_language(self, audio_path):
+        #detect the spoken language from the first 30 seconds of audio
+        #audio_path: path to audio file, open binary file, or samples from load_audio()
+        audio = audio_path if isinstance(audio_path, np.ndarray) else self.load_audio(audio_path)
+        return self._detect_language_window(audio)[0]
+    
+    def _detect_language_window(self, audio):
+        #language of the first window, with the mel spectrogram and that window's encoder
+        #output so transcribe_and_translate can start from them instead of computing them again
+        #english-only models have nothing to detect (and whisper's detect_language fails on them)
+        if not self.model.is_multilingual:
+            return "en", None
+        mel = whisper.log_mel_spectrogram(audio, self.model.dims.n_mels, padding=whisper.audio.N_SAMPLES)
+        features = self._encode_window(mel, 0)
+        return self._detect_language_from_features(features), (mel, features)
+    
+    def transcribe_and_translate(self, audio_path, language=None, vad=None, encoded=None):
+        #transcribe in the original language and translate to English in one pass
+        #each 30 s window goes through the whisper encoder once, and both the
+        #transcribe and the translate decoders run on the same encoder output
+        #audio_path: path to audio file, open binary file, or samples from load_audio()
+        #language: source language code, None to auto-detect
+        #vad: override the voice activity detection setting for this call
+        #encoded: (mel, first window encoder output) of the same audio, from _detect_language_window
+        #returns: {"transcription": {...}, "translation": {...}} in the format of transcribe()
+        audio = audio_path if isinstance(audio_path, np.ndarray) else self.load_audio(audio_path)
+        print(f"Transcribing and translating {len(audio) / SAMPLE_RATE:.0f}s of audio...")
+        
+        timeline = self._speech_timeline(audio, vad)
+        if timeline is not None:
+            if not timeline.speech_seconds:
+                empty = {"text": "", "language": language or "unknown", "segments": []}
+                return {"transcription": empty, "translation": dict(empty, segments=[])}
+            audio = timeline.audio
+        
+        if encoded is not None:
+            mel, first_features = encoded
+        else:
+            mel = whisper.log_mel_spectrogram(audio, self.model.dims.n_mels, padding=whisper.audio.N_SAMPLES)
+            first_features = None
+        n_frames = mel.shape[-1] - whisper.audio.N_FRAMES
+        if language is None and not self.model.is_multilingual:
+            language = "en"
+        
+        tasks = ("transcribe", "translate")
+        outputs = {task: {"tokens": [], "segments": []} for task in tasks}
+        
+        for seek in range(0, max(n_frames, 1), whisper.audio.N_FRAMES):
+            if seek == 0 and first_features is not None:
+                features = first_features
+            else:
+                features = self._encode_window(mel, seek)
+            if language is None:
+                language = self._detect_language_from_features(features)
+            
+            offset = seek / whisper.audio.FRAMES_PER_SECOND
+            duration = min(whisper.audio.N_FRAMES, n_frames - seek) / whisper.audio.FRAMES_PER_SECOND
+            
+            for task in tasks:
+                output = outputs[task]
+                tokenizer = get_tokenizer(
+                    self.model.is_multilingual,
+                    num_languages=self.model.num_languages,
+                    language=language,
+                    task=task
+                )
+                result = self._decode_window(features, task, language, output["tokens"])
+                
+                #skip windows whisper considers silent, like model.transcribe does
+                if result.no_speech_prob > 0.6 and result.avg_logprob < -1.0:
+                    continue
+                
+                output["tokens"].extend(result.tokens)
+                for segment in self._segments_from_tokens(tokenizer, result.tokens, offset, duration):
+                    segment["id"] = len(output["segments"])
+                    segment["seek"] = seek
+                    output["segments"].append(segment)
+        
+        results = {}
+        for task, key in zip(tasks, ("transcription", "translation")):
+            segments = outputs[task]["segments"]
+            results[key] = {
+                "text": "".join(segment["text"] for segment in segments),
+                "language": language or "unknown",
+                "segments": segments
+            }
+            if timeline is not None:
+                self._restore_times(results[key], timeline)
+        return results
+    
+    def _encode_window(self, mel, seek):
+        #run the whisper encoder on the 30 s mel window starting at frame seek
+        dtype = torch.float16 if self.device == "cuda" else torch.float32
+        segment = whisper.audio.pad_or_trim(mel[:, seek:seek + whisper.audio.N_FRAMES], whisper.audio.N_FRAMES)
+        with torch.no_grad():
+            return self.model.embed_audio(segment.to(self.model.device).to(dtype)[None])
+    
+    def _detect_language_from_features(self, features):
+        #detect_language skips the encoder when given encoder output
+        _, probs = self.model.detect_language(features)
+        return max(probs[0], key=probs[0].get)
+    
+    def _decode_window(self, features, task, language, previous_tokens):
+        #decode one window from precomputed encoder output
+        #uses the same temperature fallback as whisper's transcribe
+        result = None
+        for temperature in (0.0, 0.2, 0.4, 0.6, 0.8, 1.0):
+            options = whisper.DecodingOptions(
+                task=task,
+                language=language,
+                temperature=temperature,
+                best_of=5 if temperature > 0 else None,
+                prompt=previous_tokens or None,
+                fp16=(self.device == "cuda")
+            )
+            result = self.model.decode(features, options)[0]
+            
+            too_repetitive = result.compression_ratio > 2.4
+            too_unlikely = result.avg_logprob < -1.0
+            if result.no_speech_prob > 0.6 or not (too_repetitive or too_unlikely):
+                break
+        return result
+    
+    def _segments_from_tokens(self, tokenizer, tokens, offset, duration):
+        #turn "<|t0|> text <|t1|><|t1|> text <|t2|>" tokens into timed segments
+        #offset: start of the window in seconds, duration: length of audio in the window
+        segments = []
+        start = None
+        text_tokens = []
+        
+        def add_segment(end):
+            text = tokenizer.decode(text_tokens)
+            if text.strip():
+                segments.append({
+                    "start": round(offset + (start or 0.0), 2),
+                    "end": round(offset + end, 2),
+                    "text": text
+                })
+        
+        for token in tokens:
+            if token >= tokenizer.timestamp_begin:
+                time = (token - tokenizer.timestamp_begin) * 0.02
+                if start is not None and text_tokens:
+                    add_segment(time)
+                    text_tokens = []
+                    start = None
+                else:
+                    start = time
+            else:
+                text_tokens.append(token)
+        
+        #text without a closing timestamp runs to the end of the window
+        if text_tokens:
+            add_segment(duration)
+        
+        return segments
+    
+    def transcribe_parallel(self, audio_path, language=None, task="transcribe", workers=None,
+                            segment_seconds=300, overlap_seconds=1.0):
+        #transcribe long audio on several worker processes at once
+        #the audio is cut into segments of about segment_seconds at silences, each
+        #segment is transcribed by its own worker and the results are stitched back
+        #together with timestamps shifted to their place in the recording
+        #workers: number of worker processes, defaults to one per 4 cpu cores
+        #overlap_seconds: audio shared by neighbouring segments when no silence was found
+        #                 to cut at, the repeated words are removed when stitching
+        #returns: same format as transcribe()
+        global _fork_model, _fork_audio
+        audio = audio_path if isinstance(audio_path, np.ndarray) else self.load_audio(audio_path)
+        workers = workers or max(1, (os.cpu_count() or 1) // 4)
+        
+        #detect once so every segment uses the same language
+        if language is None:
+            language = self.detect_language(audio)
+        
+        bounds = _split_at_silences(audio, segment_seconds, overlap_seconds)
+        
+        #forked workers would break cuda, and one segment needs no pool
+        if self.device == "cuda" or workers == 1 or len(bounds) == 1:
+            return self.transcribe(audio, language=language, task=task)
+        
+        print(f"Transcribing {len(audio) / SAMPLE_RATE:.0f}s of audio as {len(bounds)} segments "
+              f"on {workers} worker processes...")
+        
+        threads = max(1, (os.cpu_count() or 1) // workers)
+        
+        #the lock keeps concurrent calls from replacing each other's model and audio before
+        #their workers are forked. forking while other threads run (a threaded server) could
+        #copy a lock one of them holds into the workers and deadlock them, so those spawn
+        with _fork_lock:
+            if "fork" in multiprocessing.get_all_start_methods() and threading.active_count() == 1:
+                #forked workers share the loaded weights and the audio copy-on-write
+                _fork_model, _fork_audio = self.model, audio
+                pool = ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=multiprocessing.get_context("fork"),
+                    initializer=_init_segment_worker,
+                    initargs=(None, threads)
+                )
+                try:
+                    results = _run_segments(pool, [(start, end, None) for start, end in bounds],
+                                            language, task)
+                finally:
+                    _fork_model, _fork_audio = None, None
+                return _stitch_segments(results, bounds, language)
+        
+        #no fork (windows) or other threads running: every worker loads its own model
+        #and gets its audio slice
+        pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_segment_worker,
+            initargs=(self.model_size, threads, self.quantize)
+        )
+        jobs = [(start, end, np.asarray(audio[start:end])) for start, end in bounds]
+        results = _run_segments(pool, jobs, language, task)
+        
+        return _stitch_segments(results, bounds, language)
     
     def transcribe_with_timestamps(self, audio_path, language=None):
         #get transcription with time stamps for each part
@@ -55,19 +369,70 @@ class SpeechToText:
         
         return segments
     
-    def save_transcription_to_file(self, audio_path, language=None, output_dir="transcriptions"):
+    def transcribe_words(self, audio, language=None, prompt=None):
+        #transcribe samples with a timestamp for every word, used by live streaming
+        #prompt: text spoken just before this audio, helps whisper continue it consistently
+        #returns: {"language": code, "words": [{"start", "end", "word"}, ...]}
+        result = self.model.transcribe(
+            audio,
+            language=language,
+            word_timestamps=True,
+            condition_on_previous_text=False,
+            initial_prompt=prompt,
+            fp16=(self.device == "cuda")
+        )
+        
+        words = []
+        for segment in result["segments"]:
+            for word in segment.get("words", []):
+                words.append({"start": word["start"], "end": word["end"], "word": word["word"]})
+        
+        return {"language": result["language"], "words": words}
+    
+    def save_transcription_to_file(self, audio_path, language=None, output_dir="transcriptions",
+                                   store=None):
         #transcribe audio and save results to a text file with timestamp
         #creates a file with date, time, detected language, and full transcription
         #if language is Tagalog, creates both original and English translation
+        #the text, segments and hashes also go into the transcript store
         #
         #language: specify language for transcription (e.g., 'tl' for Tagalog), None for auto-detect
+        #store: TranscriptStore to add the meeting to, defaults to the one in output_dir
+        #returns: {"original": path, "translation": path (Tagalog only), "meeting_id": id}
         
         #create output directory if it doesn't exist
         if not os.path.exists(output_dir):
             os.makedirs(output_dir)
         
+        #decode once, the samples are reused if a translation is needed
+        audio = self.load_audio(audio_path)
+        
+        #cut silence once, the language is detected from the speech that is transcribed
+        timeline = self._speech_timeline(audio)
+        speech = timeline.audio if timeline is not None else audio
+        
         #get transcription
-        result = self.transcribe(audio_path, language)
+        translation_result = None
+        if timeline is not None and not timeline.speech_seconds:
+            result = {"text": "", "language": language or "unknown", "segments": []}
+        else:
+            #detect language up front so Tagalog can be transcribed and translated in a
+            #single pass over the encoder, which starts from the detection's first window
+            encoded = None
+            if language is None:
+                language, encoded = self._detect_language_window(speech)
+            
+            if language == 'tl':
+                combined = self.transcribe_and_translate(speech, language, vad=False, encoded=encoded)
+                result = combined["transcription"]
+                translation_result = combined["translation"]
+            else:
+                result = self.transcribe(speech, language, vad=False)
+            
+            if timeline is not None:
+                for restored in (result, translation_result):
+                    if restored is not None:
+                        self._restore_times(restored, timeline)
         detected_language = result['language']
         
         #get current date and time
@@ -103,8 +468,7 @@ class SpeechToText:
         
         #if Tagalog detected, create English translation
         if needs_translation:
-            print(f"\nDetected Tagalog. Creating English translation...")
-            translation_result = self.transcribe(audio_path, language='tl', task="translate")
+            print(f"\nDetected Tagalog. Saving English translation...")
             
             #save translation
             translation_filename = f"{audio_basename}_{filename_timestamp}_EN.txt"
@@ -125,9 +489,163 @@ class SpeechToText:
                 f.write(translation_result['text'])
             
             print(f"English translation saved to: {translation_path}")
-            return {"original": output_path, "translation": translation_path}
         
-        return {"original": output_path}
+        meeting_id = self._store_transcription(
+            store, output_dir, audio_path, audio, result, translation_result,
+            title=audio_basename, source_file=output_filename, created_at=now.isoformat()
+        )
+        
+        paths = {"original": output_path, "meeting_id": meeting_id}
+        if needs_translation:
+            paths["translation"] = translation_path
+        return paths
+    
+    def _store_transcription(self, store, output_dir, audio_path, audio, result, translation_result,
+                             **fields):
+        #add a saved transcription to the transcript store, returns its meeting id
+        own_store = store is None
+        if own_store:
+            store = TranscriptStore(default_store_path(output_dir))
+        try:
+            return store.add(
+                result["text"].strip(),
+                language=result["language"],
+                segments=result.get("segments"),
+                translation=translation_result["text"].strip() if translation_result else None,
+                translation_segments=translation_result.get("segments") if translation_result else None,
+                audio_path=audio_path,
+                audio_hash=hash_samples(audio),
+                model=self.model_size,
+                **fields
+            )
+        finally:
+            if own_store:
+                store.close()
+
+
+#model and audio inherited by forked segment workers, set while _fork_lock is held
+_fork_lock = threading.Lock()
+_fork_model = None
+_fork_audio = None
+_worker_model = None
+
+
+def _load_whisper(model_size, device, quantize=False):
+    model = whisper.load_model(model_size, device=device)
+    if quantize:
+        model = quantize_linear_layers(model, linear_subclasses=(whisper.model.Linear,))
+    return model
+
+
+def _init_segment_worker(model_size, num_threads, quantize=False):
+    #runs once in every segment worker, spawned workers load their own model
+    global _worker_model
+    torch.set_num_threads(num_threads)
+    _worker_model = _fork_model if model_size is None else _load_whisper(model_size, "cpu", quantize)
+
+
+def _run_segments(pool, jobs, language, task):
+    #transcribe (start, end, samples) jobs on the pool, results in job order
+    with pool:
+        return list(pool.map(
+            _transcribe_segment,
+            [(start, end, samples, language, task) for start, end, samples in jobs]
+        ))
+
+
+def _transcribe_segment(job):
+    start, end, samples, language, task = job
+    if samples is None:
+        samples = np.asarray(_fork_audio[start:end])
+    return _worker_model.transcribe(samples, language=language, task=task, fp16=False)
+
+
+def _split_at_silences(audio, segment_seconds, overlap_seconds):
+    #choose segment bounds (in samples) of about segment_seconds each
+    #cuts go in the middle of the longest silence near the target point, and
+    #only where there is no silence to cut at do segments overlap
+    target = int(segment_seconds * SAMPLE_RATE)
+    if len(audio) <= target * 1.5:
+        return [(0, len(audio))]
+    
+    regions = detect_speech(audio, SAMPLE_RATE, pad_ms=100)
+    gaps = [(regions[i][1], regions[i + 1][0]) for i in range(len(regions) - 1)]
+    overlap = int(overlap_seconds * SAMPLE_RATE)
+    window = target // 5
+    
+    bounds = []
+    start = 0
+    while len(audio) - start > target * 1.5:
+        goal = start + target
+        nearby = [gap for gap in gaps if goal - window <= (gap[0] + gap[1]) // 2 <= goal + window]
+        if nearby:
+            gap_start, gap_end = max(nearby, key=lambda gap: gap[1] - gap[0])
+            cut = (gap_start + gap_end) // 2
+            bounds.append((start, cut))
+            start = cut
+        else:
+            bounds.append((start, goal))
+            start = goal - overlap
+    bounds.append((start, len(audio)))
+    return bounds
+
+
+def _words(text):
+    return re.findall(r"[a-z0-9']+", text.lower())
+
+
+def _dedupe_boundary(previous_text, text, max_words=20):
+    #remove words at the start of text that repeat the end of previous_text
+    #(speech in the overlap is transcribed by both segments)
+    previous = _words(previous_text)[-max_words:]
+    tokens = text.split()
+    current = [_words(token) for token in tokens]
+    
+    for n in range(min(len(previous), len(tokens)), 0, -1):
+        head = [word for words in current[:n] for word in words]
+        if head and head == previous[-len(head):]:
+            return " " + " ".join(tokens[n:]) if tokens[n:] else ""
+    return text
+
+
+def _stitch_segments(results, bounds, language):
+    #join per-segment whisper results into one transcription on the original timeline
+    #segments only overlap where _split_at_silences found no silence to cut at, which the
+    #bounds tell, whisper's end times can run past a silence cut and must not decide it
+    segments = []
+    previous_end = 0.0
+    
+    for k, (result, (start, end)) in enumerate(zip(results, bounds)):
+        offset = start / SAMPLE_RATE
+        limit = end / SAMPLE_RATE
+        overlapping = k > 0 and start < bounds[k - 1][1] and bool(segments)
+        
+        for segment in result["segments"]:
+            segment = dict(segment)
+            #times stay inside the part of the recording this result was made from
+            segment["start"] = round(min(segment["start"] + offset, limit), 2)
+            segment["end"] = round(min(segment["end"] + offset, limit), 2)
+            
+            if overlapping:
+                #whole segments inside the overlap were already transcribed
+                if segment["end"] <= previous_end:
+                    continue
+                segment["text"] = _dedupe_boundary(segments[-1]["text"], segment["text"])
+                overlapping = False
+                if not segment["text"].strip():
+                    continue
+            
+            segment["id"] = len(segments)
+            segments.append(segment)
+        
+        if segments:
+            previous_end = segments[-1]["end"]
+    
+    return {
+        "text": "".join(segment["text"] for segment in segments),
+        "language": language,
+        "segments": segments
+    }
 
 
 if __name__ == "__main__":
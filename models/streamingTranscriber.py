@@ -0,0 +1,155 @@
+#live transcription of an audio stream with whisper
+#new audio is appended to a buffer and the buffer is transcribed again every
+#step. a word is committed (final) once two consecutive passes agree on it, the
+#words after that are sent as a partial hypothesis that may still change. the
+#buffer is cut behind the last committed word so every pass only sees the
+#uncommitted tail plus new audio (a sliding window that overlaps the previous one)
+
+import re
+import threading
+import numpy as np
+
+try:
+    from .audioDecoder import SAMPLE_RATE
+except ImportError:
+    from audioDecoder import SAMPLE_RATE
+
+
+def _normalize(word):
+    return re.sub(r"[^\w']", "", word.lower())
+
+
+def _join(words):
+    return "".join(word["word"] for word in words).strip()
+
+
+class StreamingTranscriber:
+    def __init__(self, speech_to_text, language=None, step_seconds=1.0, max_window_seconds=25.0,
+                 prompt_chars=200):
+        #speech_to_text: a loaded SpeechToText
+        #language: language code, None = detect on the first pass and keep it
+        #step_seconds: new audio needed before the buffer is transcribed again
+        #max_window_seconds: longest buffer, if nothing got committed by then the current
+        #                    hypothesis is committed anyway (whisper sees at most 30s)
+        #prompt_chars: committed text passed to whisper as context for the next pass
+        self.stt = speech_to_text
+        self.language = language
+        self.step_seconds = step_seconds
+        self.max_window_seconds = min(max_window_seconds, 29.0)
+        self.prompt_chars = prompt_chars
+
+        self._lock = threading.Lock()
+        self._buffer = np.zeros(0, dtype=np.float32)
+        self._buffer_start = 0.0    #stream time of the first sample in the buffer (s)
+        self._new_samples = 0       #samples added since the last pass
+        self.committed = []         #final words with stream times
+        self._hypothesis = []       #uncommitted words of the last pass
+
+    @property
+    def committed_end(self):
+        return self.committed[-1]["end"] if self.committed else 0.0
+
+    @property
+    def text(self):
+        return _join(self.committed)
+
+    def append(self, samples):
+        #add decoded 16 kHz float32 samples
+        if len(samples) == 0:
+            return
+        with self._lock:
+            self._buffer = np.concatenate((self._buffer, samples))
+            self._new_samples += len(samples)
+
+    def ready(self):
+        #True once enough new audio arrived for another pass
+        return self._new_samples >= self.step_seconds * SAMPLE_RATE
+
+    def process(self):
+        #transcribe the buffer once and commit the words this pass agrees on with the last one
+        #blocking, run it off the event loop
+        #returns: {"final": segment or None, "partial": segment or None}, a segment is
+        #         {"start", "end", "text"} in seconds from the start of the stream
+        with self._lock:
+            audio = self._buffer
+            offset = self._buffer_start
+            self._new_samples = 0
+        if len(audio) < SAMPLE_RATE // 2:
+            return {"final": None, "partial": None}
+
+        words = self._transcribe(audio, offset)
+
+        #commit the longest prefix both passes agree on
+        agreed = 0
+        for previous, current in zip(self._hypothesis, words):
+            if _normalize(previous["word"]) != _normalize(current["word"]):
+                break
+            agreed += 1
+        new_final = words[:agreed]
+
+        #whisper can only look 30 seconds back, so don't wait for agreement forever
+        if len(audio) / SAMPLE_RATE > self.max_window_seconds and not new_final:
+            new_final = words
+            agreed = len(words)
+
+        self.committed.extend(new_final)
+        self._hypothesis = words[agreed:]
+        if new_final:
+            self._trim(self.committed_end)
+        elif len(audio) / SAMPLE_RATE > self.max_window_seconds:
+            #a full window without any words (silence, music): drop the audio of this pass
+            #except its last second, which may hold the start of a word, so the buffer
+            #and the cost of a pass stay bounded
+            self._trim(offset + len(audio) / SAMPLE_RATE - 1.0)
+
+        return {
+            "final": self._segment(new_final),
+            "partial": self._segment(self._hypothesis)
+        }
+
+    def finish(self):
+        #end of stream: one last pass, then commit everything that is left
+        result = self.process() if self._new_samples else {"final": None, "partial": None}
+        remaining = self._hypothesis
+        self._hypothesis = []
+        self.committed.extend(remaining)
+        finals = [segment for segment in (result["final"], self._segment(remaining)) if segment]
+        return finals
+
+    def _transcribe(self, audio, offset):
+        #words of one pass with stream times, minus the ones that are already committed
+        prompt = self.text[-self.prompt_chars:] or None
+        result = self.stt.transcribe_words(audio, language=self.language, prompt=prompt)
+        if self.language is None:
+            self.language = result["language"]
+
+        words = [
+            {"start": round(word["start"] + offset, 2), "end": round(word["end"] + offset, 2),
+             "word": word["word"]}
+            for word in result["words"]
+        ]
+        #word times are approximate, allow a little overlap with the committed text
+        words = [word for word in words if word["start"] >= self.committed_end - 0.5]
+
+        #and drop words at the start that repeat the end of the committed text
+        tail = [_normalize(word["word"]) for word in self.committed[-5:]]
+        for n in range(min(len(tail), len(words)), 0, -1):
+            if tail[-n:] == [_normalize(word["word"]) for word in words[:n]]:
+                words = words[n:]
+                break
+
+        return words
+
+    def _trim(self, seconds):
+        #drop buffered audio before this stream time
+        with self._lock:
+            cut = int((seconds - self._buffer_start) * SAMPLE_RATE)
+            cut = max(0, min(cut, len(self._buffer)))
+            self._buffer = self._buffer[cut:]
+            self._buffer_start += cut / SAMPLE_RATE
+
+    @staticmethod
+    def _segment(words):
+        if not words:
+            return None
+        return {"start": words[0]["start"], "end": words[-1]["end"], "text": _join(words)}
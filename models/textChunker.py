@@ -0,0 +1,156 @@
+#sentence splitting and token-budget chunking for long transcripts
+#the whole text is tokenized once (with offset mapping) and sentences are
+#packed into chunks in a single pass, instead of re-encoding a growing chunk
+
+import re
+from bisect import bisect_left
+
+
+#a sentence ends at . ! ? (plus any closing quotes/brackets) followed by whitespace,
+#or at a line break. whisper output is often missing punctuation, so long
+#unpunctuated runs are split again by the chunker at token level
+_SENTENCE_END = re.compile(r'[.!?]+["\')\]]*(?=\s)|\n+')
+
+#common abbreviations that end with a period but don't end a sentence
+_ABBREVIATIONS = {
+    "mr", "mrs", "ms", "dr", "prof", "sr", "jr", "st", "vs", "etc",
+    "e.g", "i.e", "no", "inc", "ltd", "co", "approx", "dept", "sec"
+}
+
+
+def split_sentences(text):
+    #split text into sentences and return them as (start, end) character spans
+    #spans point into the original text, so chunks can be sliced out of it
+    #without losing or adding any characters
+    spans = []
+    start = 0
+
+    for match in _SENTENCE_END.finditer(text):
+        end = match.end()
+
+        #don't split after abbreviations like "Mr." or "e.g."
+        if match.group().startswith('.'):
+            word_start = text.rfind(' ', start, match.start()) + 1
+            if text[word_start:match.start()].lower() in _ABBREVIATIONS:
+                continue
+
+        _add_span(text, start, end, spans)
+        start = end
+
+    _add_span(text, start, len(text), spans)
+    return spans
+
+
+def _add_span(text, start, end, spans):
+    #strip surrounding whitespace from a span and keep it if anything is left
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    if start < end:
+        spans.append((start, end))
+
+
+class TextChunker:
+    def __init__(self, tokenizer, max_tokens=900):
+        #tokenizer: huggingface tokenizer of the summarization model
+        #max_tokens: token budget per chunk, including special tokens
+        self.tokenizer = tokenizer
+        self.max_tokens = max_tokens
+
+        #leave room for the special tokens (<s> and </s> for bart) added per chunk
+        self.budget = max_tokens - tokenizer.num_special_tokens_to_add()
+
+    def count_tokens(self, text):
+        #number of tokens the model will see for this text
+        return len(self.tokenizer.encode(text))
+
+    def chunk(self, text):
+        #split text into chunks that each fit within max_tokens
+        #returns: list of chunk strings in original order
+        sentences = split_sentences(text)
+        if not sentences:
+            return []
+
+        token_starts = self._token_starts(text, sentences)
+
+        chunks = []
+        chunk_start = None
+        chunk_end = None
+        chunk_tokens = 0
+
+        for start, end in sentences:
+            first = bisect_left(token_starts, start)
+            last = bisect_left(token_starts, end)
+            n_tokens = last - first
+
+            #sentence alone is over budget (e.g. unpunctuated whisper output),
+            #flush the current chunk and split the sentence at token boundaries
+            if n_tokens > self.budget:
+                if chunk_start is not None:
+                    chunks.append(text[chunk_start:chunk_end])
+                    chunk_start = None
+                    chunk_tokens = 0
+                chunks.extend(self._split_long_sentence(text, start, end, token_starts, first, last))
+                continue
+
+            if chunk_start is not None and chunk_tokens + n_tokens > self.budget:
+                chunks.append(text[chunk_start:chunk_end])
+                chunk_start = None
+                chunk_tokens = 0
+
+            if chunk_start is None:
+                chunk_start = start
+            chunk_end = end
+            chunk_tokens += n_tokens
+
+        if chunk_start is not None:
+            chunks.append(text[chunk_start:chunk_end])
+
+        return chunks
+
+    def _token_starts(self, text, sentences):
+        #character offset where each token of the text starts, in order
+        #fast tokenizers give us offsets for the whole text in one call
+        if getattr(self.tokenizer, "is_fast", False):
+            encoding = self.tokenizer(
+                text,
+                add_special_tokens=False,
+                return_offsets_mapping=True,
+                verbose=False
+            )
+            return [start for start, end in encoding["offset_mapping"]]
+
+        #slow tokenizers have no offset mapping, so tokenize sentence by sentence
+        #and spread each sentence's tokens evenly over its span (still linear)
+        token_starts = []
+        for start, end in sentences:
+            n_tokens = len(self.tokenizer.encode(text[start:end], add_special_tokens=False))
+            step = (end - start) / max(n_tokens, 1)
+            token_starts.extend(start + int(i * step) for i in range(n_tokens))
+        return token_starts
+
+    def _split_long_sentence(self, text, start, end, token_starts, first, last):
+        #split one over-budget sentence into pieces of at most budget tokens
+        #prefers to cut where a token starts a new word so words aren't broken
+        pieces = []
+        piece_start = start
+        piece_first = first
+
+        while last - piece_first > self.budget:
+            cut = piece_first + self.budget
+
+            #walk back to a token that starts after whitespace
+            word_cut = cut
+            while word_cut > piece_first + 1 and not text[token_starts[word_cut] - 1].isspace():
+                word_cut -= 1
+            if word_cut > piece_first + 1:
+                cut = word_cut
+
+            cut_offset = token_starts[cut]
+            _add_span(text, piece_start, cut_offset, pieces)
+            piece_start = cut_offset
+            piece_first = cut
+
+        _add_span(text, piece_start, end, pieces)
+        return [text[s:e] for s, e in pieces]
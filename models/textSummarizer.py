@@ -1,19 +1,66 @@
 #text summarization using pretrained models like bart or t5
 
 from transformers import pipeline, AutoTokenizer, AutoModelForSeq2SeqLM
+from transformers.modeling_outputs import BaseModelOutput
 import torch
 import warnings
 import os
+import multiprocessing
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from datetime import datetime
+
+#relative import when used as a package, plain import when run as a script
+try:
+    from .textChunker import TextChunker
+    from .resultCache import ResultCache, summary_key, make_key, hash_text
+    from .quantization import quantize_linear_layers
+    from .transcriptStore import TranscriptStore, default_store_path, read_transcription_file
+    from .extractiveFilter import extract_sentences
+    from .generationPolicy import (ThroughputMeter, DEFAULT_PRESET, make_policy, choose_policy,
+                                   estimate_seconds, level_budgets as policy_level_budgets)
+except ImportError:
+    from textChunker import TextChunker
+    from resultCache import ResultCache, summary_key, make_key, hash_text
+    from quantization import quantize_linear_layers
+    from transcriptStore import TranscriptStore, default_store_path, read_transcription_file
+    from extractiveFilter import extract_sentences
+    from generationPolicy import (ThroughputMeter, DEFAULT_PRESET, make_policy, choose_policy,
+                                  estimate_seconds, level_budgets as policy_level_budgets)
+
 warnings.filterwarnings("ignore")
 
 
 class TextSummarizer:
-    def __init__(self, model_name="facebook/bart-large-cnn"):
+    def __init__(self, model_name="facebook/bart-large-cnn", batch_size=4,
+                 map_workers=0, fan_in=8, level_budgets=None, cache=None, quantize=False,
+                 extractive_ratio=None):
         #load summarization model
         #model_name options: facebook/bart-large-cnn (good for news), google/pegasus-xsum (extreme summarization), t5-base (versatile)
+        #batch_size: number of chunks summarized together in one generate call
+        #map_workers: worker processes for the map stage of long texts, 0 = run in this process
+        #             (each worker loads its own copy of the model)
+        #fan_in: max number of summaries merged into one input at each reduce level
+        #level_budgets: optional list of (max_length, min_length) per tree level, level 0 is the map stage
+        #cache: optional ResultCache, summaries of the same text and settings are reused
+        #quantize: int8 weights for the linear layers, faster and smaller on cpu (ignored on gpu)
+        #extractive_ratio: fraction of the sentences of a long text kept by the extractive
+        #                  pre-filter before summarizing, e.g. 0.5, None = summarize all of it
         print(f"Loading summarization model: {model_name}...")
+        self.model_name = model_name
         self.device = 0 if torch.cuda.is_available() else -1
+        self.batch_size = batch_size
+        self.map_workers = map_workers
+        self.fan_in = max(2, fan_in)
+        self.level_budgets = level_budgets or []
+        self._map_pool = None
+        self.cache = cache
+        self.quantize = quantize and self.device == -1
+        self.extractive_ratio = extractive_ratio
+        #decoding speed of this model on this machine, for latency-targeted policies
+        self.throughput = ThroughputMeter()
         
         #load model and tokenizer
         self.tokenizer = AutoTokenizer.from_pretrained(model_name)
@@ -22,6 +69,9 @@ class TextSummarizer:
         if self.device == 0:
             self.model = self.model.to("cuda")
             print("Model loaded on GPU")
+        elif self.quantize:
+            self.model = quantize_linear_layers(self.model)
+            print("Model loaded on CPU (int8)")
         else:
             print("Model loaded on CPU")
         
@@ -32,125 +82,486 @@ class TextSummarizer:
             tokenizer=self.tokenizer,
             device=self.device
         )
+        
+        #splits long texts into chunks that fit the model input (leave buffer below 1024)
+        self.chunker = TextChunker(self.tokenizer, max_tokens=900)
+    
+    def warm_up(self):
+        #run one tiny generate call so the first real request doesn't pay for lazy initialisation
+        self._generate_batch(["The meeting started on time and the team reviewed the plan."],
+                             max_length=20, min_length=5, num_beams=1)
     
     def summarize(self, text, max_length=150, min_length=30, 
-                  do_sample=False, num_beams=4):
+                  do_sample=False, num_beams=4, level_budgets=None):
         #summarize the given text
         #max_length: max words in summary
         #min_length: min words in summary
         #do_sample: use sampling for more creative summaries
         #num_beams: higher number = better quality but slower
+        #level_budgets: overrides the summarizer's level_budgets for long texts
         if not text or len(text.strip()) == 0:
             return ""
         
+        #sampled summaries are meant to differ between calls, so only cache beam search
+        cache_key = None
+        if self.cache is not None and not do_sample:
+            cache_key = self._summary_cache_key(text, max_length, min_length, num_beams,
+                                                level_budgets)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                print("Using cached summary")
+                return cached
+        
         #split long texts into chunks if needed
         max_input_length = 1024
         token_count = len(self.tokenizer.encode(text))
         
         if token_count > max_input_length:
             print(f"Text is long ({token_count} tokens). Processing in chunks...")
-            return self._summarize_long_text(text, max_length, min_length, 
-                                            do_sample, num_beams)
+            summary = self._summarize_long_text(text, max_length, min_length, 
+                                                do_sample, num_beams, level_budgets)
+        else:
+            #summarize
+            start = time.perf_counter()
+            result = self.summarizer(
+                text,
+                max_length=max_length,
+                min_length=min_length,
+                do_sample=do_sample,
+                num_beams=num_beams,
+                early_stopping=True
+            )
+            summary = result[0]["summary_text"]
+            self.throughput.record(len(self.tokenizer.encode(summary)) * num_beams,
+                                   time.perf_counter() - start)
+        
+        if cache_key is not None:
+            self.cache.put(cache_key, summary)
         
-        #summarize
-        result = self.summarizer(
+        return summary
+    
+    def rolling_summary(self, max_length=150, min_length=30, num_beams=4):
+        #start a running summary for text that arrives over time (see RollingSummary)
+        return RollingSummary(self, max_length, min_length, num_beams)
+    
+    def summarize_with_policy(self, text, max_length=150, min_length=30, preset=None,
+                              latency_target_s=None):
+        #summarize with a generation policy (see generationPolicy.py)
+        #preset: "fast", "balanced" or "quality" (the default, same as summarize())
+        #latency_target_s: deadline in seconds, the best policy up to preset that is expected
+        #                  to meet it is chosen from the measured decoding speed
+        #returns: {"summary", "policy": {"preset", "num_beams", "map_budget", "latency_target_s",
+        #          "estimated_seconds", "seconds", "tokens_per_second", "met_target"}}
+        preset = preset or DEFAULT_PRESET
+        input_tokens = len(self.tokenizer.encode(text))
+        tokens_per_second = self.throughput.tokens_per_second
+        
+        if latency_target_s:
+            policy, estimate = choose_policy(input_tokens, max_length, latency_target_s,
+                                             tokens_per_second, preset)
+        else:
+            policy = make_policy(preset)
+            estimate = estimate_seconds(policy, input_tokens, max_length, tokens_per_second)
+        
+        start = time.perf_counter()
+        summary = self.summarize(text, max_length, min_length, num_beams=policy["num_beams"],
+                                 level_budgets=policy_level_budgets(policy))
+        seconds = time.perf_counter() - start
+        
+        return {
+            "summary": summary,
+            "policy": {
+                "preset": policy["preset"],
+                "num_beams": policy["num_beams"],
+                "map_budget": list(policy["map_budget"]) if policy["map_budget"] else None,
+                "latency_target_s": latency_target_s,
+                "estimated_seconds": round(estimate, 2),
+                "seconds": round(seconds, 2),
+                "tokens_per_second": round(tokens_per_second, 1),
+                "met_target": seconds <= latency_target_s if latency_target_s else None
+            }
+        }
+    
+    def _summary_cache_key(self, text, max_length, min_length, num_beams, level_budgets=None):
+        return summary_key(
             text,
+            self.model_name,
             max_length=max_length,
             min_length=min_length,
-            do_sample=do_sample,
             num_beams=num_beams,
-            early_stopping=True
+            fan_in=self.fan_in,
+            level_budgets=level_budgets or self.level_budgets,
+            quantize=self.quantize,
+            extractive_ratio=self.extractive_ratio
         )
-        
-        return result[0]["summary_text"]
     
     def _summarize_long_text(self, text, max_length, min_length, 
-                            do_sample, num_beams):
+                            do_sample, num_beams, level_budgets=None):
         #summarize long texts by breaking them into smaller chunks
+        #with an extractive ratio only the top sentences are summarized, which can be
+        #few enough for a single generate call
+        if self.extractive_ratio:
+            text = self._extract(text)
+            if len(self.tokenizer.encode(text)) <= 1024:
+                return self._generate_batch([text], max_length, min_length, do_sample,
+                                            num_beams, early_stopping=True)[0]
         
-        #split by sentences or paragraphs
-        sentences = text.split('. ')
-        chunks = []
-        current_chunk = ""
-        
-        for sentence in sentences:
-            test_chunk = current_chunk + sentence + ". "
-            if len(self.tokenizer.encode(test_chunk)) > 900:  #leave buffer
-                if current_chunk:
-                    chunks.append(current_chunk)
-                current_chunk = sentence + ". "
-            else:
-                current_chunk = test_chunk
-        
-        if current_chunk:
-            chunks.append(current_chunk)
-        
-        #summarize each chunk
-        summaries = []
-        for i, chunk in enumerate(chunks):
-            print(f"Summarizing chunk {i+1}/{len(chunks)}...")
-            summary = self.summarizer(
-                chunk,
-                max_length=max_length // len(chunks) + 50,
-                min_length=min_length // len(chunks),
-                do_sample=do_sample,
-                num_beams=num_beams
+        return self.summarize_hierarchical(
+            text,
+            max_length=max_length,
+            min_length=min_length,
+            do_sample=do_sample,
+            num_beams=num_beams,
+            level_budgets=level_budgets
+        )
+    
+    def _extract(self, text):
+        #the top sentences of text by the extractive pre-filter
+        start = time.perf_counter()
+        words = len(text.split())
+        text = extract_sentences(text, self.extractive_ratio)
+        print(f"Extractive filter kept {len(text.split())} of {words} words "
+              f"({time.perf_counter() - start:.2f}s)")
+        return text
+    
+    def summarize_variants(self, text, lengths, num_beams=4):
+        #several summaries of the same text, one per (max_length, min_length) in lengths,
+        #e.g. short, medium and long versions for the ui. bart's encoder runs once per
+        #chunk and every length only runs the decoder on top of its output. long texts are
+        #chunked once, and lengths with the same chunk budget share the map stage too
+        #returns: list of summaries in the order of lengths
+        if not text or len(text.strip()) == 0:
+            return [""] * len(lengths)
+        lengths = [tuple(length) for length in lengths]
+        
+        summaries = [None] * len(lengths)
+        keys = [None] * len(lengths)
+        if self.cache is not None:
+            for i, (max_length, min_length) in enumerate(lengths):
+                keys[i] = self._summary_cache_key(text, max_length, min_length, num_beams)
+                summaries[i] = self.cache.get(keys[i])
+        missing = [i for i, summary in enumerate(summaries) if summary is None]
+        if not missing:
+            return summaries
+        todo = list(dict.fromkeys(lengths[i] for i in missing))
+        
+        source = text
+        if len(self.tokenizer.encode(source)) > 1024 and self.extractive_ratio:
+            source = self._extract(source)
+        
+        if len(self.tokenizer.encode(source)) <= 1024:
+            generated = self._generate_variants([source], todo, num_beams)
+            results = {length: variant[0] for length, variant in zip(todo, generated)}
+        else:
+            chunks = self.chunker.chunk(source)
+            print(f"Text is long. Summarizing {len(chunks)} chunks for {len(todo)} lengths...")
+            budgets = {
+                length: self._level_budget(0, len(chunks), *length, self.level_budgets)
+                for length in todo
+            }
+            map_budgets = list(dict.fromkeys(budgets.values()))
+            map_summaries = dict(zip(map_budgets, self._generate_variants(chunks, map_budgets, num_beams)))
+            results = {
+                length: self._reduce(map_summaries[budgets[length]], *length, False, num_beams)
+                for length in todo
+            }
+        
+        for i in missing:
+            summaries[i] = results[lengths[i]]
+            if keys[i] is not None:
+                self.cache.put(keys[i], summaries[i])
+        return summaries
+    
+    def _generate_variants(self, texts, lengths, num_beams=4, batch_size=None):
+        #summarize texts once per (max_length, min_length), encoding every batch only once
+        #returns: one list of summaries (in the order of texts) per entry of lengths
+        batch_size = batch_size or self.batch_size
+        input_ids = self.tokenizer(list(texts), truncation=True)["input_ids"]
+        order = sorted(range(len(texts)), key=lambda i: len(input_ids[i]))
+        
+        summaries = [[None] * len(texts) for _ in lengths]
+        for start in range(0, len(order), batch_size):
+            batch_indices = order[start:start + batch_size]
+            batch = self.tokenizer.pad(
+                {"input_ids": [input_ids[i] for i in batch_indices]},
+                return_tensors="pt"
+            ).to(self.model.device)
+            
+            with torch.inference_mode():
+                hidden = self.model.get_encoder()(**batch).last_hidden_state
+                for variant, (max_length, min_length) in enumerate(lengths):
+                    start_time = time.perf_counter()
+                    #generate expands encoder_outputs for the beams in place, so every call
+                    #gets its own wrapper around the shared hidden states
+                    output_ids = self.model.generate(
+                        **batch,
+                        encoder_outputs=BaseModelOutput(last_hidden_state=hidden),
+                        max_length=max_length,
+                        min_length=min_length,
+                        num_beams=num_beams,
+                        early_stopping=True
+                    )
+                    self.throughput.record(output_ids.numel() * num_beams,
+                                           time.perf_counter() - start_time)
+                    decoded = self.tokenizer.batch_decode(
+                        output_ids,
+                        skip_special_tokens=True,
+                        clean_up_tokenization_spaces=False
+                    )
+                    for i, summary in zip(batch_indices, decoded):
+                        summaries[variant][i] = summary
+        
+        return summaries
+    
+    def summarize_hierarchical(self, text, max_length=150, min_length=30, do_sample=False,
+                               num_beams=4, fan_in=None, level_budgets=None, progress=None,
+                               memo=None):
+        #map-reduce summarization for texts of any length
+        #map: split the text into chunks and summarize every chunk
+        #reduce: merge neighbouring summaries into groups of up to fan_in (and 900 tokens)
+        #        and summarize each group, repeating level by level until everything fits
+        #fan_in: overrides the summarizer's fan_in for this call
+        #level_budgets: overrides the summarizer's level_budgets for this call
+        #progress: optional callback(level, done, total) called as work finishes
+        #memo: optional ResultCache, summaries of chunks and groups seen before are reused
+        level_budgets = level_budgets or self.level_budgets
+        
+        #split by sentences, packed into chunks of at most 900 tokens
+        chunks = self.chunker.chunk(text)
+        summaries = self._run_level(chunks, 0, max_length, min_length, do_sample, num_beams,
+                                    level_budgets, progress, memo)
+        
+        return self._reduce(summaries, max_length, min_length, do_sample, num_beams,
+                            fan_in, level_budgets, progress, memo)
+    
+    def _run_level(self, texts, level, max_length, min_length, do_sample, num_beams,
+                   level_budgets, progress=None, memo=None):
+        #summarize every text of one tree level with that level's length budget
+        level_max, level_min = self._level_budget(level, len(texts), max_length,
+                                                  min_length, level_budgets)
+        stage = "map" if level == 0 else "reduce"
+        print(f"Level {level} ({stage}): summarizing {len(texts)} text(s)...")
+        
+        return self._summarize_level(texts, level, level_max, level_min,
+                                     do_sample, num_beams, progress, memo)
+    
+    def _reduce(self, summaries, max_length, min_length, do_sample, num_beams,
+                fan_in=None, level_budgets=None, progress=None, memo=None):
+        #reduce map-stage summaries level by level until they fit, then write the final summary
+        fan_in = max(2, fan_in or self.fan_in)
+        level_budgets = level_budgets or self.level_budgets
+        level = 0
+        
+        while True:
+            combined = " ".join(summaries)
+            if self.chunker.count_tokens(combined) <= self.chunker.max_tokens:
+                break
+            
+            #stop if levels can't shrink anything further, the final pass truncates
+            if level >= 10:
+                break
+            
+            groups = self._group_summaries(summaries, fan_in)
+            level += 1
+            summaries = self._run_level([" ".join(group) for group in groups], level,
+                                        max_length, min_length, do_sample, num_beams,
+                                        level_budgets, progress, memo)
+        
+        #map summaries whose budgets were derived from the caller's lengths are returned
+        #joined when they fit. fixed level budgets (incremental mode, presets) don't follow
+        #the caller's lengths, so those always get a final summary, even a single one
+        if level == 0 and not level_budgets:
+            return combined
+        
+        #write one final summary of the top level with the caller's lengths
+        print("Writing final summary...")
+        return self._summarize_level([combined], level + 1, max_length, min_length,
+                                     do_sample, num_beams, memo=memo)[0]
+    
+    def _level_budget(self, level, n_texts, max_length, min_length, level_budgets):
+        #output length limits for each text summarized at this level
+        if level < len(level_budgets):
+            return level_budgets[level]
+        
+        level_max = max_length // n_texts + 50
+        level_min = min_length // n_texts
+        
+        #reduce outputs must be at most half the input budget so every level shrinks
+        if level > 0:
+            level_max = min(level_max, self.chunker.budget // 2)
+            level_min = min(level_min, level_max)
+        
+        return level_max, level_min
+    
+    def _group_summaries(self, summaries, fan_in):
+        #pack neighbouring summaries into groups of at most fan_in summaries
+        #and at most max_tokens tokens, keeping their original order
+        groups = []
+        group = []
+        group_tokens = 0
+        
+        for summary in summaries:
+            n_tokens = self.chunker.count_tokens(summary)
+            if group and (len(group) >= fan_in or group_tokens + n_tokens > self.chunker.budget):
+                groups.append(group)
+                group = []
+                group_tokens = 0
+            group.append(summary)
+            group_tokens += n_tokens
+        
+        if group:
+            groups.append(group)
+        
+        return groups
+    
+    def _summarize_level(self, texts, level, max_length, min_length, do_sample,
+                         num_beams, progress=None, memo=None):
+        #summarize all texts of one tree level, reusing memoized summaries if memo is given
+        if memo is None or do_sample:
+            return self._generate_level(texts, level, max_length, min_length,
+                                        do_sample, num_beams, progress)
+        
+        keys = [
+            make_key("summary_node", hash_text(text), model_name=self.model_name,
+                     max_length=max_length, min_length=min_length, num_beams=num_beams,
+                     quantize=self.quantize)
+            for text in texts
+        ]
+        summaries = [memo.get(key) for key in keys]
+        missing = [i for i, summary in enumerate(summaries) if summary is None]
+        if len(missing) < len(texts):
+            print(f"  reusing {len(texts) - len(missing)}/{len(texts)} cached summaries")
+        
+        generated = self._generate_level([texts[i] for i in missing], level, max_length,
+                                         min_length, do_sample, num_beams, progress)
+        for i, summary in zip(missing, generated):
+            summaries[i] = summary
+            memo.put(keys[i], summary)
+        
+        return summaries
+    
+    def _generate_level(self, texts, level, max_length, min_length, do_sample,
+                        num_beams, progress=None):
+        #summarize all texts of one tree level, across the worker pool if there is one
+        total = len(texts)
+        summaries = [None] * total
+        done = 0
+        
+        #shard by length so each batch pads as little as possible
+        order = sorted(range(total), key=lambda i: len(texts[i]))
+        shards = [order[start:start + self.batch_size] for start in range(0, total, self.batch_size)]
+        
+        pool = self._get_map_pool() if len(shards) > 1 else None
+        if pool is None:
+            results = (
+                (shard, self._generate_batch([texts[i] for i in shard], max_length, min_length,
+                                             do_sample, num_beams))
+                for shard in shards
             )
-            summaries.append(summary[0]["summary_text"])
+        else:
+            futures = {
+                pool.submit(_map_worker_summarize, [texts[i] for i in shard],
+                            max_length, min_length, do_sample, num_beams): shard
+                for shard in shards
+            }
+            results = ((futures[future], future.result()) for future in as_completed(futures))
         
-        #combine summaries
-        combined = " ".join(summaries)
+        for shard, shard_summaries in results:
+            for i, summary in zip(shard, shard_summaries):
+                summaries[i] = summary
+            done += len(shard)
+            if progress:
+                progress(level, done, total)
         
-        #if combined is still too long, summarize again
-        if len(self.tokenizer.encode(combined)) > 900:
-            final = self.summarizer(
-                combined,
-                max_length=max_length,
-                min_length=min_length,
-                do_sample=do_sample,
-                num_beams=num_beams
+        return summaries
+    
+    def _get_map_pool(self):
+        #start the map-stage worker processes on first use
+        if self.map_workers <= 0:
+            return None
+        
+        if self._map_pool is None:
+            #split the cpu cores between the workers so they don't oversubscribe
+            threads = max(1, (os.cpu_count() or 1) // self.map_workers)
+            print(f"Starting {self.map_workers} summarizer worker processes...")
+            self._map_pool = ProcessPoolExecutor(
+                max_workers=self.map_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_map_worker,
+                initargs=(self.model_name, self.batch_size, threads, self.fan_in,
+                          self.level_budgets, self.quantize, self.extractive_ratio)
+            )
+        
+        return self._map_pool
+    
+    def close(self):
+        #shut down the map-stage worker processes
+        if self._map_pool is not None:
+            self._map_pool.shutdown()
+            self._map_pool = None
+    
+    def _generate_batch(self, texts, max_length, min_length, do_sample=False,
+                        num_beams=4, batch_size=None, **generate_kwargs):
+        #summarize a list of texts with padded, batched generate calls
+        #texts are sorted by token length so each batch pads as little as possible,
+        #the sort is stable so batches (and results) are deterministic
+        #returns: list of summaries in the same order as texts
+        if not texts:
+            return []
+        
+        batch_size = batch_size or self.batch_size
+        input_ids = self.tokenizer(list(texts), truncation=True)["input_ids"]
+        order = sorted(range(len(texts)), key=lambda i: len(input_ids[i]))
+        
+        summaries = [None] * len(texts)
+        for start in range(0, len(order), batch_size):
+            batch_indices = order[start:start + batch_size]
+            batch = self.tokenizer.pad(
+                {"input_ids": [input_ids[i] for i in batch_indices]},
+                return_tensors="pt"
+            ).to(self.model.device)
+            
+            start_time = time.perf_counter()
+            with torch.inference_mode():
+                output_ids = self.model.generate(
+                    **batch,
+                    max_length=max_length,
+                    min_length=min_length,
+                    do_sample=do_sample,
+                    num_beams=num_beams,
+                    **generate_kwargs
+                )
+            self.throughput.record(output_ids.numel() * num_beams, time.perf_counter() - start_time)
+            
+            #decode the same way the summarization pipeline does
+            decoded = self.tokenizer.batch_decode(
+                output_ids,
+                skip_special_tokens=True,
+                clean_up_tokenization_spaces=False
             )
-            return final[0]["summary_text"]
+            for i, summary in zip(batch_indices, decoded):
+                summaries[i] = summary
         
-        return combined
+        return summaries
     
-    def batch_summarize(self, texts, max_length=150, min_length=30):
+    def batch_summarize(self, texts, max_length=150, min_length=30, batch_size=None):
         #summarize multiple texts at once
         #texts: list of text strings to summarize
+        #batch_size: texts per generate call, defaults to the summarizer's batch_size
         #returns: list of summaries
-        results = self.summarizer(
+        return self._generate_batch(
             texts,
             max_length=max_length,
             min_length=min_length,
             do_sample=False,
-            num_beams=4
+            num_beams=4,
+            batch_size=batch_size
         )
-        
-        return [r["summary_text"] for r in results]
     
     def read_transcription_file(self, file_path):
         #read a transcription file and extract the actual transcription text
         #skips the metadata headers and returns just the transcribed content
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        #find the transcription section (after the last "=====" line)
-        lines = content.split('\n')
-        transcription_lines = []
-        found_transcription = False
-        
-        for i, line in enumerate(lines):
-            if "TRANSCRIPTION" in line or "ENGLISH TRANSLATION" in line:
-                found_transcription = True
-                continue
-            if found_transcription and line.strip() == "=" * 60:
-                #skip the separator line after TRANSCRIPTION header
-                continue
-            if found_transcription and line.strip():
-                transcription_lines.append(line)
-        
-        transcription_text = '\n'.join(transcription_lines).strip()
-        return transcription_text
+        return read_transcription_file(file_path)
     
     def summarize_transcription_file(self, file_path, max_length=150, min_length=30, 
                                      save_summary=True, output_dir="summaries"):
@@ -176,69 +587,71 @@ class TextSummarizer:
             if not os.path.exists(output_dir):
                 os.makedirs(output_dir)
             
-            #create summary filename based on original file
-            basename = os.path.basename(file_path)
-            summary_filename = basename.replace('.txt', '_SUMMARY.txt')
-            summary_path = os.path.join(output_dir, summary_filename)
-            
-            #get metadata from original file
-            now = datetime.now()
-            date_str = now.strftime("%Y-%m-%d")
-            time_str = now.strftime("%H:%M:%S")
-            
-            #write summary to file
-            with open(summary_path, 'w', encoding='utf-8') as f:
-                f.write("="*60 + "\n")
-                f.write("TEXT SUMMARY\n")
-                f.write("="*60 + "\n\n")
-                f.write(f"Summary Generated: {date_str} {time_str}\n")
-                f.write(f"Source File: {file_path}\n")
-                f.write(f"Original Length: {len(transcription_text.split())} words\n")
-                f.write(f"Summary Length: {len(summary.split())} words\n")
-                f.write("\n" + "="*60 + "\n")
-                f.write("SUMMARY\n")
-                f.write("="*60 + "\n\n")
-                f.write(summary)
+            summary_path = _summary_path(file_path, output_dir)
+            _write_summary_file(summary_path, file_path, transcription_text, summary)
             
             print(f"Summary saved to: {summary_path}")
         
         return summary
     
     def summarize_all_combined(self, transcription_dir="transcriptions", 
-                              output_dir="summaries", max_length=200, min_length=50):
-        #combine all transcription files and create ONE master summary
-        #transcription_dir: directory containing transcription files
+                              output_dir="summaries", max_length=200, min_length=50,
+                              incremental=False, memo=None, store=None, since=None,
+                              include_uploads=False):
+        #combine all stored transcriptions and create ONE master summary
+        #transcription_dir: directory containing transcription files and the transcript store
         #output_dir: directory to save the combined summary
+        #incremental: reuse the chunk summaries of files seen in earlier runs, so only
+        #             new or changed files and the final reduce are summarized again
+        #memo: ResultCache for incremental mode, defaults to .summary_cache in output_dir
+        #store: TranscriptStore to read from, defaults to the one in transcription_dir
+        #since: only meetings transcribed at or after this iso timestamp
+        #include_uploads: also summarize the meetings the api stored (uploads and live
+        #                 sessions), by default only the transcription files are
         
-        if not os.path.exists(transcription_dir):
+        if store is None and not os.path.exists(transcription_dir):
             print(f"Error: Directory '{transcription_dir}' not found.")
             return ""
         
-        #get all .txt files (excluding _EN files to avoid duplicates)
-        txt_files = [f for f in os.listdir(transcription_dir) 
-                    if f.endswith('.txt') and not f.endswith('_EN.txt')]
+        own_store = store is None
+        if own_store:
+            store = TranscriptStore(default_store_path(transcription_dir))
+        try:
+            #transcription files that aren't in the store yet (written before it existed or
+            #copied in from elsewhere) are imported and edited ones updated, the directory
+            #stays the source of truth: meetings whose file was deleted are left out
+            present = None
+            if os.path.isdir(transcription_dir):
+                imported = store.import_directory(transcription_dir)
+                if imported:
+                    print(f"Imported or updated {imported} transcription file(s) from '{transcription_dir}'")
+                present = set(os.listdir(transcription_dir))
+            meetings = store.texts(since=since, files_only=not include_uploads)
+            if present is not None:
+                meetings = [meeting for meeting in meetings
+                            if meeting["source_file"] is None or meeting["source_file"] in present]
+        finally:
+            if own_store:
+                store.close()
         
-        if not txt_files:
-            print(f"No transcription files found in '{transcription_dir}'")
+        if not meetings:
+            print(f"No transcriptions found in '{transcription_dir}'")
             return ""
         
-        print(f"\nFound {len(txt_files)} transcription file(s).")
+        print(f"\nFound {len(meetings)} transcription(s).")
         print("Combining all transcriptions into one master summary...\n")
         
-        #read and combine all transcriptions
+        #combine all transcriptions
         all_transcriptions = []
         file_list = []
         
-        for txt_file in sorted(txt_files):
-            file_path = os.path.join(transcription_dir, txt_file)
-            try:
-                transcription_text = self.read_transcription_file(file_path)
-                if transcription_text and len(transcription_text.strip()) > 10:
-                    all_transcriptions.append(transcription_text)
-                    file_list.append(txt_file)
-                    print(f"✓ Added: {txt_file} ({len(transcription_text.split())} words)")
-            except Exception as e:
-                print(f"✗ Error reading {txt_file}: {e}")
+        for meeting in meetings:
+            transcription_text = meeting["text"]
+            name = meeting["title"] or meeting["meeting_id"]
+            if transcription_text and len(transcription_text.strip()) > 10:
+                all_transcriptions.append(transcription_text)
+                file_list.append(name)
+                print(f"✓ Added: {name} ({len(transcription_text.split())} words)")
         
         if not all_transcriptions:
             print("No valid transcriptions found to summarize.")
@@ -255,7 +668,11 @@ class TextSummarizer:
         print(f"{'='*60}\n")
         
         #generate summary
-        summary = self.summarize(combined_text, max_length, min_length)
+        if incremental:
+            memo = memo or self.cache or ResultCache(os.path.join(output_dir, ".summary_cache"))
+            summary = self._summarize_incremental(all_transcriptions, max_length, min_length, memo)
+        else:
+            summary = self.summarize(combined_text, max_length, min_length)
         
         #save master summary
         if not os.path.exists(output_dir):
@@ -293,19 +710,63 @@ class TextSummarizer:
         
         return summary
     
+    def _summarize_incremental(self, texts, max_length, min_length, memo, num_beams=4):
+        #master summary of several texts that reuses earlier work
+        #the map stage runs per file and the chunk summaries of every file are memoized
+        #under the hash of its content, so unchanged files cost one cache lookup.
+        #chunks never span two files, and every level uses a fixed length budget,
+        #so cached summaries stay valid when files are added
+        level_budgets = self.level_budgets or INCREMENTAL_LEVEL_BUDGETS
+        map_max, map_min = level_budgets[0]
+        
+        file_keys = [
+            make_key("file_summaries", hash_text(text), model_name=self.model_name,
+                     max_length=map_max, min_length=map_min, num_beams=num_beams,
+                     quantize=self.quantize)
+            for text in texts
+        ]
+        per_file = [memo.get(key) for key in file_keys]
+        changed = [i for i, summaries in enumerate(per_file) if summaries is None]
+        print(f"{len(texts) - len(changed)} file(s) unchanged, {len(changed)} new or changed")
+        
+        #summarize the chunks of all new/changed files together so they batch well
+        file_chunks = {i: self.chunker.chunk(texts[i]) for i in changed}
+        all_chunks = [chunk for i in changed for chunk in file_chunks[i]]
+        chunk_summaries = []
+        if all_chunks:
+            chunk_summaries = self._run_level(all_chunks, 0, max_length, min_length, False,
+                                              num_beams, level_budgets, memo=memo)
+        
+        position = 0
+        for i in changed:
+            n_chunks = len(file_chunks[i])
+            per_file[i] = chunk_summaries[position:position + n_chunks]
+            position += n_chunks
+            memo.put(file_keys[i], per_file[i])
+        
+        summaries = [summary for file_summaries in per_file for summary in file_summaries]
+        return self._reduce(summaries, max_length, min_length, False, num_beams,
+                            level_budgets=level_budgets, memo=memo)
+    
     def summarize_all_in_directory(self, transcription_dir="transcriptions", 
-                                   output_dir="summaries", max_length=150, min_length=30):
+                                   output_dir="summaries", max_length=150, min_length=30,
+                                   read_workers=8, resume=True):
         #summarize each transcription file individually (separate summaries)
         #transcription_dir: directory containing transcription files
         #output_dir: directory to save summaries
+        #read_workers: threads reading transcription files at the same time
+        #resume: skip files whose summary is newer than the transcription (e.g. after a crash)
+        #short files are summarized together in padded batches, long files are summarized
+        #whole in the worker processes (if map_workers > 0) and summary files are written
+        #by a background thread while the model keeps working
         
         if not os.path.exists(transcription_dir):
             print(f"Error: Directory '{transcription_dir}' not found.")
             return []
         
         #get all .txt files (excluding _EN files to avoid summarizing translations separately)
-        txt_files = [f for f in os.listdir(transcription_dir) 
-                    if f.endswith('.txt') and not f.endswith('_EN.txt')]
+        txt_files = sorted(f for f in os.listdir(transcription_dir) 
+                           if f.endswith('.txt') and not f.endswith('_EN.txt'))
         
         if not txt_files:
             print(f"No transcription files found in '{transcription_dir}'")
@@ -313,30 +774,281 @@ class TextSummarizer:
         
         print(f"\nFound {len(txt_files)} transcription file(s) to summarize.")
         
-        summaries = []
-        for txt_file in txt_files:
-            file_path = os.path.join(transcription_dir, txt_file)
-            try:
-                summary = self.summarize_transcription_file(
-                    file_path, 
-                    max_length=max_length, 
-                    min_length=min_length,
-                    save_summary=True,
-                    output_dir=output_dir
-                )
-                summaries.append({
-                    "file": txt_file,
-                    "summary": summary
-                })
-                print(f"✓ Completed: {txt_file}\n")
-            except Exception as e:
-                print(f"✗ Error processing {txt_file}: {e}\n")
+        if resume:
+            pending = [f for f in txt_files
+                       if not _summary_is_current(os.path.join(transcription_dir, f), output_dir)]
+            if len(pending) < len(txt_files):
+                print(f"Skipping {len(txt_files) - len(pending)} file(s) with up-to-date summaries.")
+            txt_files = pending
+            if not txt_files:
+                print("All summaries are up to date.")
+                return []
+        
+        os.makedirs(output_dir, exist_ok=True)
+        start_time = time.perf_counter()
+        
+        #read concurrently, the files are small and reading is mostly waiting on the disk
+        paths = [os.path.join(transcription_dir, f) for f in txt_files]
+        with ThreadPoolExecutor(max_workers=max(1, read_workers)) as readers:
+            texts = list(readers.map(self._read_or_none, paths))
+        
+        summaries = {}
+        writes = queue.Queue(maxsize=64)
+        writer = threading.Thread(target=self._summary_writer, args=(writes, output_dir), daemon=True)
+        writer.start()
+        
+        def finish(i, summary):
+            summaries[i] = summary
+            writes.put((paths[i], texts[i], summary))
+            if self.cache is not None:
+                self.cache.put(self._summary_cache_key(texts[i], max_length, min_length, 4), summary)
+            print(f"✓ Completed: {txt_files[i]}")
+        
+        try:
+            todo = []
+            for i, text in enumerate(texts):
+                if text is None:
+                    continue
+                if len(text.strip()) < 10:
+                    print(f"✗ Skipping {txt_files[i]}: transcription is too short to summarize.")
+                    summaries[i] = ""
+                    continue
+                cached = None
+                if self.cache is not None:
+                    cached = self.cache.get(self._summary_cache_key(text, max_length, min_length, 4))
+                if cached is not None:
+                    summaries[i] = cached
+                    writes.put((paths[i], text, cached))
+                    print(f"✓ Completed (cached): {txt_files[i]}")
+                else:
+                    todo.append(i)
+            
+            #same cut-off as summarize(): above the model input size a file needs the tree
+            token_counts = [len(ids) for ids in self.tokenizer([texts[i] for i in todo])["input_ids"]] if todo else []
+            short = [i for i, count in zip(todo, token_counts) if count <= 1024]
+            long = [i for i, count in zip(todo, token_counts) if count > 1024]
+            print(f"{len(short)} short file(s) to batch, {len(long)} long file(s) to chunk.")
+            
+            if short:
+                try:
+                    generated = self._generate_level([texts[i] for i in short], 0, max_length,
+                                                     min_length, False, 4)
+                    for i, summary in zip(short, generated):
+                        finish(i, summary)
+                except Exception as e:
+                    #one bad file fails its whole batch, so go through them one by one
+                    #and report only the files that fail on their own
+                    print(f"✗ Error summarizing the short files together ({e}), retrying one by one...")
+                    for i in short:
+                        try:
+                            finish(i, self._generate_level([texts[i]], 0, max_length, min_length,
+                                                           False, 4)[0])
+                        except Exception as e:
+                            print(f"✗ Error processing {txt_files[i]}: {e}")
+            
+            #one long file at a time already spreads its chunks over the pool,
+            #several are faster handed out whole, one per worker
+            pool = self._get_map_pool() if len(long) > 1 else None
+            if pool is None:
+                for i in long:
+                    try:
+                        finish(i, self._summarize_long_text(texts[i], max_length, min_length, False, 4))
+                    except Exception as e:
+                        print(f"✗ Error processing {txt_files[i]}: {e}")
+            else:
+                futures = {
+                    pool.submit(_map_worker_summarize_text, texts[i], max_length, min_length, 4): i
+                    for i in long
+                }
+                for future in as_completed(futures):
+                    i = futures[future]
+                    try:
+                        finish(i, future.result())
+                    except Exception as e:
+                        print(f"✗ Error processing {txt_files[i]}: {e}")
+        finally:
+            #let the writer drain what has been queued, even if generation failed
+            writes.put(None)
+            writer.join()
+        
+        elapsed = time.perf_counter() - start_time
+        rate = len(summaries) / elapsed if elapsed > 0 else 0.0
         
         print(f"\n{'='*60}")
         print(f"Summarization complete! {len(summaries)}/{len(txt_files)} files processed.")
+        print(f"{elapsed:.1f}s total, {rate:.2f} files/sec")
         print(f"{'='*60}")
         
-        return summaries
+        return [{"file": txt_files[i], "summary": summaries[i]} for i in sorted(summaries)]
+    
+    def _read_or_none(self, file_path):
+        try:
+            return self.read_transcription_file(file_path)
+        except Exception as e:
+            print(f"✗ Error reading {os.path.basename(file_path)}: {e}")
+            return None
+    
+    def _summary_writer(self, writes, output_dir):
+        #background thread: write summary files until the None sentinel arrives
+        while True:
+            item = writes.get()
+            if item is None:
+                return
+            file_path, text, summary = item
+            try:
+                _write_summary_file(_summary_path(file_path, output_dir), file_path, text, summary)
+            except OSError as e:
+                print(f"✗ Error saving summary of {os.path.basename(file_path)}: {e}")
+
+
+#fixed (max_length, min_length) per tree level for incremental summaries,
+#budgets that depend on the number of chunks would invalidate the cache
+INCREMENTAL_LEVEL_BUDGETS = [(100, 20)] + [(150, 30)] * 9
+
+
+class RollingSummary:
+    #running summary of a text that keeps growing, e.g. a live meeting transcript.
+    #new text is collected until it fills a chunk, only completed chunks are summarized,
+    #and their summaries are folded into the summary kept so far. every update costs
+    #the new chunks plus one pass over (summary so far + new chunk summaries), no
+    #matter how long the meeting has been going
+    def __init__(self, summarizer, max_length=150, min_length=30, num_beams=4):
+        #summarizer: a loaded TextSummarizer
+        #max_length / min_length: length of the running summary
+        self.summarizer = summarizer
+        self.max_length = max_length
+        self.min_length = min_length
+        self.num_beams = num_beams
+        self.summary = ""
+        self.chunks_done = 0
+        
+        self._pending = ""
+        self._lock = threading.Lock()           #guards _pending
+        self._update_lock = threading.Lock()    #one update at a time
+        
+        #chunk summaries use the fixed map budget, like incremental summaries
+        budgets = summarizer.level_budgets or INCREMENTAL_LEVEL_BUDGETS
+        self.chunk_max_length, self.chunk_min_length = budgets[0]
+    
+    def add(self, text):
+        #append new transcript text (cheap, no model call)
+        text = text.strip()
+        if text:
+            with self._lock:
+                self._pending = f"{self._pending} {text}" if self._pending else text
+    
+    def update(self):
+        #summarize the chunks completed since the last update and fold them in
+        #returns: the running summary
+        with self._update_lock:
+            with self._lock:
+                pending = self._pending
+            chunks = self.summarizer.chunker.chunk(pending) if pending else []
+            if len(chunks) < 2:
+                return self.summary
+            
+            #the last chunk may still grow, keep it (and text added meanwhile) for later
+            complete = chunks[:-1]
+            with self._lock:
+                self._pending = chunks[-1] + self._pending[len(pending):]
+            
+            self.summary = self._fold(complete)
+            self.chunks_done += len(complete)
+            return self.summary
+    
+    def current(self, include_pending=True):
+        #"up to now" summary, including text that hasn't filled a chunk yet
+        #the pending text is folded into a copy, the running summary only takes completed chunks
+        summary = self.update()
+        with self._lock:
+            pending = self._pending
+        if not include_pending or len(pending.split()) < 20:
+            return summary
+        with self._update_lock:
+            return self._fold([pending])
+    
+    def _fold(self, chunks):
+        summarizer = self.summarizer
+        new = summarizer._summarize_level(chunks, 0, self.chunk_max_length, self.chunk_min_length,
+                                          False, self.num_beams)
+        parts = ([self.summary] if self.summary else []) + new
+        if len(parts) == 1:
+            return parts[0]
+        
+        combined = " ".join(parts)
+        if summarizer.chunker.count_tokens(combined) <= summarizer.chunker.max_tokens:
+            return summarizer._summarize_level([combined], 1, self.max_length, self.min_length,
+                                               False, self.num_beams)[0]
+        
+        #many chunks since the last update, reduce them first
+        return summarizer._reduce(parts, self.max_length, self.min_length, False, self.num_beams,
+                                  level_budgets=INCREMENTAL_LEVEL_BUDGETS)
+
+
+#summarizer used by each map-stage worker process
+_worker_summarizer = None
+
+
+def _init_map_worker(model_name, batch_size, num_threads, fan_in=8, level_budgets=None,
+                     quantize=False, extractive_ratio=None):
+    #runs once in every worker process: load the model with a share of the cpu threads
+    global _worker_summarizer
+    torch.set_num_threads(num_threads)
+    _worker_summarizer = TextSummarizer(model_name=model_name, batch_size=batch_size,
+                                        fan_in=fan_in, level_budgets=level_budgets,
+                                        quantize=quantize, extractive_ratio=extractive_ratio)
+
+
+def _map_worker_summarize(texts, max_length, min_length, do_sample, num_beams):
+    #summarize one shard of texts inside a worker process
+    return _worker_summarizer._generate_batch(
+        texts,
+        max_length=max_length,
+        min_length=min_length,
+        do_sample=do_sample,
+        num_beams=num_beams
+    )
+
+
+def _map_worker_summarize_text(text, max_length, min_length, num_beams):
+    #summarize one whole (long) text inside a worker process
+    return _worker_summarizer.summarize(text, max_length, min_length, num_beams=num_beams)
+
+
+def _summary_path(file_path, output_dir):
+    #where the summary of a transcription file is saved
+    basename = os.path.basename(file_path)
+    return os.path.join(output_dir, basename.replace('.txt', '_SUMMARY.txt'))
+
+
+def _write_summary_file(summary_path, file_path, transcription_text, summary):
+    #write a summary file, through a temp file so an interrupted run never
+    #leaves a partial summary that looks up to date
+    now = datetime.now()
+    date_str = now.strftime("%Y-%m-%d")
+    time_str = now.strftime("%H:%M:%S")
+    
+    tmp_path = summary_path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write("="*60 + "\n")
+        f.write("TEXT SUMMARY\n")
+        f.write("="*60 + "\n\n")
+        f.write(f"Summary Generated: {date_str} {time_str}\n")
+        f.write(f"Source File: {file_path}\n")
+        f.write(f"Original Length: {len(transcription_text.split())} words\n")
+        f.write(f"Summary Length: {len(summary.split())} words\n")
+        f.write("\n" + "="*60 + "\n")
+        f.write("SUMMARY\n")
+        f.write("="*60 + "\n\n")
+        f.write(summary)
+    os.replace(tmp_path, summary_path)
+
+
+def _summary_is_current(file_path, output_dir):
+    #True if the file already has a summary written after its last change
+    summary_path = _summary_path(file_path, output_dir)
+    return (os.path.exists(summary_path)
+            and os.path.getmtime(summary_path) >= os.path.getmtime(file_path))
 
 
 def display_menu():
@@ -405,13 +1117,15 @@ if __name__ == "__main__":
             output_dir = get_user_input("Output directory", "summaries")
             max_length = get_int_input("Maximum summary length (words)", 200)
             min_length = get_int_input("Minimum summary length (words)", 50)
+            incremental = input("Reuse summaries from earlier runs? (y/n) [y]: ").strip().lower() != 'n'
             
             print("\nProcessing...")
             master_summary = summarizer.summarize_all_combined(
                 transcription_dir=transcription_dir,
                 output_dir=output_dir,
                 max_length=max_length,
-                min_length=min_length
+                min_length=min_length,
+                incremental=incremental
             )
             
             if master_summary:
@@ -0,0 +1,537 @@
+#structured store for transcriptions
+#every meeting is one row in a small sqlite database with its text, translation,
+#language, model and content hashes, and its whisper segments with timestamps are
+#kept in a second table. meetings are looked up by id through the primary key and
+#the summarizers read all texts with one query instead of parsing a directory of
+#text files. the banner .txt files are still written for people to read, and the
+#ones from before the store (or edited since) are imported with import_directory
+#segments are indexed for full-text search (sqlite fts5, updated as meetings are
+#added) so search() finds meetings and the time offsets inside them without a scan
+#
+#usage: python models/transcriptStore.py import [transcriptions] [--db transcriptions/transcripts.db]
+#       python models/transcriptStore.py search "budget review" [--db transcriptions/transcripts.db]
+
+import argparse
+import os
+import re
+import sqlite3
+import threading
+import uuid
+from datetime import datetime
+
+try:
+    from .resultCache import hash_text
+except ImportError:
+    from resultCache import hash_text
+
+
+#database file kept next to the transcription files, unless TRANSCRIPT_DB is set
+STORE_FILENAME = "transcripts.db"
+
+#segment kinds
+ORIGINAL = "original"
+TRANSLATION = "translation"
+
+BANNER = "=" * 60
+
+#longest snippet of a matching segment returned by search, in tokens
+SNIPPET_TOKENS = 16
+
+
+def default_store_path(transcription_dir="transcriptions"):
+    #the TRANSCRIPT_DB environment variable points the cli, the ingest daemon and the
+    #api (whose /api/search reads it) at one store, otherwise it is kept next to the
+    #transcription files
+    return os.environ.get("TRANSCRIPT_DB") or os.path.join(transcription_dir, STORE_FILENAME)
+
+
+def parse_transcription_file(content):
+    #split a banner formatted transcription file into its parts by position:
+    #  banner / title / banner / metadata lines / banner / section name / banner / text
+    #only the first four banner lines are structure, so a transcript that contains the
+    #word TRANSCRIPTION or a line of "=" is returned unchanged
+    #returns: {"title", "metadata": {name: value}, "section", "text"}, or None when the
+    #         content doesn't have the header
+    lines = content.split('\n')
+    banners = []
+    for i, line in enumerate(lines):
+        if line.strip() == BANNER:
+            banners.append(i)
+            if len(banners) == 4:
+                break
+    if len(banners) < 4 or banners[0] != 0 or banners[1] != 2 or banners[3] != banners[2] + 2:
+        return None
+
+    metadata = {}
+    for line in lines[banners[1] + 1:banners[2]]:
+        name, separator, value = line.partition(":")
+        if separator:
+            metadata[name.strip()] = value.strip()
+
+    return {
+        "title": lines[1].strip(),
+        "metadata": metadata,
+        "section": lines[banners[2] + 1].strip(),
+        "text": '\n'.join(lines[banners[3] + 1:]).strip()
+    }
+
+
+def _match_query(query):
+    #user input as an fts5 query: every word must appear, in any order, and the last one
+    #may be the start of a word. quoting the words keeps fts5 syntax out of user input
+    terms = re.findall(r"\w+", query.lower())
+    if not terms:
+        return None
+    return " ".join(f'"{term}"' for term in terms[:-1]) + (" " if len(terms) > 1 else "") + f'"{terms[-1]}"*'
+
+
+def read_transcription_file(file_path):
+    #text of a transcription file, files without the header are returned as they are
+    with open(file_path, 'r', encoding='utf-8') as f:
+        content = f.read()
+    parsed = parse_transcription_file(content)
+    return parsed["text"] if parsed else content.strip()
+
+
+class TranscriptStore:
+    def __init__(self, db_path):
+        #db_path: sqlite database file, created if it doesn't exist
+        self.db_path = db_path
+        directory = os.path.dirname(db_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS meetings (
+                meeting_id TEXT PRIMARY KEY,
+                title TEXT,
+                audio_path TEXT,
+                audio_hash TEXT,
+                language TEXT,
+                model TEXT,
+                text TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                translation TEXT,
+                translation_hash TEXT,
+                source_file TEXT UNIQUE,
+                created_at TEXT NOT NULL
+            )
+        """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS segments (
+                meeting_id TEXT NOT NULL REFERENCES meetings (meeting_id),
+                kind TEXT NOT NULL,
+                idx INTEGER NOT NULL,
+                start_time REAL,
+                end_time REAL,
+                text TEXT NOT NULL,
+                PRIMARY KEY (meeting_id, kind, idx)
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS meetings_created ON meetings (created_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS meetings_audio ON meetings (audio_hash, model)")
+        self.full_text = self._create_index()
+
+    def _create_index(self):
+        #full-text index over segment text, False when sqlite was built without fts5
+        #(search then falls back to LIKE, which scans every segment)
+        exists = self._conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'segments_fts'"
+        ).fetchone()
+        try:
+            self._conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS segments_fts USING fts5("
+                "text, content='segments', content_rowid='rowid', tokenize='unicode61 remove_diacritics 2')"
+            )
+        except sqlite3.OperationalError:
+            return False
+        if not exists:
+            #stores from before the index existed are indexed once, meetings stored
+            #without segments get their whole text as one segment first
+            for kind, column in ((ORIGINAL, "text"), (TRANSLATION, "translation")):
+                self._conn.execute(
+                    f"INSERT INTO segments (meeting_id, kind, idx, text) "
+                    f"SELECT meeting_id, ?, 0, {column} FROM meetings m WHERE {column} IS NOT NULL "
+                    f"AND NOT EXISTS (SELECT 1 FROM segments s WHERE s.meeting_id = m.meeting_id AND s.kind = ?)",
+                    (kind, kind)
+                )
+            self._conn.execute("INSERT INTO segments_fts (segments_fts) VALUES ('rebuild')")
+        return True
+
+    def add(self, text, language=None, segments=None, translation=None, translation_segments=None,
+            title=None, audio_path=None, audio_hash=None, model=None, source_file=None,
+            created_at=None, meeting_id=None):
+        #store one transcribed meeting, returns its meeting id
+        #segments / translation_segments: whisper segments, dicts with start, end and text
+        #source_file: the transcription .txt written for this meeting, if any
+        #created_at: iso timestamp, defaults to now
+        #without segments the whole text is stored (and searchable) as one segment without times
+        meeting_id = meeting_id or uuid.uuid4().hex
+        if not segments:
+            segments = [{"start": None, "end": None, "text": text}]
+        if translation is not None and not translation_segments:
+            translation_segments = [{"start": None, "end": None, "text": translation}]
+        rows = [
+            (meeting_id, kind, i, segment.get("start"), segment.get("end"), segment["text"].strip())
+            for kind, kind_segments in ((ORIGINAL, segments), (TRANSLATION, translation_segments))
+            for i, segment in enumerate(kind_segments or [])
+        ]
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "INSERT INTO meetings (meeting_id, title, audio_path, audio_hash, language, model, "
+                    "text, text_hash, translation, translation_hash, source_file, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (meeting_id, title, audio_path, audio_hash, language, model,
+                     text, hash_text(text), translation,
+                     hash_text(translation) if translation is not None else None,
+                     source_file, created_at or datetime.now().isoformat())
+                )
+                self._conn.executemany(
+                    "INSERT INTO segments (meeting_id, kind, idx, start_time, end_time, text) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    rows
+                )
+                if self.full_text:
+                    self._conn.execute(
+                        "INSERT INTO segments_fts (rowid, text) "
+                        "SELECT rowid, text FROM segments WHERE meeting_id = ?",
+                        (meeting_id,)
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return meeting_id
+
+    def get(self, meeting_id, with_segments=True):
+        #one meeting as a dict, or None if it doesn't exist
+        #with_segments: include {"original": [...], "translation": [...]} under "segments"
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM meetings WHERE meeting_id = ?", (meeting_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        meeting = dict(row)
+        if with_segments:
+            meeting["segments"] = {
+                ORIGINAL: self.segments(meeting_id, ORIGINAL),
+                TRANSLATION: self.segments(meeting_id, TRANSLATION)
+            }
+        return meeting
+
+    def segments(self, meeting_id, kind=ORIGINAL):
+        #segments of one meeting in order, as dicts with start, end and text
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT start_time, end_time, text FROM segments "
+                "WHERE meeting_id = ? AND kind = ? ORDER BY idx",
+                (meeting_id, kind)
+            ).fetchall()
+        return [{"start": row["start_time"], "end": row["end_time"], "text": row["text"]} for row in rows]
+
+    def list(self, since=None, limit=None):
+        #meetings without their text, oldest first
+        #since: only meetings created at or after this iso timestamp
+        query = ("SELECT meeting_id, title, audio_path, language, model, text_hash, "
+                 "translation_hash, source_file, created_at FROM meetings")
+        params = []
+        if since:
+            query += " WHERE created_at >= ?"
+            params.append(since)
+        query += " ORDER BY created_at, meeting_id"
+        if limit:
+            query += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [dict(row) for row in rows]
+
+    def texts(self, since=None, prefer_translation=False, files_only=False):
+        #texts of all meetings in one query, oldest first, for the summarizers
+        #prefer_translation: the english translation where there is one, else the original
+        #files_only: only meetings saved as or imported from transcription files, not the
+        #            api's uploads and live sessions
+        #returns: list of {"meeting_id", "title", "text", "text_hash", "source_file"}
+        column = "COALESCE(translation, text)" if prefer_translation else "text"
+        hash_column = "COALESCE(translation_hash, text_hash)" if prefer_translation else "text_hash"
+        query = (f"SELECT meeting_id, title, {column} AS text, {hash_column} AS text_hash, "
+                 f"source_file FROM meetings")
+        conditions = []
+        params = []
+        if since:
+            conditions.append("created_at >= ?")
+            params.append(since)
+        if files_only:
+            conditions.append("source_file IS NOT NULL")
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY created_at, meeting_id"
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [dict(row) for row in rows]
+
+    def search(self, query, since=None, until=None, start=None, end=None, kind=None,
+               limit=20, hits_per_meeting=5):
+        #meetings with segments that contain every word of query, best matches first
+        #since / until: only meetings created in this range (iso timestamps)
+        #start / end: only segments overlapping this part of the meetings (seconds)
+        #kind: only "original" or "translation" segments, None = both
+        #returns: list of {"meeting_id", "title", "created_at", "language", "hits": [
+        #         {"kind", "start_ms", "end_ms", "text", "snippet"}, ...]}, a hit has no
+        #         offsets when the meeting was stored without segments
+        match = _match_query(query)
+        if match is None:
+            return []
+
+        filters = []
+        params = []
+        if since:
+            filters.append("m.created_at >= ?")
+            params.append(since)
+        if until:
+            filters.append("m.created_at <= ?")
+            params.append(until)
+        if start is not None:
+            filters.append("s.end_time >= ?")
+            params.append(start)
+        if end is not None:
+            filters.append("s.start_time <= ?")
+            params.append(end)
+        if kind:
+            filters.append("s.kind = ?")
+            params.append(kind)
+
+        columns = ("s.meeting_id, s.kind, s.start_time, s.end_time, s.text, "
+                   "m.title, m.created_at, m.language")
+        if self.full_text:
+            query_sql = (
+                f"SELECT {columns}, snippet(segments_fts, 0, '[', ']', '…', {SNIPPET_TOKENS}) AS snippet "
+                "FROM segments_fts "
+                "JOIN segments s ON s.rowid = segments_fts.rowid "
+                "JOIN meetings m ON m.meeting_id = s.meeting_id "
+                "WHERE segments_fts MATCH ?"
+            )
+            params.insert(0, match)
+            order = " ORDER BY bm25(segments_fts)"
+        else:
+            query_sql = (
+                f"SELECT {columns}, NULL AS snippet FROM segments s "
+                "JOIN meetings m ON m.meeting_id = s.meeting_id WHERE 1"
+            )
+            for term in reversed(re.findall(r"\w+", query.lower())):
+                filters.insert(0, "s.text LIKE ?")
+                params.insert(0, f"%{term}%")
+            order = " ORDER BY m.created_at DESC, s.start_time"
+        query_sql += "".join(f" AND {condition}" for condition in filters) + order + " LIMIT ?"
+        #enough rows for the requested meetings, a meeting with many hits can't crowd out the rest
+        params.append(limit * hits_per_meeting * 4)
+
+        with self._lock:
+            rows = self._conn.execute(query_sql, params).fetchall()
+
+        meetings = {}
+        for row in rows:
+            meeting = meetings.get(row["meeting_id"])
+            if meeting is None:
+                if len(meetings) == limit:
+                    continue
+                meeting = meetings[row["meeting_id"]] = {
+                    "meeting_id": row["meeting_id"],
+                    "title": row["title"],
+                    "created_at": row["created_at"],
+                    "language": row["language"],
+                    "hits": []
+                }
+            if len(meeting["hits"]) < hits_per_meeting:
+                meeting["hits"].append({
+                    "kind": row["kind"],
+                    "start_ms": None if row["start_time"] is None else int(row["start_time"] * 1000),
+                    "end_ms": None if row["end_time"] is None else int(row["end_time"] * 1000),
+                    "text": row["text"],
+                    "snippet": row["snippet"] or row["text"]
+                })
+        for meeting in meetings.values():
+            meeting["hits"].sort(key=lambda hit: (hit["kind"], hit["start_ms"] or 0))
+        return list(meetings.values())
+
+    def find_by_source(self, source_file):
+        #meeting id of an imported or saved transcription file, or None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT meeting_id FROM meetings WHERE source_file = ?", (source_file,)
+            ).fetchone()
+        return row["meeting_id"] if row else None
+
+    def find_by_audio(self, audio_hash, model):
+        #meeting id of an earlier transcription of the same audio with the same model, or None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT meeting_id FROM meetings WHERE audio_hash = ? AND model = ? "
+                "ORDER BY created_at LIMIT 1",
+                (audio_hash, model)
+            ).fetchone()
+        return row["meeting_id"] if row else None
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM meetings").fetchone()[0]
+
+    def import_directory(self, transcription_dir="transcriptions"):
+        #import the transcription .txt files that aren't in the store yet (written before it
+        #existed or copied in) and update the meetings whose file was edited since
+        #X_EN.txt is stored as the translation of X.txt, unchanged files are skipped
+        #returns: number of meetings imported or updated
+        filenames = sorted(
+            f for f in os.listdir(transcription_dir)
+            if f.endswith('.txt') and not f.endswith('_EN.txt') and not f.endswith('_SUMMARY.txt')
+        )
+        with self._lock:
+            known = {row["source_file"]: row for row in self._conn.execute(
+                "SELECT meeting_id, source_file, text_hash, translation_hash FROM meetings "
+                "WHERE source_file IS NOT NULL"
+            )}
+
+        imported = 0
+        for filename in filenames:
+            file_path = os.path.join(transcription_dir, filename)
+            try:
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    parsed = parse_transcription_file(f.read())
+                if parsed is None:
+                    print(f"✗ Skipped {filename}: not a transcription file")
+                    continue
+
+                translation = None
+                translation_path = file_path[:-len('.txt')] + '_EN.txt'
+                if os.path.exists(translation_path):
+                    with open(translation_path, 'r', encoding='utf-8') as f:
+                        parsed_translation = parse_transcription_file(f.read())
+                    if parsed_translation:
+                        translation = parsed_translation["text"]
+
+                #a file that is already stored is compared by content, so hand corrections
+                #replace the stored text (and its segments, which no longer match it)
+                row = known.get(filename)
+                if row is not None:
+                    translation_hash = hash_text(translation) if translation is not None else None
+                    if row["text_hash"] == hash_text(parsed["text"]) and row["translation_hash"] == translation_hash:
+                        continue
+                    self.replace_text(row["meeting_id"], parsed["text"], translation)
+                    imported += 1
+                    print(f"✓ Updated: {filename}")
+                    continue
+
+                metadata = parsed["metadata"]
+                created_at = None
+                if "Date" in metadata and "Time" in metadata:
+                    try:
+                        created_at = datetime.strptime(
+                            f"{metadata['Date']} {metadata['Time']}", "%Y-%m-%d %H:%M:%S"
+                        ).isoformat()
+                    except ValueError:
+                        pass
+                if created_at is None:
+                    created_at = datetime.fromtimestamp(os.path.getmtime(file_path)).isoformat()
+
+                audio_path = metadata.get("Audio File")
+                self.add(
+                    parsed["text"],
+                    language=metadata.get("Detected Language"),
+                    translation=translation,
+                    title=os.path.splitext(os.path.basename(audio_path))[0] if audio_path else filename,
+                    audio_path=audio_path,
+                    source_file=filename,
+                    created_at=created_at
+                )
+                imported += 1
+                print(f"✓ Imported: {filename}" + (" (with translation)" if translation else ""))
+            except Exception as e:
+                print(f"✗ Error importing {filename}: {e}")
+        return imported
+
+    def replace_text(self, meeting_id, text, translation=None):
+        #replace the text and translation of a stored meeting, its segments become the
+        #whole texts without times since the old ones belong to the previous text
+        rows = [(meeting_id, ORIGINAL, 0, None, None, text)]
+        if translation is not None:
+            rows.append((meeting_id, TRANSLATION, 0, None, None, translation))
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                if self.full_text:
+                    self._conn.execute(
+                        "INSERT INTO segments_fts (segments_fts, rowid, text) "
+                        "SELECT 'delete', rowid, text FROM segments WHERE meeting_id = ?",
+                        (meeting_id,)
+                    )
+                self._conn.execute("DELETE FROM segments WHERE meeting_id = ?", (meeting_id,))
+                self._conn.execute(
+                    "UPDATE meetings SET text = ?, text_hash = ?, translation = ?, translation_hash = ? "
+                    "WHERE meeting_id = ?",
+                    (text, hash_text(text), translation,
+                     hash_text(translation) if translation is not None else None, meeting_id)
+                )
+                self._conn.executemany(
+                    "INSERT INTO segments (meeting_id, kind, idx, start_time, end_time, text) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    rows
+                )
+                if self.full_text:
+                    self._conn.execute(
+                        "INSERT INTO segments_fts (rowid, text) "
+                        "SELECT rowid, text FROM segments WHERE meeting_id = ?",
+                        (meeting_id,)
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Transcript store tools")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    import_parser = subcommands.add_parser("import", help="import existing transcription .txt files")
+    import_parser.add_argument("directory", nargs="?", default="transcriptions")
+    import_parser.add_argument("--db", default=None, help="store file (default: <directory>/transcripts.db)")
+    search_parser = subcommands.add_parser("search", help="find meetings that mention some words")
+    search_parser.add_argument("query")
+    search_parser.add_argument("--db", default=default_store_path(), help="store file")
+    search_parser.add_argument("--limit", type=int, default=10, help="most meetings to show")
+    args = parser.parse_args()
+
+    if args.command == "import":
+        store = TranscriptStore(args.db or default_store_path(args.directory))
+        try:
+            imported = store.import_directory(args.directory)
+            print(f"\nImported {imported} transcription(s), {store.count()} in the store.")
+        finally:
+            store.close()
+        return
+
+    store = TranscriptStore(args.db)
+    try:
+        results = store.search(args.query, limit=args.limit)
+    finally:
+        store.close()
+    if not results:
+        print("No matches.")
+    for meeting in results:
+        print(f"\n{meeting['title'] or meeting['meeting_id']} ({meeting['created_at'][:16]}, {meeting['meeting_id']})")
+        for hit in meeting["hits"]:
+            at = "" if hit["start_ms"] is None else f"[{hit['start_ms'] // 60000:02d}:{hit['start_ms'] // 1000 % 60:02d}] "
+            print(f"  {at}{hit['snippet']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+#energy-based voice activity detection
+#finds the speech regions of a recording so whisper only has to encode those,
+#and maps timestamps of the shortened audio back to the original recording
+
+from bisect import bisect_right
+import numpy as np
+
+
+def detect_speech(audio, sample_rate=16000, frame_ms=30, margin_db=12.0, max_threshold_db=-35.0,
+                  min_speech_ms=250, min_silence_ms=700, pad_ms=200):
+    #find speech in mono float samples, returns a list of (start, end) sample indices
+    #a frame counts as speech when its energy is margin_db above the noise floor
+    #(10th percentile of frame energies) or above max_threshold_db dBFS, whichever is lower,
+    #so a noisy or quiet recording errs on the side of keeping audio
+    #min_speech_ms: shorter bursts (clicks, coughs) are dropped
+    #min_silence_ms: shorter pauses are kept as part of the speech around them
+    #pad_ms: audio kept before and after every region so words aren't clipped
+    frame = int(sample_rate * frame_ms / 1000)
+    n_frames = len(audio) // frame
+    if n_frames == 0:
+        return []
+
+    #energy per frame in dB, computed on a reshaped view without copying the audio
+    frames = np.asarray(audio[:n_frames * frame], dtype=np.float32).reshape(n_frames, frame)
+    energy = np.einsum("ij,ij->i", frames, frames) / frame
+    energy_db = 10 * np.log10(energy + 1e-10)
+
+    noise_floor = np.percentile(energy_db, 10)
+    threshold = min(noise_floor + margin_db, max_threshold_db)
+    is_speech = energy_db > threshold
+
+    #start/end frame of every run of speech frames
+    edges = np.diff(np.concatenate(([0], is_speech.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+
+    min_silence = min_silence_ms / frame_ms
+    min_speech = min_speech_ms / frame_ms
+    pad = int(pad_ms / 1000 * sample_rate)
+
+    regions = []
+    for start, end in zip(starts, ends):
+        #bridge short pauses
+        if regions and start - regions[-1][1] < min_silence:
+            regions[-1][1] = end
+        else:
+            regions.append([start, end])
+
+    speech = []
+    for start, end in regions:
+        if end - start < min_speech:
+            continue
+        start_sample = max(0, int(start) * frame - pad)
+        end_sample = min(len(audio), int(end) * frame + pad)
+        #padding can make neighbours overlap
+        if speech and start_sample <= speech[-1][1]:
+            speech[-1] = (speech[-1][0], end_sample)
+        else:
+            speech.append((start_sample, end_sample))
+
+    return speech
+
+
+class SpeechTimeline:
+    #the speech regions of a recording glued together, with a short silence in
+    #between so whisper still hears a pause. keeps track of where every piece
+    #came from so times in the shortened audio can be mapped back
+    def __init__(self, audio, regions, sample_rate=16000, gap_ms=300):
+        self.sample_rate = sample_rate
+        gap = np.zeros(int(sample_rate * gap_ms / 1000), dtype=np.float32)
+
+        pieces = []
+        self._compact_starts = []     #start of each region in the shortened audio (s)
+        self._original_starts = []    #start of each region in the original audio (s)
+        self._durations = []
+        position = 0
+
+        for start, end in regions:
+            if pieces:
+                pieces.append(gap)
+                position += len(gap)
+            pieces.append(np.asarray(audio[start:end], dtype=np.float32))
+            self._compact_starts.append(position / sample_rate)
+            self._original_starts.append(start / sample_rate)
+            self._durations.append((end - start) / sample_rate)
+            position += end - start
+
+        self.audio = np.concatenate(pieces) if pieces else np.zeros(0, dtype=np.float32)
+        self.original_seconds = len(audio) / sample_rate
+
+    @property
+    def speech_seconds(self):
+        return sum(self._durations)
+
+    def to_original(self, seconds):
+        #map a time in the shortened audio to the original recording
+        #times inside an inserted gap map to the end of the region before it
+        i = max(0, bisect_right(self._compact_starts, seconds) - 1)
+        if i >= len(self._compact_starts):
+            return seconds
+        within = min(max(seconds - self._compact_starts[i], 0.0), self._durations[i])
+        return round(self._original_starts[i] + within, 2)
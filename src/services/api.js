@@ -36,12 +36,19 @@ export async function transcribeAudio(audioBlob) {
 //text: the text to summarize
 //options.maxLength: maximum summary length (default: 150)
 //options.minLength: minimum summary length (default: 30)
-//returns: {summary: string, original_length: number, summary_length: number}
+//options.preset: 'fast', 'balanced' or 'quality' (optional)
+//options.latencyTargetS: seconds the summary should take at most (optional)
+//options.lengths: [{max_length, min_length}, ...] for several summaries in one call (optional),
+//                 they come back as variants: [{max_length, min_length, summary, summary_length}]
+//returns: {summary: string, original_length: number, summary_length: number, policy: object, seconds: number, variants: array}
 export async function summarizeText(text, options = {}) {
   const response = await api.post('/summarize', {
     text,
     max_length: options.maxLength || 150,
     min_length: options.minLength || 30,
+    preset: options.preset,
+    latency_target_s: options.latencyTargetS,
+    lengths: options.lengths,
   });
   
   return response.data;
@@ -64,16 +71,67 @@ export async function processMeeting(audioBlob) {
   return response.data;
 }
 
+//queue a meeting for background processing instead of waiting for the result
+//audioBlob: the recorded audio
+//returns: {meeting_id: string, status: string, stage: string, progress: number, ...}
+export async function submitMeetingJob(audioBlob) {
+  const formData = new FormData();
+  formData.append('file', audioBlob, 'meeting-recording.webm');
+  
+  const response = await api.post('/jobs/process-meeting', formData, {
+    headers: {
+      'Content-Type': 'multipart/form-data',
+    },
+  });
+  
+  return response.data;
+}
+
+//get the status of a queued meeting
+//returns: {meeting_id: string, status: 'queued' | 'running' | 'done' | 'failed', stage: string, progress: number, error: string}
+export async function getJobStatus(meetingId) {
+  const response = await api.get(`/jobs/${meetingId}`);
+  return response.data;
+}
+
+//get the result of a finished meeting job (same shape as processMeeting)
+export async function getJobResult(meetingId) {
+  const response = await api.get(`/jobs/${meetingId}/result`);
+  return response.data;
+}
+
 //preload ml models in the background (optional, speeds up first request)
 export async function preloadModels() {
   const response = await api.post('/preload-models');
   return response.data;
 }
 
+//open a live transcription stream
+//send recorder chunks with socket.send(blob) and socket.send(JSON.stringify({type: 'stop'})) at the end
+//options.summaryInterval: seconds between 'summary' messages with a summary so far (default: off)
+//onMessage receives {type: 'partial'|'final'|'summary'|'done'|'busy'|'error', ...}
+//returns: the WebSocket
+export function openTranscriptionStream(onMessage, options = {}) {
+  const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
+  const params = new URLSearchParams();
+  if (options.language) params.set('language', options.language);
+  if (options.format) params.set('format', options.format);
+  if (options.summaryInterval) params.set('summary_interval', options.summaryInterval);
+  const query = params.toString() ? `?${params}` : '';
+  
+  const socket = new WebSocket(`${protocol}//${window.location.host}/ws/transcribe${query}`);
+  socket.onmessage = (event) => onMessage(JSON.parse(event.data));
+  return socket;
+}
+
 export default {
   checkHealth,
   transcribeAudio,
   summarizeText,
   processMeeting,
+  submitMeetingJob,
+  getJobStatus,
+  getJobResult,
+  openTranscriptionStream,
   preloadModels,
 };
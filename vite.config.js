@@ -16,6 +16,10 @@ export default defineConfig({
         target: 'http://127.0.0.1:8000',  // FastAPI backend server
         changeOrigin: true,
       },
+      '/ws': {
+        target: 'ws://127.0.0.1:8000',
+        ws: true,
+      },
     },
   },
 })